@@ -1,14 +1,24 @@
 import uvicorn
-import numpy as np
 import os
-from fastapi import FastAPI, Request, Form
+from fastapi import FastAPI, Request, Form, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse
+from typing import List, Union
 
 # Connecting our ranking logic from the other file
 from ranking_engine import get_vehicle_recommendations
+from quote_response import QuoteResponse, RecommendationList, encode_recommendations
+from surge_engine import surge
+from quote_cache import quote_cache
+from inference_pool import inference_pool, PoolSaturatedError
+from micro_batcher import get_batched_recommendations, quote_batcher
+from quote_log import quote_log
+from model_registry import registry
+from hot_reload import lifespan, request_reload, request_rollback, require_admin_token, last_reload
+from metrics import metrics, MetricsMiddleware, StageTimer, ERRORS
+from batch_quotes import Trip, TripColumns, trips_to_columns, respond_to_batch
 
-app = FastAPI(title="Udupi AI - Smart Ride Console")
+app = FastAPI(title="Udupi AI - Smart Ride Console", lifespan=lifespan)
 
 # --- MAKING SURE THE APP CAN TALK TO THE FRONTEND ---
 app.add_middleware(
@@ -18,6 +28,14 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Request counts and latency per route for /metrics
+app.add_middleware(MetricsMiddleware)
+
+# --- BACKPRESSURE ---
+# When the inference pool is full we say "try again" (429) instead of queueing forever
+@app.exception_handler(PoolSaturatedError)
+async def pool_saturated(request: Request, exc: PoolSaturatedError):
+    return JSONResponse(status_code=429, content={"error": str(exc)}, headers={"Retry-After": "1"})
 
 # --- THE DESIGN OF THE WEBSITE (HTML/CSS) ---
 # I used Tailwind CSS to make it look modern and dark-themed
@@ -47,7 +65,7 @@ HTML_TEMPLATE = """
             </div>
             <div class="space-y-4 text-xs opacity-80">
                 <p>● Random Forest ETA Model</p>
-                <p>● 1.45x Surge Pricing Logic</p>
+                <p>● Rush-Hour &amp; Live Demand Surge</p>
                 <p>● Multi-Vehicle Ranking</p>
             </div>
         </div>
@@ -101,10 +119,44 @@ HTML_TEMPLATE = """
 </html>
 """
 
+# The page is split once at startup: every response is just head + results + tail
+PAGE_HEAD, PAGE_TAIL = HTML_TEMPLATE.split("{% RESULTS_SECTION %}")
+HOME_PAGE = (PAGE_HEAD + PAGE_TAIL).encode()
+
+RESULTS_HEAD = """
+    <div class="mt-8 pt-8 border-t border-slate-800">
+        <div class="flex justify-between items-center mb-4">
+            <span class="text-slate-400 text-sm font-medium">Trip Distance</span>
+            <span class="text-blue-400 font-bold">%s km</span>
+        </div>
+        <div class="space-y-3">
+    """
+RIDE_CARD = """
+            <div class="flex justify-between items-center p-4 bg-slate-800/40 border border-slate-700/50 rounded-2xl">
+                <div>
+                    <div class="font-bold flex items-center gap-2">%s %s</div>
+                    <div class="text-xs text-slate-500">Predicted ETA: %s mins</div>
+                </div>
+                <div class="text-xl font-black text-emerald-400">₹%d</div>
+            </div>"""
+# Red "SURGE" tag for high demand
+SURGE_TAG = '<span class="text-[10px] bg-red-500/20 text-red-400 px-2 py-0.5 rounded-md border border-red-500/30">SURGE %sx</span>'
+RESULTS_TAIL = "</div></div>"
+
+
+def render_results(results):
+    """The results section of the console for one trip's recommendations."""
+    cards = [
+        RIDE_CARD % (ride.vehicle, SURGE_TAG % format(ride.surge, 'g') if ride.demand == 'High' else '', ride.eta, ride.fare)
+        for ride in results
+    ]
+    distance = results[0].distance if results else 0.0
+    return PAGE_HEAD + RESULTS_HEAD % distance + ''.join(cards) + RESULTS_TAIL + PAGE_TAIL
+
 # Show the home page when we open the site
 @app.get("/", response_class=HTMLResponse)
 async def home():
-    return HTML_TEMPLATE.replace("{% RESULTS_SECTION %}", "")
+    return HTMLResponse(HOME_PAGE)
 
 # This runs when we click the "Run AI Analysis" button
 @app.post("/test", response_class=HTMLResponse)
@@ -113,50 +165,88 @@ async def test_logic(
     end_lat: float = Form(...), end_lon: float = Form(...), 
     hour: int = Form(...), preference: str = Form(...)
 ):
-    # Calculate the straight-line distance in km
-    dist = round(np.sqrt((end_lat - start_lat)**2 + (end_lon - start_lon)**2) * 111, 2)
+    # A console quote is demand for the pickup zone too
+    surge.record(start_lat, start_lon)
     
     # Get the top 3 ride options from our ranking engine
-    recommendations = get_vehicle_recommendations(start_lat, start_lon, end_lat, end_lon, hour, preference)
-    results = recommendations.to_dict(orient="records") if hasattr(recommendations, 'to_dict') else recommendations
-    
-    # Create the HTML to show our results in a nice list
-    res_html = f'''
-    <div class="mt-8 pt-8 border-t border-slate-800">
-        <div class="flex justify-between items-center mb-4">
-            <span class="text-slate-400 text-sm font-medium">Trip Distance</span>
-            <span class="text-blue-400 font-bold">{dist} km</span>
-        </div>
-        <div class="space-y-3">
-    '''
-    for ride in results:
-        # Check if we should show a red "SURGE" tag for high demand
-        is_surge = ride.get('demand') == 'High'
-        surge_html = '<span class="text-[10px] bg-red-500/20 text-red-400 px-2 py-0.5 rounded-md border border-red-500/30">SURGE 1.45x</span>' if is_surge else ''
-        
-        res_html += f'''
-            <div class="flex justify-between items-center p-4 bg-slate-800/40 border border-slate-700/50 rounded-2xl">
-                <div>
-                    <div class="font-bold flex items-center gap-2">{ride["vehicle"]} {surge_html}</div>
-                    <div class="text-xs text-slate-500">Predicted ETA: {ride["eta"]} mins</div>
-                </div>
-                <div class="text-xl font-black text-emerald-400">₹{ride["fare"]}</div>
-            </div>'''
-    res_html += "</div></div>"
-    return HTML_TEMPLATE.replace("{% RESULTS_SECTION %}", res_html)
+    # (the model runs in the inference pool, so the event loop stays free for other requests)
+    recommendations = await inference_pool.run(get_vehicle_recommendations, start_lat, start_lon, end_lat, end_lon, hour, preference)
+    if isinstance(recommendations, dict):
+        return HTMLResponse(PAGE_HEAD + f'<p class="mt-8 text-red-400">{recommendations["error"]}</p>' + PAGE_TAIL, status_code=503)
+    quote_log.log(start_lat, start_lon, end_lat, end_lon, hour, preference, False, recommendations)
+    # Each row carries the trip distance the ranking engine priced with
+    return HTMLResponse(render_results(recommendations))
 
 # An extra route for apps/mobile to get data without the website design
-@app.post("/predict_ride")
-def get_quote(start_lat: float, start_lon: float, end_lat: float, end_lon: float, hour: int, preference: str = "balanced"):
+@app.post("/predict_ride", response_model=RecommendationList)
+async def get_quote(start_lat: float, start_lon: float, end_lat: float, end_lon: float, hour: int, preference: str = "balanced", precise: bool = False, quantiles: bool = False):
+    try:
+        recommendations = await get_batched_recommendations(start_lat, start_lon, end_lat, end_lon, hour, preference, precise, quantiles)
+        if isinstance(recommendations, dict):
+            # Model not loaded (yet): tell the load balancer to try another instance
+            return JSONResponse(status_code=503, content=recommendations)
+        timer = StageTimer('http')
+        response = QuoteResponse(encode_recommendations(recommendations))
+        timer.lap('format')
+        return response
+    except PoolSaturatedError:
+        raise
+    except Exception as e:
+        ERRORS.inc(("/predict_ride", type(e).__name__))
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
+# Batch version for the dispatcher: many trips in one request (JSON list or columnar arrays)
+@app.post("/predict_rides", response_model=List[RecommendationList])
+async def get_quotes(trips: Union[List[Trip], TripColumns], stream: bool = False, precise: bool = False):
     try:
-        dist = round(np.sqrt((end_lat - start_lat)**2 + (end_lon - start_lon)**2) * 111, 2)
-        recommendations = get_vehicle_recommendations(start_lat, start_lon, end_lat, end_lon, hour, preference)
-        results = recommendations.to_dict(orient="records") if hasattr(recommendations, 'to_dict') else recommendations
-        for r in results:
-            r['distance'] = dist
-        return results
+        # Scored in the inference pool (bounded, 429 when full), chunk by chunk when streamed
+        return await respond_to_batch(trips_to_columns(trips), precise, stream)
+    except PoolSaturatedError:
+        raise
     except Exception as e:
-        return {"error": str(e)}
+        ERRORS.inc(("/predict_rides", type(e).__name__))
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
+# Hit/miss/eviction counters of the quote cache
+@app.get("/cache_stats")
+def cache_stats():
+    return quote_cache.stats()
+
+# Batch size and queueing delay of the /predict_ride micro-batcher (for tuning the window)
+@app.get("/batch_stats")
+def batch_stats():
+    return quote_batcher.stats()
+
+# Quotes written to / dropped from the retraining log (quote_log.py)
+@app.get("/quote_log_stats")
+def quote_log_stats():
+    return quote_log.stats()
+
+# Prometheus scrape endpoint: request/stage latency, error counts, cache/pool/model gauges
+@app.get("/metrics")
+def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+# Readiness check for the load balancer: is the model loaded, which version, how long did it take
+@app.get("/ready")
+def ready():
+    status = registry.status()
+    status['last_reload'] = last_reload
+    # Which worker answered (several share the port under prefork_server.py)
+    status['pid'] = os.getpid()
+    return JSONResponse(status_code=200 if status['ready'] else 503, content=status)
+
+# Admin: load the newest model files, validate them on the holdout and swap them in (no restart)
+# Under prefork_server.py this asks the launcher for a rolling restart of every worker instead
+# Both admin routes need the MODEL_ADMIN_TOKEN in an X-Admin-Token header (and are off without one)
+@app.post("/admin/reload", dependencies=[Depends(require_admin_token)])
+def admin_reload(validate: bool = True):
+    return request_reload(validate)
+
+# Admin: go back to the model that was serving before the last swap
+@app.post("/admin/rollback", dependencies=[Depends(require_admin_token)])
+def admin_rollback():
+    return request_rollback()
 
 # Start the server on port 8001
 if __name__ == "__main__":
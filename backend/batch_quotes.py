@@ -0,0 +1,122 @@
+import asyncio
+import json
+from typing import List, Union
+from pydantic import BaseModel
+from fastapi.responses import StreamingResponse, JSONResponse
+
+from ranking_engine import get_batch_recommendations
+from quote_response import QuoteResponse, encode_recommendations, encode_batch
+from quote_log import quote_log
+from inference_pool import inference_pool, PoolSaturatedError
+
+# Batches bigger than this are streamed back line by line (NDJSON)
+STREAM_THRESHOLD = 5000
+STREAM_CHUNK_SIZE = 2000
+# A streamed chunk that finds the inference pool full tries again after this long (seconds)
+STREAM_RETRY_SECONDS = 0.05
+
+
+class Trip(BaseModel):
+    """One trip in a batch request (same fields as /predict_ride)."""
+    start_lat: float
+    start_lon: float
+    end_lat: float
+    end_lon: float
+    hour: int
+    preference: str = "balanced"
+
+
+class TripColumns(BaseModel):
+    """
+    Columnar version of a batch: one array per field.
+    Cheaper to send (and parse) than thousands of small objects.
+    preference can be one value for all trips or one per trip.
+    """
+    start_lat: List[float]
+    start_lon: List[float]
+    end_lat: List[float]
+    end_lon: List[float]
+    hour: List[int]
+    preference: Union[str, List[str]] = "balanced"
+
+
+def trips_to_columns(trips):
+    """Turns either request format into the column arrays the ranking engine wants."""
+    if isinstance(trips, TripColumns):
+        lengths = {len(trips.start_lat), len(trips.start_lon), len(trips.end_lat), len(trips.end_lon), len(trips.hour)}
+        if not isinstance(trips.preference, str):
+            lengths.add(len(trips.preference))
+        # Checked here (not later) so a bad request fails before we start streaming
+        if len(lengths) > 1:
+            raise ValueError("All trip columns must have the same length.")
+        return {
+            'start_lats': trips.start_lat, 'start_lons': trips.start_lon,
+            'end_lats': trips.end_lat, 'end_lons': trips.end_lon,
+            'hours': trips.hour, 'preferences': trips.preference
+        }
+    return {
+        'start_lats': [t.start_lat for t in trips], 'start_lons': [t.start_lon for t in trips],
+        'end_lats': [t.end_lat for t in trips], 'end_lons': [t.end_lon for t in trips],
+        'hours': [t.hour for t in trips], 'preferences': [t.preference for t in trips]
+    }
+
+
+def should_stream(columns, stream=False):
+    return stream or len(columns['hours']) > STREAM_THRESHOLD
+
+
+def quote_batch(columns, precise=False):
+    results = get_batch_recommendations(precise=precise, **columns)
+    if not isinstance(results, dict):
+        quote_log.log_batch(columns, precise, results)
+    return results
+
+
+def chunk_columns(columns, lo, hi):
+    """Trips lo..hi of a batch (a single preference string applies to every chunk)."""
+    return {name: values if isinstance(values, str) else values[lo:hi] for name, values in columns.items()}
+
+
+def quote_chunk(columns, precise, lo, hi):
+    """quote_batch for trips lo..hi: one unit of pool work while streaming."""
+    return quote_batch(chunk_columns(columns, lo, hi), precise)
+
+
+async def run_chunk(columns, precise, lo, runner):
+    # Mid-stream the 200 is already sent, so a full pool means waiting for a slot, not a 429
+    while True:
+        try:
+            return await runner(quote_chunk, columns, precise, lo, lo + STREAM_CHUNK_SIZE)
+        except PoolSaturatedError:
+            await asyncio.sleep(STREAM_RETRY_SECONDS)
+
+
+async def stream_batch(columns, precise=False, first_chunk=None, runner=None):
+    """
+    Yields one JSON line per trip (its top 3 rides), in the same order as the request.
+    Every chunk of STREAM_CHUNK_SIZE trips is scored in the inference pool (runner), so big batches
+    share the pool's bounds with everything else. first_chunk is the first chunk's result if the
+    route already computed it (that is where a full pool still gets a 429).
+    """
+    runner = runner or inference_pool.run
+    for lo in range(0, len(columns['hours']), STREAM_CHUNK_SIZE):
+        results = first_chunk if lo == 0 and first_chunk is not None else await run_chunk(columns, precise, lo, runner)
+        if isinstance(results, dict):
+            # e.g. model not loaded: the error is the last line (the status line was already sent)
+            yield json.dumps(results) + "\n"
+            return
+        yield ''.join([encode_recommendations(trip_results) + "\n" for trip_results in results])
+
+
+async def respond_to_batch(columns, precise=False, stream=False):
+    """
+    What /predict_rides answers: the whole batch scored in the inference pool, or (big batches)
+    a stream whose chunks are scored there. A full pool gives PoolSaturatedError (-> 429) before anything is sent.
+    """
+    if should_stream(columns, stream):
+        first_chunk = await inference_pool.run(quote_chunk, columns, precise, 0, STREAM_CHUNK_SIZE)
+        return StreamingResponse(stream_batch(columns, precise, first_chunk), media_type="application/x-ndjson")
+    results = await inference_pool.run(quote_batch, columns, precise)
+    if isinstance(results, dict):
+        return JSONResponse(status_code=503, content=results)
+    return QuoteResponse(encode_batch(results))
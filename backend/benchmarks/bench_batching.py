@@ -0,0 +1,61 @@
+import sys
+import os
+import time
+import asyncio
+import argparse
+import numpy as np
+import httpx
+
+# Same trick as the tests: look one folder up (the backend folder) for the logic
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from main import app
+from micro_batcher import MicroBatcher, quote_trip_batch
+import micro_batcher
+from quote_cache import quote_cache
+
+
+async def run_load(n_requests, concurrency, seed):
+    rng = np.random.default_rng(seed)
+    latencies = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        queue = asyncio.Queue()
+        for _ in range(n_requests):
+            queue.put_nowait({
+                'start_lat': rng.uniform(13.32, 13.37), 'start_lon': rng.uniform(74.72, 74.80),
+                'end_lat': rng.uniform(13.32, 13.37), 'end_lon': rng.uniform(74.72, 74.80),
+                'hour': int(rng.integers(6, 24)), 'precise': 'true'
+            })
+
+        async def worker():
+            while not queue.empty():
+                params = queue.get_nowait()
+                start = time.perf_counter()
+                await client.post("/predict_ride", params=params)
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    p50, p99 = np.percentile(np.array(latencies) * 1000, [50, 99])
+    return n_requests / elapsed, p50, p99
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare /predict_ride with and without micro-batching.")
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--windows", type=float, nargs="+", default=[0, 1, 2, 5])
+    args = parser.parse_args()
+
+    print(f"\n--- 📦 Micro-batching: {args.requests} precise quotes, concurrency {args.concurrency} ---")
+    for seed, window_ms in enumerate(args.windows):
+        # Fresh batcher per setting; window 0 + max size 1 means no batching at all
+        micro_batcher.quote_batcher = MicroBatcher(quote_trip_batch, window_ms=window_ms,
+                                                   max_size=1 if window_ms <= 0 else micro_batcher.BATCH_MAX_SIZE)
+        quote_cache.clear()
+        rps, p50, p99 = asyncio.run(run_load(args.requests, args.concurrency, seed))
+        stats = micro_batcher.quote_batcher.stats()
+        print(f"window {window_ms:>4} ms | {rps:>7.1f} req/s | p50 {p50:6.1f} ms | p99 {p99:6.1f} ms | "
+              f"mean batch {stats['mean_batch_size']:5.1f} | mean queue delay {stats['mean_queue_delay_ms']:.2f} ms")
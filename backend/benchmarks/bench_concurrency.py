@@ -0,0 +1,101 @@
+import sys
+import os
+import time
+import asyncio
+import argparse
+import numpy as np
+import httpx
+
+# Same trick as the tests: look one folder up (the backend folder) for the logic
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import app
+from ranking_engine import get_vehicle_recommendations
+from inference_pool import inference_pool
+
+
+# The old way: model work straight on the event loop (kept here only to compare against)
+async def test_inline(start_lat: float, start_lon: float, end_lat: float, end_lon: float, hour: int, preference: str = "balanced"):
+    return get_vehicle_recommendations(start_lat, start_lon, end_lat, end_lon, hour, preference, True)
+
+
+async def test_pooled(start_lat: float, start_lon: float, end_lat: float, end_lon: float, hour: int, preference: str = "balanced"):
+    return await inference_pool.run(get_vehicle_recommendations, start_lat, start_lon, end_lat, end_lon, hour, preference, True)
+
+
+app.add_api_route("/bench_inline", test_inline, methods=["POST"])
+app.add_api_route("/bench_pooled", test_pooled, methods=["POST"])
+
+
+def percentiles(latencies):
+    if not latencies:
+        return {'p50_ms': None, 'p95_ms': None, 'p99_ms': None}
+    p50, p95, p99 = np.percentile(np.array(latencies) * 1000, [50, 95, 99])
+    return {'p50_ms': float(p50), 'p95_ms': float(p95), 'p99_ms': float(p99)}
+
+
+async def run_load(path, n_requests, concurrency, seed=42):
+    """
+    Fires n_requests quotes at `path` with `concurrency` in flight, while a probe keeps
+    hitting a cheap endpoint. A blocked event loop shows up as slow probe requests.
+    """
+    rng = np.random.default_rng(seed)
+    transport = httpx.ASGITransport(app=app)
+    quote_latencies, probe_latencies, status_counts = [], [], {}
+    done = asyncio.Event()
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        queue = asyncio.Queue()
+        for _ in range(n_requests):
+            queue.put_nowait({
+                'start_lat': rng.uniform(13.32, 13.37), 'start_lon': rng.uniform(74.72, 74.80),
+                'end_lat': rng.uniform(13.32, 13.37), 'end_lon': rng.uniform(74.72, 74.80),
+                'hour': int(rng.integers(6, 24)), 'preference': 'balanced'
+            })
+
+        async def worker():
+            while not queue.empty():
+                params = queue.get_nowait()
+                start = time.perf_counter()
+                response = await client.post(path, params=params)
+                quote_latencies.append(time.perf_counter() - start)
+                status_counts[response.status_code] = status_counts.get(response.status_code, 0) + 1
+
+        async def probe():
+            while not done.is_set():
+                start = time.perf_counter()
+                await client.get("/cache_stats")
+                probe_latencies.append(time.perf_counter() - start)
+                await asyncio.sleep(0.005)
+
+        probe_task = asyncio.create_task(probe())
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+        done.set()
+        await probe_task
+
+    return {
+        'path': path, 'concurrency': concurrency, 'requests': n_requests,
+        'throughput_rps': n_requests / elapsed, 'status': status_counts,
+        'quote': percentiles(quote_latencies), 'probe': percentiles(probe_latencies),
+    }
+
+
+def print_result(result):
+    q, p = result['quote'], result['probe']
+    print(f"{result['path']:<14} c={result['concurrency']:<3} {result['throughput_rps']:>7.1f} req/s | "
+          f"quote p50/p95/p99 {q['p50_ms']:.1f}/{q['p95_ms']:.1f}/{q['p99_ms']:.1f} ms | "
+          f"probe p99 {p['p99_ms']:.1f} ms | status {result['status']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent load test for the quote handlers (in-process, offline).")
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    args = parser.parse_args()
+
+    print(f"\n--- 🚦 Event loop load test ({inference_pool.kind} pool, {inference_pool.max_workers} workers) ---")
+    for concurrency in args.concurrency:
+        for path in ("/bench_inline", "/bench_pooled"):
+            print_result(asyncio.run(run_load(path, args.requests, concurrency)))
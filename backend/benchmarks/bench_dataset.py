@@ -0,0 +1,78 @@
+import sys
+import os
+import json
+import subprocess
+import tempfile
+import time
+
+# Same trick as the tests: look one folder up (the backend folder) for the logic
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from generate_data import write_synthetic_data
+from ride_dataset import load_rides, feature_frame, TRAINING_COLUMNS
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process (VmHWM; unlike ru_maxrss it is not inherited across exec)."""
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    return float('nan')
+
+
+def load_once(mode, path):
+    """Runs in a fresh process, so the peak RSS belongs to this one load only."""
+    import pandas as pd
+
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    if mode == 'csv_pandas':
+        # What train_model.py did before: parse every column, then get_dummies on strings
+        df = pd.read_csv(path)
+        X = pd.get_dummies(df[['hour_of_day', 'trip_distance', 'vehicle_type']])
+    elif mode == 'csv_typed':
+        df = load_rides(TRAINING_COLUMNS, path=path)
+        X = feature_frame(df)
+    elif mode == 'parquet_all':
+        df = load_rides(path=path)
+        X = feature_frame(df)
+    elif mode == 'parquet_projected':
+        df = load_rides(TRAINING_COLUMNS, path=path)
+        X = feature_frame(df)
+    else:
+        raise ValueError(mode)
+    elapsed = time.perf_counter() - start
+    peak = peak_rss_mb()
+    return {'mode': mode, 'rows': len(X), 'seconds': elapsed, 'peak_rss_mb': peak, 'load_rss_mb': peak - baseline}
+
+
+def run_benchmark(n_rows=1_000_000, seed=42):
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "rides.csv")
+        parquet_path = os.path.join(tmp, "rides.parquet")
+        write_synthetic_data(csv_path, n_rows, seed=seed)
+        write_synthetic_data(parquet_path, n_rows, seed=seed, file_format='parquet')
+
+        sizes = {
+            'csv': os.path.getsize(csv_path),
+            'parquet': sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(parquet_path) for f in files),
+        }
+
+        results = []
+        print(f"\n--- 📦 Dataset load: {n_rows:,} rides (CSV {sizes['csv'] / 1e6:.1f} MB, Parquet {sizes['parquet'] / 1e6:.1f} MB) ---")
+        print(f"{'mode':>18} | {'seconds':>8} | {'peak RSS MB':>11} | {'load RSS MB':>11}")
+        for mode, path in [('csv_pandas', csv_path), ('csv_typed', csv_path),
+                           ('parquet_all', parquet_path), ('parquet_projected', parquet_path)]:
+            out = subprocess.run([sys.executable, __file__, '--child', mode, path], capture_output=True, text=True, check=True)
+            result = json.loads(out.stdout.strip().splitlines()[-1])
+            print(f"{mode:>18} | {result['seconds']:>8.2f} | {result['peak_rss_mb']:>11.0f} | {result['load_rss_mb']:>11.0f}")
+            results.append(result)
+    return results
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == '--child':
+        print(json.dumps(load_once(sys.argv[2], sys.argv[3])))
+    else:
+        run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,60 @@
+import sys
+import os
+import time
+import numpy as np
+import joblib
+
+# Same trick as the tests: look one folder up (the backend folder) for the logic
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import ranking_engine
+from forest_engine import CompiledForest
+from model_registry import registry, MODEL_FILE
+
+
+def rows_per_second(predict, X, repeat):
+    predict(X)  # warm up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        predict(X)
+    elapsed = (time.perf_counter() - start) / repeat
+    return elapsed, X.shape[0] / elapsed
+
+
+def run_benchmark(batch_sizes=(5, 100, 1000, 10000), seed=42):
+    model_file = registry.path(MODEL_FILE)
+    if not os.path.exists(model_file):
+        print("❌ Error: eta_model.pkl not found. Please run train_model.py first!")
+        return None
+
+    sk_model = joblib.load(model_file)
+    compiled = CompiledForest.from_model(sk_model, ranking_engine.model_columns)
+    # What the server uses with MODEL_LARGE_BATCH_ROWS=500: the compiled forest for quotes, sklearn from there on
+    served = CompiledForest.from_model(sk_model, ranking_engine.model_columns).use_for_large_batches(sk_model)
+
+    rng = np.random.default_rng(seed)
+    results = []
+    print("\n--- ⏱️ Forest Inference: sklearn vs compiled ---")
+    print(f"{'rows':>7} | {'sklearn ms':>10} | {'compiled ms':>11} | {'compiled rows/s':>15} | {'served ms':>9}")
+    for n_rows in batch_sizes:
+        n_trips = max(1, n_rows // len(ranking_engine.VEHICLE_TYPES))
+        X = np.tile(ranking_engine.FEATURE_TEMPLATE, (n_trips, 1))
+        X[:, ranking_engine.HOUR_COL] = np.repeat(rng.integers(6, 24, n_trips), len(ranking_engine.VEHICLE_TYPES))
+        X[:, ranking_engine.DIST_COL] = np.repeat(rng.uniform(0.5, 9.0, n_trips), len(ranking_engine.VEHICLE_TYPES))
+
+        # Outputs must be identical, not just close
+        assert np.array_equal(sk_model.predict(X), compiled.predict(X))
+        assert np.array_equal(sk_model.predict(X), served.predict(X))
+
+        repeat = 20 if X.shape[0] <= 1000 else 3
+        sk_time, _ = rows_per_second(sk_model.predict, X, repeat)
+        c_time, c_rate = rows_per_second(compiled.predict, X, repeat)
+        s_time, _ = rows_per_second(served.predict, X, repeat)
+        print(f"{X.shape[0]:>7} | {sk_time * 1000:>10.2f} | {c_time * 1000:>11.2f} | {c_rate:>15,.0f} | {s_time * 1000:>9.2f}")
+        results.append({'rows': X.shape[0], 'sklearn_ms': sk_time * 1000, 'compiled_ms': c_time * 1000,
+                        'served_ms': s_time * 1000})
+    return results
+
+
+if __name__ == "__main__":
+    run_benchmark()
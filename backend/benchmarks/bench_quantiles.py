@@ -0,0 +1,78 @@
+import sys
+import os
+import time
+import argparse
+import numpy as np
+
+# Same trick as the tests: look one folder up (the backend folder) for the logic
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from ranking_engine import get_vehicle_recommendations, get_batch_recommendations
+from model_registry import registry
+
+# The quantile quote may cost at most this much more than the same quote without a range
+MAX_OVERHEAD = 0.25
+
+
+def median_us(fn, trips, repeat):
+    fn(trips[0])  # warm up
+    timings = np.empty(repeat)
+    for i in range(repeat):
+        trip = trips[i % len(trips)]
+        start = time.perf_counter()
+        fn(trip)
+        timings[i] = time.perf_counter() - start
+    return float(np.median(timings) * 1e6)
+
+
+def run_benchmark(n_trips=200, repeat=2000, batch_size=64, seed=42):
+    bundle = registry.get()
+    if bundle.model is None:
+        print("❌ Error: Model not loaded. Please run train_model.py first!")
+        return None
+
+    rng = np.random.default_rng(seed)
+    trips = [
+        (rng.uniform(13.32, 13.37), rng.uniform(74.72, 74.80), rng.uniform(13.32, 13.37), rng.uniform(74.72, 74.80),
+         int(rng.integers(6, 24)))
+        for _ in range(n_trips)
+    ]
+    columns = [list(c) for c in zip(*trips[:batch_size])]
+
+    # (name, mean-only version, with the p10/p50/p90 range)
+    cases = [
+        ("single, precise", lambda t: get_vehicle_recommendations(*t, 'fastest', precise=True),
+         lambda t: get_vehicle_recommendations(*t, 'fastest', precise=True, quantiles=True)),
+        ("single, ETA table", lambda t: get_vehicle_recommendations(*t, 'fastest'),
+         lambda t: get_vehicle_recommendations(*t, 'fastest', quantiles=True)),
+        ("single, reliable ranking", lambda t: get_vehicle_recommendations(*t, 'fastest', precise=True),
+         lambda t: get_vehicle_recommendations(*t, 'reliable', precise=True)),
+        (f"batch of {batch_size}, precise", lambda t: get_batch_recommendations(*columns, 'fastest', precise=True),
+         lambda t: get_batch_recommendations(*columns, 'fastest', precise=True, quantiles=True)),
+    ]
+
+    print(f"\n--- 📏 Quantile ETAs: added latency ({type(bundle.model).__name__}, median of {repeat} quotes) ---")
+    results = []
+    for name, mean_only, ranged in cases:
+        base, with_range = median_us(mean_only, trips, repeat), median_us(ranged, trips, repeat)
+        overhead = with_range / base - 1
+        results.append({'case': name, 'mean_only_us': base, 'quantiles_us': with_range, 'overhead': overhead})
+        print(f"{name:<26} {base:>9.1f} µs -> {with_range:>9.1f} µs ({overhead:+.1%})")
+
+    # Same traversal either way, so the range should only add the sort of the tree values
+    same_pass = [r for r in results if 'precise' in r['case'] or 'reliable' in r['case']]
+    worst = max(r['overhead'] for r in same_pass)
+    print(f"\nWorst overhead on the same model pass: {worst:+.1%} "
+          f"({'✅ within' if worst <= MAX_OVERHEAD else '❌ above'} the {MAX_OVERHEAD:.0%} bound)")
+    print("The ETA table answers without the model, so a range there costs one model pass.")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latency of p10/p50/p90 ETA quotes vs mean-only quotes.")
+    parser.add_argument("--trips", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    run_benchmark(args.trips, args.repeat, args.batch_size, args.seed)
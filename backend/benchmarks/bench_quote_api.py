@@ -0,0 +1,213 @@
+import sys
+import os
+import json
+import time
+import asyncio
+import argparse
+import platform
+import subprocess
+import numpy as np
+import httpx
+
+# Same trick as the tests: look one folder up (the backend folder) for the logic
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import main
+import app as console
+import ranking_engine
+from ranking_engine import get_vehicle_recommendations
+from model_registry import registry
+from quote_cache import quote_cache
+from quote_response import encode_recommendations
+from ride_dataset import dataset_path, load_rides
+from geodesy import LAT_MIN, LAT_MAX, LON_MIN, LON_MAX
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+PREFERENCES = ['balanced', 'fastest', 'cheapest']
+# A result this much slower than the baseline is flagged by --compare
+REGRESSION_TOLERANCE = 0.10
+
+
+def sample_trips(n_trips, data_path=None, seed=42):
+    """
+    Trip mix replayed by the load test: real rides sampled from the dataset (coordinates and hour),
+    with a random preference each. Falls back to uniform trips over the map without a dataset.
+    """
+    rng = np.random.default_rng(seed)
+    data_path = data_path or dataset_path()
+    if data_path is not None:
+        rides = load_rides(['start_lat', 'start_lon', 'end_lat', 'end_lon', 'hour_of_day'], path=data_path)
+        rows = rides.iloc[rng.integers(0, len(rides), n_trips)]
+        columns = [rows[c].to_numpy(np.float64) for c in ('start_lat', 'start_lon', 'end_lat', 'end_lon')]
+        hours = rows['hour_of_day'].to_numpy(np.int64)
+    else:
+        columns = [rng.uniform(lo, hi, n_trips) for lo, hi in
+                   ((LAT_MIN, LAT_MAX), (LON_MIN, LON_MAX), (LAT_MIN, LAT_MAX), (LON_MIN, LON_MAX))]
+        hours = rng.integers(6, 24, n_trips)
+    preferences = rng.choice(PREFERENCES, n_trips)
+    return [
+        {'start_lat': round(float(a), 4), 'start_lon': round(float(b), 4), 'end_lat': round(float(c), 4),
+         'end_lon': round(float(d), 4), 'hour': int(h), 'preference': str(p)}
+        for a, b, c, d, h, p in zip(*columns, hours, preferences)
+    ]
+
+
+def latency_summary(latencies):
+    p50, p95, p99 = np.percentile(np.asarray(latencies) * 1000, [50, 95, 99])
+    return {'p50_ms': float(p50), 'p95_ms': float(p95), 'p99_ms': float(p99), 'mean_ms': float(np.mean(latencies) * 1000)}
+
+
+async def run_load(asgi_app, path, trips, concurrency, form=False):
+    """Replays `trips` against one route with `concurrency` requests in flight (in-process, no sockets)."""
+    transport = httpx.ASGITransport(app=asgi_app)
+    latencies, status_counts = [], {}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        queue = asyncio.Queue()
+        for trip in trips:
+            queue.put_nowait(trip)
+
+        async def worker():
+            while not queue.empty():
+                trip = queue.get_nowait()
+                start = time.perf_counter()
+                if form:
+                    response = await client.post(path, data=trip)
+                else:
+                    response = await client.post(path, params=trip)
+                latencies.append(time.perf_counter() - start)
+                status_counts[str(response.status_code)] = status_counts.get(str(response.status_code), 0) + 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    return {'path': path, 'concurrency': concurrency, 'requests': len(trips),
+            'throughput_rps': len(trips) / elapsed, 'status': status_counts, **latency_summary(latencies)}
+
+
+def time_call(fn, repeat):
+    """Median and p99 of `repeat` calls of fn(i), in µs."""
+    fn(0)  # warm up
+    timings = np.empty(repeat)
+    for i in range(repeat):
+        start = time.perf_counter()
+        fn(i)
+        timings[i] = time.perf_counter() - start
+    return {'median_us': float(np.median(timings) * 1e6), 'p99_us': float(np.percentile(timings, 99) * 1e6)}
+
+
+def micro_benchmarks(trips, repeat=2000):
+    """The stages of one quote, timed on their own."""
+    args = [(t['start_lat'], t['start_lon'], t['end_lat'], t['end_lon'], t['hour'], t['preference']) for t in trips]
+    model = registry.get().model
+    features = ranking_engine.build_feature_matrix(14, 3.2)
+    response = get_vehicle_recommendations(*args[0])
+
+    return {
+        'recommendations_table_us': time_call(lambda i: get_vehicle_recommendations(*args[i % len(args)]), repeat),
+        'recommendations_precise_us': time_call(lambda i: get_vehicle_recommendations(*args[i % len(args)], precise=True), repeat),
+        'model_predict_us': time_call(lambda i: model.predict(features), repeat),
+        # What /predict_ride does with a result (quote_response.py)
+        'serialize_json_us': time_call(lambda i: encode_recommendations(response).encode(), repeat),
+    }
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True).stdout.strip())
+        return commit + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(n_requests=400, concurrency=(1, 8, 32), micro_repeat=2000, data_path=None, seed=42):
+    bundle = registry.get()
+    if bundle.model is None:
+        print("❌ Error: Model not loaded. Please run train_model.py first!")
+        return None
+
+    trips = sample_trips(n_requests, data_path, seed)
+    results = {
+        'commit': git_commit(),
+        'timestamp': time.time(),
+        'python': platform.python_version(),
+        'model_version': bundle.version,
+        'model_kind': type(bundle.model).__name__,
+        'requests': n_requests,
+        'load': [],
+    }
+
+    print(f"\n--- 🚦 Quote API load test: {n_requests} sampled trips per run (model {bundle.version}) ---")
+    for c in concurrency:
+        for asgi_app, path, form in ((main.app, "/predict_ride", False), (console.app, "/test", True)):
+            # Every run starts cold, so the cache does not hide what the previous run computed
+            quote_cache.clear()
+            result = asyncio.run(run_load(asgi_app, path, trips, c, form))
+            results['load'].append(result)
+            print(f"{path:<14} c={c:<3} {result['throughput_rps']:>8.1f} req/s | "
+                  f"p50/p95/p99 {result['p50_ms']:.2f}/{result['p95_ms']:.2f}/{result['p99_ms']:.2f} ms | status {result['status']}")
+
+    results['micro'] = micro_benchmarks(trips, micro_repeat)
+    print("\n--- 🔬 Per-stage cost (median / p99) ---")
+    for name, timing in results['micro'].items():
+        print(f"{name:<28} {timing['median_us']:>9.1f} / {timing['p99_us']:>9.1f} µs")
+    return results
+
+
+def save_results(results, out=None):
+    if out is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        out = os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{results['commit'] or 'nogit'}.json")
+    with open(out, 'w') as f:
+        json.dump(results, f, indent=2)
+    return out
+
+
+def compare(baseline, current, tolerance=REGRESSION_TOLERANCE):
+    """Rows of (metric, baseline, current, change, regressed) for every number both runs have."""
+    rows = []
+    base_load = {(r['path'], r['concurrency']): r for r in baseline.get('load', [])}
+    for r in current.get('load', []):
+        old = base_load.get((r['path'], r['concurrency']))
+        if old is None:
+            continue
+        name = f"{r['path']} c={r['concurrency']}"
+        # Throughput regresses when it drops, latency when it rises
+        rows.append((f"{name} req/s", old['throughput_rps'], r['throughput_rps'], -1))
+        rows.append((f"{name} p99 ms", old['p99_ms'], r['p99_ms'], 1))
+    for name, timing in current.get('micro', {}).items():
+        if name in baseline.get('micro', {}):
+            rows.append((f"{name} median", baseline['micro'][name]['median_us'], timing['median_us'], 1))
+    return [(name, old, new, new / old - 1, (new / old - 1) * sign > tolerance) for name, old, new, sign in rows if old]
+
+
+def print_comparison(rows, baseline, current):
+    print(f"\n--- 📊 {baseline.get('commit')} -> {current.get('commit')} ---")
+    for name, old, new, change, regressed in rows:
+        print(f"{'❌' if regressed else '  '} {name:<34} {old:>10.2f} -> {new:>10.2f} ({change:+.1%})")
+    n_regressed = sum(r[4] for r in rows)
+    print(f"{n_regressed} regression(s) beyond {REGRESSION_TOLERANCE:.0%}")
+    return n_regressed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline load and latency suite for /predict_ride and /test.")
+    parser.add_argument("--requests", type=int, default=400, help="trips per load run")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--micro-repeat", type=int, default=2000)
+    parser.add_argument("--data", default=None, help="rides to sample trips from (default: data/rides_dataset.parquet or .csv)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default=None, help=f"results file (default: {RESULTS_DIR}/<time>-<commit>.json)")
+    parser.add_argument("--compare", default=None, help="an earlier results file to compare with (exit code 1 on regressions)")
+    args = parser.parse_args()
+
+    results = run_suite(args.requests, args.concurrency, args.micro_repeat, args.data, args.seed)
+    if results is None:
+        sys.exit(1)
+    print(f"\n💾 Results saved to: {save_results(results, args.out)}")
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if print_comparison(compare(baseline, results), baseline, results):
+            sys.exit(1)
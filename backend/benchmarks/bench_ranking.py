@@ -0,0 +1,110 @@
+import sys
+import os
+import time
+import numpy as np
+import pandas as pd
+
+# Same trick as the tests: look one folder up (the backend folder) for the logic
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import ranking_engine
+from ranking_engine import get_vehicle_recommendations
+from model_registry import registry
+from geodesy import trip_distance
+from surge_engine import rush_hour
+
+
+def legacy_recommendations(start_lat, start_lon, end_lat, end_lon, hour, preference='balanced'):
+    """The old per-vehicle loop (one DataFrame + one predict per vehicle), kept for comparison."""
+    model = registry.get().model
+    dist = trip_distance(start_lat, start_lon, end_lat, end_lon)
+
+    is_rush_hour = rush_hour(hour)
+    surge_multiplier = 1.45 if is_rush_hour else 1.0
+    demand_label = "High" if is_rush_hour else "Normal"
+
+    analysis_output = []
+    for vehicle in ranking_engine.VEHICLE_TYPES:
+        input_dict = {col: 0 for col in ranking_engine.model_columns}
+        input_dict['hour_of_day'] = hour
+        input_dict['trip_distance'] = dist
+        input_dict[f'vehicle_type_{vehicle}'] = 1
+        predicted_eta = model.predict(pd.DataFrame([input_dict]))[0]
+
+        base, rate = ranking_engine.FARE_MAP[vehicle]
+        total_fare = (base + (dist * rate)) * surge_multiplier
+        analysis_output.append({
+            'vehicle': vehicle,
+            'eta': round(predicted_eta, 1),
+            'fare': int(round(total_fare, 0)),
+            'distance': round(dist, 2),
+            'demand': demand_label
+        })
+
+    df = pd.DataFrame(analysis_output)
+    if preference == 'fastest' or preference == '3':
+        df = df.sort_values(by='eta')
+    elif preference == 'cheapest' or preference == '1':
+        df = df.sort_values(by='fare')
+    else:
+        df['score'] = (df['eta'] * 0.6) + (df['fare'] * 0.04)
+        df = df.sort_values(by='score')
+    return df.head(3)
+
+
+def time_per_call(fn, trips, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for trip in trips:
+            fn(*trip)
+    return (time.perf_counter() - start) / (repeat * len(trips))
+
+
+def run_benchmark(n_trips=50, repeat=3, seed=42):
+    """Both paths use whatever model ranking_engine loaded (compiled forest or sklearn)."""
+    if registry.get().model is None:
+        print("❌ Error: Model not loaded. Please run train_model.py first!")
+        return None
+
+    rng = np.random.default_rng(seed)
+    prefs = ['balanced', 'fastest', 'cheapest']
+    trips = [
+        (rng.uniform(13.32, 13.37), rng.uniform(74.72, 74.80),
+         rng.uniform(13.32, 13.37), rng.uniform(74.72, 74.80),
+         int(rng.integers(6, 24)), prefs[i % 3])
+        for i in range(n_trips)
+    ]
+
+    # Sanity check: both paths must pick the same rides with the same numbers
+    # (precise=True skips the ETA table, which is an approximation of the model)
+    for trip in trips:
+        old = legacy_recommendations(*trip).to_dict(orient="records")
+        new = get_vehicle_recommendations(*trip, precise=True)
+        assert [r['vehicle'] for r in old] == [r.vehicle for r in new]
+        assert [r['eta'] for r in old] == [r.eta for r in new]
+        assert [r['fare'] for r in old] == [r.fare for r in new]
+
+    # Warm up both paths once before timing
+    legacy_recommendations(*trips[0])
+    get_vehicle_recommendations(*trips[0])
+
+    precise_trips = [trip + (True,) for trip in trips]
+    before = time_per_call(legacy_recommendations, trips, repeat)
+    after = time_per_call(get_vehicle_recommendations, precise_trips, repeat)
+
+    print("\n--- ⏱️ Per-Quote Latency ---")
+    print(f"Model: {type(registry.get().model).__name__}")
+    print(f"Before (5 x predict + pandas): {before * 1000:.2f} ms")
+    print(f"After  (1 x predict + numpy):  {after * 1000:.2f} ms")
+    print(f"Speedup: {before / after:.1f}x")
+    results = {'before_ms': before * 1000, 'after_ms': after * 1000}
+
+    if registry.get().eta_surface is not None:
+        table = time_per_call(get_vehicle_recommendations, trips, repeat)
+        print(f"ETA table lookup:              {table * 1000:.3f} ms")
+        results['table_ms'] = table * 1000
+    return results
+
+
+if __name__ == "__main__":
+    run_benchmark()
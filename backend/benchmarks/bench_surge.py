@@ -0,0 +1,99 @@
+import sys
+import os
+import time
+import argparse
+import numpy as np
+
+# Same trick as the tests: look one folder up (the backend folder) for the logic
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from geodesy import LAT_MIN, LAT_MAX, LON_MIN, LON_MAX
+from surge_engine import SurgeEngine, BASELINE_PER_MIN
+
+# Where the replayed rush happens (Manipal, around the university) and a quiet spot to compare with
+HOTSPOT = (13.3525, 74.7868)
+QUIET = (13.3250, 74.7250)
+
+
+def synthetic_requests(n_requests, n_zones, normal_share=0.5, event_share=0.2, seed=42):
+    """
+    A day-like stream of quote requests: (seconds, lats, lons) sorted by time.
+    Background demand is spread evenly at normal_share x the surge baseline per zone;
+    event_share of all requests pile onto the hotspot in the middle fifth of the stream.
+    """
+    rng = np.random.default_rng(seed)
+    n_event = int(n_requests * event_share)
+    n_base = n_requests - n_event
+    duration = n_base / (n_zones * BASELINE_PER_MIN * normal_share) * 60
+
+    times = np.concatenate([rng.uniform(0, duration, n_base), rng.uniform(0.4 * duration, 0.6 * duration, n_event)])
+    lats = np.concatenate([rng.uniform(LAT_MIN, LAT_MAX, n_base), rng.normal(HOTSPOT[0], 0.002, n_event)])
+    lons = np.concatenate([rng.uniform(LON_MIN, LON_MAX, n_base), rng.normal(HOTSPOT[1], 0.002, n_event)])
+    order = np.argsort(times, kind='stable')
+    return times[order], lats[order], lons[order]
+
+
+def replay_per_request(engine, times, lats, lons):
+    """The request path: every quote records itself and reads its zone's multiplier."""
+    record, multiplier = engine.record, engine.multiplier
+    start = time.perf_counter()
+    for t, lat, lon in zip(times.tolist(), lats.tolist(), lons.tolist()):
+        record(lat, lon, now=t)
+        multiplier(lat, lon, now=t)
+    return time.perf_counter() - start
+
+
+def replay_vectorized(engine, times, lats, lons, samples=12):
+    """Whole buckets at a time with record_many. Also returns a multiplier timeline."""
+    buckets = (times // engine.bucket_seconds).astype(np.int64)
+    bounds = np.flatnonzero(np.diff(buckets)) + 1
+    starts, ends = np.concatenate([[0], bounds]), np.concatenate([bounds, [len(times)]])
+    every = max(1, len(starts) // samples)
+    timeline = []
+
+    start = time.perf_counter()
+    for i, (lo, hi) in enumerate(zip(starts, ends)):
+        engine.record_many(lats[lo:hi], lons[lo:hi], now=times[lo])
+        if i % every == 0:
+            now = times[lo]
+            timeline.append({
+                'minute': now / 60,
+                'hotspot': engine.multiplier(*HOTSPOT, now=now),
+                'quiet': engine.multiplier(*QUIET, now=now),
+                'zones_surging': int(np.count_nonzero(engine.multipliers > 1.0)),
+            })
+    return time.perf_counter() - start, timeline
+
+
+def run_benchmark(n_requests=2_000_000, per_request=1_000_000, seed=42):
+    times, lats, lons = synthetic_requests(n_requests, SurgeEngine(enabled=True).grid.n_zones, seed=seed)
+    print(f"\n--- 🚦 Surge Replay: {n_requests:,} quote requests over {times[-1] / 3600:.1f} simulated hours ---")
+
+    n = min(per_request, n_requests)
+    engine = SurgeEngine(enabled=True, clock=lambda: 0.0)
+    elapsed = replay_per_request(engine, times[:n], lats[:n], lons[:n])
+    print(f"Request path (record + multiplier): {elapsed / n * 1e6:.2f} µs per quote ({n / elapsed:,.0f} quotes/s, {n:,} replayed)")
+
+    engine = SurgeEngine(enabled=True, clock=lambda: 0.0)
+    vec_elapsed, timeline = replay_vectorized(engine, times, lats, lons)
+    print(f"Bucketed replay (record_many):      {n_requests / vec_elapsed:,.0f} requests/s")
+
+    print(f"\n{'minute':>7} | {'hotspot':>7} | {'quiet':>5} | {'zones surging':>13}")
+    for row in timeline:
+        print(f"{row['minute']:>7.0f} | {row['hotspot']:>6.2f}x | {row['quiet']:>4.2f}x | {row['zones_surging']:>13}")
+
+    return {
+        'requests': n_requests,
+        'per_request_us': elapsed / n * 1e6,
+        'replay_requests_per_s': n_requests / vec_elapsed,
+        'timeline': timeline,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay synthetic quote traffic through the live surge engine.")
+    parser.add_argument("--requests", type=int, default=2_000_000)
+    parser.add_argument("--per-request", type=int, default=1_000_000, help="how many of them go through the per-request path")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    run_benchmark(args.requests, args.per_request, args.seed)
@@ -0,0 +1,125 @@
+import sys
+import os
+import time
+import signal
+import asyncio
+import argparse
+import subprocess
+import multiprocessing
+import numpy as np
+import httpx
+
+# Same trick as the tests: look one folder up (the backend folder) for the logic
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(BACKEND_DIR)
+
+
+def latency_summary(latencies):
+    p50, p99 = np.percentile(np.asarray(latencies) * 1000, [50, 99])
+    return {'p50_ms': float(p50), 'p99_ms': float(p99)}
+
+
+def start_server(workers, port, app_target="main:app"):
+    """Starts prefork_server.py and waits for its 'workers serving' line."""
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(BACKEND_DIR, "prefork_server.py"), "--app", app_target,
+         "--workers", str(workers), "--port", str(port)],
+        cwd=BACKEND_DIR, stdout=subprocess.PIPE, text=True)
+    for line in process.stdout:
+        if "workers serving" in line:
+            return process
+    raise RuntimeError(f"prefork_server.py exited with {process.wait()}")
+
+
+def stop_server(process):
+    process.send_signal(signal.SIGTERM)
+    process.wait(timeout=60)
+
+
+def worker_memory(launcher_pid):
+    """RSS and PSS (shared pages split between the processes using them) of every worker, in MB."""
+    try:
+        with open(f"/proc/{launcher_pid}/task/{launcher_pid}/children") as f:
+            pids = [int(pid) for pid in f.read().split()]
+    except OSError:
+        return []  # not Linux
+    memory = []
+    for pid in pids:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line and not line.startswith("0"))
+        memory.append({name: int(fields[name].split()[0]) / 1024 for name in ("Rss", "Pss")})
+    return memory
+
+
+async def client_load(url, trips, concurrency):
+    latencies, errors = [], 0
+    began = time.time()
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30) as client:
+        queue = asyncio.Queue()
+        for trip in trips:
+            queue.put_nowait(trip)
+
+        async def worker():
+            nonlocal errors
+            while not queue.empty():
+                trip = queue.get_nowait()
+                start = time.perf_counter()
+                response = await client.post("/predict_ride", params=trip)
+                latencies.append(time.perf_counter() - start)
+                errors += response.status_code != 200
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, began, time.time()
+
+
+def run_client(args):
+    return asyncio.run(client_load(*args))
+
+
+def run_load(url, trips, concurrency, clients):
+    """Real HTTP load from `clients` processes, so the load generator is not the bottleneck."""
+    shares = [(url, trips[i::clients], max(1, concurrency // clients)) for i in range(clients)]
+    with multiprocessing.get_context("spawn").Pool(clients) as pool:
+        results = pool.map(run_client, shares)
+    # From the first client starting to the last one finishing (not counting process start-up)
+    elapsed = max(r[3] for r in results) - min(r[2] for r in results)
+    latencies = [latency for result in results for latency in result[0]]
+    return {'throughput_rps': len(latencies) / elapsed, 'errors': sum(r[1] for r in results), **latency_summary(latencies)}
+
+
+def run_benchmark(worker_counts=(1, 2, 4), n_requests=4000, concurrency=64, clients=2, port=8765, seed=42):
+    # Imported here, not at the top: the spawned client processes re-import this file and don't need the app
+    from bench_quote_api import sample_trips
+
+    trips = sample_trips(n_requests, seed=seed)
+    print(f"\n--- 🏭 Worker scaling: {n_requests} /predict_ride quotes, {concurrency} in flight, "
+          f"{clients} client processes, {os.cpu_count()} CPU cores ---")
+    results = []
+    for workers in worker_counts:
+        server = start_server(workers, port)
+        try:
+            memory = worker_memory(server.pid)
+            result = run_load(f"http://127.0.0.1:{port}", trips, concurrency, clients)
+        finally:
+            stop_server(server)
+        result.update({'workers': workers,
+                       'rss_mb': sum(m['Rss'] for m in memory), 'pss_mb': sum(m['Pss'] for m in memory)})
+        results.append(result)
+        speedup = result['throughput_rps'] / results[0]['throughput_rps']
+        print(f"{workers:>2} workers: {result['throughput_rps']:>8.1f} req/s ({speedup:.2f}x) | "
+              f"p50/p99 {result['p50_ms']:.1f}/{result['p99_ms']:.1f} ms | errors {result['errors']} | "
+              f"memory RSS {result['rss_mb']:.0f} MB, PSS {result['pss_mb']:.0f} MB")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Throughput of prefork_server.py by number of workers.")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--requests", type=int, default=4000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--clients", type=int, default=2, help="load generator processes")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    run_benchmark(args.workers, args.requests, args.concurrency, args.clients, args.port, args.seed)
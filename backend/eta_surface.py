@@ -0,0 +1,137 @@
+import numpy as np
+import os
+
+# The ETA model only looks at hour, distance and vehicle type,
+# so we can ask it once for a fine grid of those and just read answers from a table later.
+SURFACE_FILE = "eta_surface.npz"
+
+# Default grid: every service hour, 0.5 km to 11 km (the Udupi-Manipal box is ~10.5 km corner to corner)
+DEFAULT_HOURS = range(6, 24)
+DEFAULT_DIST_MIN = 0.5
+DEFAULT_DIST_MAX = 11.0
+DEFAULT_DIST_STEP = 0.01
+DEFAULT_VEHICLES = ['Bike', 'Auto', 'Mini', 'Sedan', 'SUV']
+
+
+def grid_features(columns, vehicles, hours, dists):
+    """
+    Model input rows for every (hour, distance) pair x every vehicle.
+    Rows are ordered point -> vehicle, so predictions reshape straight to (points, vehicles).
+    """
+    n_vehicles = len(vehicles)
+    features = np.zeros((len(hours) * n_vehicles, len(columns)), dtype=np.float64)
+    features[:, columns.index('hour_of_day')] = np.repeat(hours, n_vehicles)
+    features[:, columns.index('trip_distance')] = np.repeat(dists, n_vehicles)
+    for i, vehicle in enumerate(vehicles):
+        v_col = f'vehicle_type_{vehicle}'
+        if v_col in columns:
+            features[i::n_vehicles, columns.index(v_col)] = 1
+    return features
+
+
+class EtaSurface:
+    """
+    Dense (hour x distance x vehicle) table of model ETAs.
+
+    Lookups snap the distance to the nearest grid point, so the answer can differ
+    from the live model where a tree split falls between two grid points.
+    A smaller dist_step means a bigger table but a smaller error (see error_report).
+    """
+
+    def __init__(self, table, hour_min, dist_min, dist_step, vehicles):
+        self.table = table
+        self.hour_min = int(hour_min)
+        self.hour_max = self.hour_min + table.shape[0] - 1
+        self.dist_min = float(dist_min)
+        self.dist_step = float(dist_step)
+        self.dist_max = self.dist_min + (table.shape[1] - 1) * self.dist_step
+        self.vehicles = list(vehicles)
+
+    @classmethod
+    def build(cls, model, columns, vehicles=DEFAULT_VEHICLES,
+              hours=DEFAULT_HOURS, dist_min=DEFAULT_DIST_MIN, dist_max=DEFAULT_DIST_MAX, dist_step=DEFAULT_DIST_STEP):
+        """Fills the table with one batched model.predict over every grid point."""
+        hours = np.arange(min(hours), max(hours) + 1)
+        n_dists = int(round((dist_max - dist_min) / dist_step)) + 1
+        dists = dist_min + np.arange(n_dists) * dist_step
+
+        # Points are ordered hour -> distance so the result reshapes straight into the table
+        hour_grid, dist_grid = np.meshgrid(hours, dists, indexing='ij')
+        features = grid_features(list(columns), vehicles, hour_grid.ravel(), dist_grid.ravel())
+        table = model.predict(features).reshape(len(hours), n_dists, len(vehicles))
+        return cls(table, hours[0], dist_min, dist_step, vehicles)
+
+    def save(self, path):
+        np.savez(path, table=self.table, hour_min=self.hour_min, dist_min=self.dist_min,
+                 dist_step=self.dist_step, vehicles=np.array(self.vehicles))
+        return path
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data['table'], data['hour_min'], data['dist_min'], data['dist_step'], list(data['vehicles']))
+
+    def covers(self, hours, dists):
+        """True where the (hour, distance) pair is inside the table (works on scalars and arrays)."""
+        hours = np.asarray(hours)
+        dists = np.asarray(dists)
+        return (hours >= self.hour_min) & (hours <= self.hour_max) & (dists >= self.dist_min) & (dists <= self.dist_max)
+
+    def lookup(self, hours, dists):
+        """
+        Returns ETAs for every vehicle: shape (5,) for one trip or (n, 5) for arrays.
+        Only call this for points where covers() is True.
+        """
+        hour_idx = np.asarray(hours, dtype=np.int64) - self.hour_min
+        dist_idx = np.rint((np.asarray(dists, dtype=np.float64) - self.dist_min) / self.dist_step).astype(np.int64)
+        return self.table[hour_idx, dist_idx]
+
+    def error_report(self, model, columns, n_samples=20000, seed=42):
+        """
+        Compares the table against the live model on random points inside the grid.
+        Returns MAE / max error in minutes and the share of quotes whose shown ETA (1 decimal) would change.
+        """
+        rng = np.random.default_rng(seed)
+        hours = rng.integers(self.hour_min, self.hour_max + 1, n_samples)
+        dists = rng.uniform(self.dist_min, self.dist_max, n_samples)
+
+        features = grid_features(list(columns), self.vehicles, hours, dists)
+        exact = model.predict(features).reshape(n_samples, len(self.vehicles))
+        approx = self.lookup(hours, dists)
+
+        errors = np.abs(approx - exact)
+        return {
+            'mae_min': float(errors.mean()),
+            'max_error_min': float(errors.max()),
+            'rounded_mismatch_pct': float(np.mean(np.round(approx, 1) != np.round(exact, 1)) * 100),
+            'table_mb': self.table.nbytes / 1e6,
+        }
+
+
+def print_error_report(report):
+    print("\n--- 📐 ETA Surface vs Live Model ---")
+    print(f"MAE:       {report['mae_min']:.4f} min")
+    print(f"Max error: {report['max_error_min']:.3f} min")
+    print(f"Shown ETA changed: {report['rounded_mismatch_pct']:.2f}% of quotes")
+    print(f"Table size: {report['table_mb']:.2f} MB")
+
+
+if __name__ == "__main__":
+    # Build the table from the current model and check how close it is
+    import argparse
+    import ranking_engine
+    from model_registry import registry
+
+    parser = argparse.ArgumentParser(description="Build the ETA lookup table from the trained model.")
+    parser.add_argument("--dist-step", type=float, default=DEFAULT_DIST_STEP, help="distance grid step in km")
+    parser.add_argument("--dist-max", type=float, default=DEFAULT_DIST_MAX, help="largest distance in the table (km)")
+    args = parser.parse_args()
+
+    model = registry.get().model
+    if model is None:
+        print("❌ Error: Model not loaded. Please run train_model.py first.")
+    else:
+        surface = ranking_engine.build_eta_surface(dist_step=args.dist_step, dist_max=args.dist_max)
+        print_error_report(surface.error_report(model, ranking_engine.model_columns))
+        path = surface.save(registry.path(SURFACE_FILE))
+        print(f"\n💾 ETA surface saved to: {os.path.abspath(path)}")
@@ -0,0 +1,216 @@
+import os
+import json
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from sklearn.model_selection import train_test_split
+
+from ride_dataset import DATA_DIR, dataset_path
+from hyper_sweep import FEATURE_CACHE_DIR, cached_features, load_features
+from train_model import evaluation_metrics
+
+# Test-set predictions, one .npy per model version, next to the cached feature matrix
+PREDICTIONS_DIR = "predictions"
+# Residual breakdown bands (km)
+DISTANCE_BANDS = [0, 1, 2, 3, 5, 8, 12, np.inf]
+# Above this many test rides the accuracy chart is a hexbin density instead of a scatter
+SCATTER_MAX_POINTS = 20000
+# ...built from at most this many (randomly sampled) rides
+HEXBIN_MAX_POINTS = 500_000
+# Summary of the last evaluation; plots are only redrawn when the model or data changed
+REPORT_FILE = "evaluation.json"
+
+
+def test_indices(n_rows, test_size=0.2, seed=42):
+    """The same 20% test rows train_model.py holds out (the split only depends on n_rows and the seed)."""
+    _, test_idx = train_test_split(np.arange(n_rows), test_size=test_size, random_state=seed)
+    return test_idx
+
+
+def predict_unique(model, X):
+    """
+    Predicts each distinct feature row once. The model only sees hour, distance (2 decimals)
+    and vehicle, so millions of rides collapse to at most ~100k distinct rows.
+    """
+    X = np.ascontiguousarray(X)
+    rows = X.view(np.dtype((np.void, X.dtype.itemsize * X.shape[1]))).ravel()
+    _, first, inverse = np.unique(rows, return_index=True, return_inverse=True)
+    return model.predict(X[first].astype(np.float64))[inverse.ravel()]
+
+
+def cached_predictions(model, version, folder, X_test):
+    """Test-set predictions of this model version, computed once and kept in the feature cache."""
+    path = os.path.join(folder, PREDICTIONS_DIR, f"{version}.npy")
+    if version is not None and os.path.exists(path):
+        return np.load(path), True
+    predictions = predict_unique(model, X_test)
+    if version is not None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        np.save(path + ".tmp.npy", predictions)
+        os.replace(path + ".tmp.npy", path)
+    return predictions, False
+
+
+def group_errors(residuals, groups, labels):
+    """Count, MAE, bias and RMSE of the residuals per group id (one bincount pass each, no Python loop over rows)."""
+    n_groups = len(labels)
+    count = np.bincount(groups, minlength=n_groups)
+    abs_sum = np.bincount(groups, weights=np.abs(residuals), minlength=n_groups)
+    sum_ = np.bincount(groups, weights=residuals, minlength=n_groups)
+    sq_sum = np.bincount(groups, weights=residuals ** 2, minlength=n_groups)
+    safe = np.maximum(count, 1)
+    return [
+        {'group': str(label), 'rides': int(c), 'mae': float(a), 'bias': float(b), 'rmse': float(r)}
+        for label, c, a, b, r in zip(labels, count, abs_sum / safe, sum_ / safe, np.sqrt(sq_sum / safe))
+        if c > 0
+    ]
+
+
+def residual_breakdowns(X_test, residuals, columns):
+    """Error by hour of day, vehicle and distance band (residual = predicted - actual, so bias > 0 means too slow)."""
+    hours = X_test[:, columns.index('hour_of_day')].astype(np.int64)
+    dists = X_test[:, columns.index('trip_distance')]
+    vehicle_cols = [i for i, c in enumerate(columns) if c.startswith('vehicle_type_')]
+    vehicle_names = [columns[i][len('vehicle_type_'):] for i in vehicle_cols]
+    bands = np.clip(np.searchsorted(DISTANCE_BANDS, dists, side='right') - 1, 0, len(DISTANCE_BANDS) - 2)
+    band_labels = [f"{lo:g}-{hi:g} km" for lo, hi in zip(DISTANCE_BANDS[:-1], DISTANCE_BANDS[1:])]
+    return {
+        'hour': group_errors(residuals, hours, list(range(24))),
+        'vehicle': group_errors(residuals, np.argmax(X_test[:, vehicle_cols], axis=1), vehicle_names),
+        'distance_band': group_errors(residuals, bands, band_labels),
+    }
+
+
+def evaluate(model, version, data_path=None, cache_dir=FEATURE_CACHE_DIR):
+    """
+    Metrics and residual breakdowns of `model` on the held-out rides.
+    Reuses the cached feature matrix and, for a known version, the cached predictions.
+    Returns (report, y_test, predictions).
+    """
+    start = time.perf_counter()
+    data_path = data_path or dataset_path()
+    if data_path is None:
+        raise FileNotFoundError(f"No rides dataset in {DATA_DIR}. Please run generate_data.py first.")
+    folder = cached_features(data_path, cache_dir)
+    X, y, columns = load_features(folder)
+    test_idx = test_indices(len(y))
+    X_test, y_test = np.asarray(X[test_idx]), np.asarray(y[test_idx])
+
+    predictions, from_cache = cached_predictions(model, version, folder, X_test)
+    residuals = predictions - y_test
+    report = {
+        'version': version,
+        'dataset': os.path.basename(folder),
+        'test_rows': len(y_test),
+        'predictions_cached': from_cache,
+        **evaluation_metrics(y_test, predictions),
+        'breakdowns': residual_breakdowns(X_test, residuals, columns),
+    }
+    report['seconds'] = time.perf_counter() - start
+    return report, y_test, predictions
+
+
+def _plot_accuracy(path, actual, predicted, hexbin):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(10, 6))
+    if hexbin:
+        # Density instead of millions of overlapping dots
+        collection = ax.hexbin(actual, predicted, gridsize=80, bins='log', cmap='viridis', mincnt=1)
+        fig.colorbar(collection, ax=ax, label='rides (log)')
+    else:
+        ax.scatter(actual, predicted, alpha=0.4, color='teal', s=12)
+    # The red line represents a 100% perfect prediction for reference
+    ax.plot([actual.min(), actual.max()], [actual.min(), actual.max()], 'r--', lw=2)
+    ax.set_xlabel("Actual Trip Time (min)")
+    ax.set_ylabel("AI Predicted Time (min)")
+    ax.set_title("AI Accuracy: Actual vs Predicted Trip Times")
+    fig.savefig(path)
+    plt.close(fig)
+    return path
+
+
+def _plot_residuals(path, breakdowns):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    fig, axes = plt.subplots(1, 3, figsize=(16, 5))
+    for ax, (name, rows) in zip(axes, breakdowns.items()):
+        labels = [r['group'] for r in rows]
+        ax.bar(labels, [r['mae'] for r in rows], color='teal', label='MAE')
+        ax.plot(labels, [r['bias'] for r in rows], 'o-', color='orange', label='bias')
+        ax.axhline(0, color='grey', lw=0.8)
+        ax.set_title(f"Error by {name.replace('_', ' ')}")
+        ax.set_ylabel("minutes")
+        ax.tick_params(axis='x', rotation=45)
+    axes[0].legend()
+    fig.tight_layout()
+    fig.savefig(path)
+    plt.close(fig)
+    return path
+
+
+def _plot_importance(path, feature_names, importances):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    order = np.argsort(importances)
+    fig, ax = plt.subplots(figsize=(10, 6))
+    ax.barh(np.asarray(feature_names)[order], np.asarray(importances)[order], color=plt.cm.viridis(np.linspace(0, 1, len(order))))
+    ax.set_title("What factors drive the AI's ETA predictions?")
+    fig.tight_layout()
+    fig.savefig(path)
+    plt.close(fig)
+    return path
+
+
+def render_plots(report, y_test, predictions, graph_dir, importances=None, workers=3, seed=42):
+    """Draws every chart in its own process (Agg backend) and returns the file paths."""
+    os.makedirs(graph_dir, exist_ok=True)
+    hexbin = len(y_test) > SCATTER_MAX_POINTS
+    actual, predicted = y_test, predictions
+    if len(y_test) > HEXBIN_MAX_POINTS:
+        # A random sample draws the same density picture and is much cheaper to send and bin
+        sample = np.random.default_rng(seed).choice(len(y_test), HEXBIN_MAX_POINTS, replace=False)
+        actual, predicted = y_test[sample], predictions[sample]
+
+    jobs = [
+        (_plot_accuracy, os.path.join(graph_dir, "accuracy_scatter.png"), actual, predicted, hexbin),
+        (_plot_residuals, os.path.join(graph_dir, "residuals.png"), report['breakdowns']),
+    ]
+    if importances is not None:
+        jobs.append((_plot_importance, os.path.join(graph_dir, "feature_importance.png"), *importances))
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as executor:
+        futures = [executor.submit(fn, *args) for fn, *args in jobs]
+        return [future.result() for future in futures]
+
+
+def print_report(report):
+    print(f"\n--- ✅ Model Evaluation ({report['test_rows']:,} test rides, model {report['version']}) ---")
+    print(f"MAE:  {report['mae']:.2f} min")
+    print(f"RMSE: {report['rmse']:.2f} min")
+    print(f"R2:   {report['r2']:.2f}")
+    print(f"MAPE: {report['mape']:.2f}%")
+    for name, rows in report['breakdowns'].items():
+        worst = max(rows, key=lambda r: r['mae'])
+        print(f"Worst {name.replace('_', ' ')}: {worst['group']} (MAE {worst['mae']:.2f}, bias {worst['bias']:+.2f}, {worst['rides']:,} rides)")
+    source = "cached predictions" if report['predictions_cached'] else "fresh predictions"
+    print(f"⏱️ {report['seconds']:.2f} s ({source})")
+
+
+def load_last_report(graph_dir):
+    path = os.path.join(graph_dir, REPORT_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_report(report, graph_dir):
+    with open(os.path.join(graph_dir, REPORT_FILE), 'w') as f:
+        json.dump(report, f, indent=2)
@@ -0,0 +1,260 @@
+import numpy as np
+import joblib
+import os
+import threading
+
+# The random forest flattened into plain arrays.
+# Every tree's nodes are stored back to back, so one quote only touches a few
+# contiguous arrays instead of 250 separate sklearn Tree objects.
+# Saved as a folder of raw .npy files so they can be memory-mapped: every worker
+# process then shares the same pages from the OS cache instead of holding its own copy.
+FOREST_FILE = "eta_forest"
+# From this many rows on, sklearn's compiled tree code beats the NumPy traversal
+# (benchmarks/bench_forest.py: ~1.6x faster at 1000 rows, ~3x at 10000), see CompiledForest.use_for_large_batches
+LARGE_BATCH_ROWS = 500
+
+
+def flatten_forest(model):
+    """
+    Turns a fitted RandomForestRegressor into one set of node arrays.
+
+    children[node] is (left, right) as global offsets into the combined arrays.
+    Leaves point to themselves, so a traversal can run a fixed number of steps
+    without checking which rows have already reached a leaf.
+    """
+    features, thresholds, children, values, roots = [], [], [], [], []
+    offset = 0
+    max_depth = 0
+
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        n_nodes = tree.node_count
+        node_ids = np.arange(n_nodes) + offset
+        is_leaf = tree.children_left == -1
+
+        features.append(np.where(is_leaf, 0, tree.feature))
+        thresholds.append(np.where(is_leaf, 0.0, tree.threshold))
+        left = np.where(is_leaf, node_ids, tree.children_left + offset)
+        right = np.where(is_leaf, node_ids, tree.children_right + offset)
+        children.append(np.stack([left, right], axis=1))
+        values.append(tree.value[:, 0, 0])
+        roots.append(offset)
+
+        offset += n_nodes
+        max_depth = max(max_depth, tree.max_depth)
+
+    return {
+        'feature': np.concatenate(features).astype(np.int32),
+        'threshold': np.concatenate(thresholds).astype(np.float64),
+        'children': np.concatenate(children).astype(np.int32),
+        'value': np.concatenate(values).astype(np.float64),
+        'roots': np.array(roots, dtype=np.int32),
+        'max_depth': np.array(max_depth, dtype=np.int32),
+        'n_features': np.array(model.n_features_in_, dtype=np.int32),
+    }
+
+
+def export_forest(model, path, columns=None):
+    """
+    Saves the flattened forest (plus the feature column order).
+    A path ending in .npz gives one compact file, anything else a folder of .npy files (mmap-able).
+    """
+    arrays = flatten_forest(model)
+    if columns is not None:
+        arrays['columns'] = np.array(columns)
+    return save_forest_arrays(arrays, path)
+
+
+def save_forest_arrays(arrays, path):
+    """Writes already flattened (possibly pruned/quantized) forest arrays, same layout as export_forest."""
+    if path.endswith('.npz'):
+        np.savez(path, **arrays)
+        return path
+
+    os.makedirs(path, exist_ok=True)
+    for name, array in arrays.items():
+        # Write next to the old file and rename over it: a server that has the old
+        # file memory-mapped keeps reading the old data until it reloads
+        final_path = os.path.join(path, f"{name}.npy")
+        with open(final_path + ".tmp", 'wb') as f:
+            np.save(f, array)
+        os.replace(final_path + ".tmp", final_path)
+    return path
+
+
+def same_forest(compiled, model):
+    """True if `compiled` is exactly `model` flattened (not a pruned or quantized copy of it)."""
+    arrays = flatten_forest(model)
+    return all(np.array_equal(arrays[name], getattr(compiled, name))
+               for name in ('feature', 'threshold', 'children', 'value', 'roots'))
+
+
+def tree_predictions(model, X):
+    """
+    Every tree's prediction for every row, (rows x trees): one traversal for a CompiledForest,
+    one predict per tree for an sklearn forest. None for models without trees (e.g. a distilled table).
+    """
+    if hasattr(model, 'leaf_values'):
+        return model.leaf_values(X)
+    if hasattr(model, 'estimators_'):
+        X = np.asarray(X, dtype=np.float32)
+        return np.stack([tree.predict(X, check_input=False) for tree in model.estimators_], axis=1)
+    return None
+
+
+def tree_mean(leaves):
+    """The forest's prediction from tree_predictions (added in tree order, like sklearn)."""
+    return np.cumsum(leaves, axis=1)[:, -1] / leaves.shape[1]
+
+
+def tree_quantiles(leaves, quantiles):
+    """
+    Quantiles of every row's tree predictions, (rows x len(quantiles)).
+    Same linear interpolation as np.quantile, but from one sort: np.quantile's own overhead
+    is several times the cost of a 5-row quote.
+    """
+    ordered = np.sort(leaves, axis=1)
+    position = np.asarray(quantiles, dtype=np.float64) * (leaves.shape[1] - 1)
+    lo = np.floor(position).astype(np.int64)
+    hi = np.minimum(lo + 1, leaves.shape[1] - 1)
+    below, above = ordered[:, lo], ordered[:, hi]
+    return below + (above - below) * (position - lo)
+
+
+class CompiledForest:
+    """
+    NumPy-only predictor for a flattened forest.
+    Drop-in for the sklearn model in ranking_engine: it has the same predict(X).
+
+    It follows sklearn exactly: inputs are cast to float32 before comparing
+    with the (float64) thresholds, and tree outputs are added in tree order
+    before dividing by the number of trees.
+    """
+
+    def __init__(self, arrays, chunk_rows=4096):
+        self.feature = arrays['feature']
+        self.threshold = arrays['threshold']
+        self.children = arrays['children']
+        # (left, right) pairs side by side: the next node is children_flat[2 * node + went_right]
+        self.children_flat = self.children.ravel()
+        self.value = arrays['value']
+        self.roots = arrays['roots']
+        self.max_depth = int(arrays['max_depth'])
+        self.n_features_in_ = int(arrays['n_features'])
+        self.columns = [str(c) for c in arrays['columns']] if 'columns' in arrays else None
+        self.n_estimators = len(self.roots)
+        # Rows per traversal block, keeps the (rows x trees) work arrays small
+        self.chunk_rows = chunk_rows
+        # The same forest as an sklearn model, for big inputs (see use_for_large_batches)
+        self.large_batch_model = None
+        self.large_batch_loader = None
+        self.large_batch_rows = LARGE_BATCH_ROWS
+        self._large_batch_lock = threading.Lock()
+
+    def use_for_large_batches(self, model=None, min_rows=LARGE_BATCH_ROWS, loader=None):
+        """
+        Sends inputs of min_rows rows or more to `model`, the sklearn forest this one was flattened
+        from: the NumPy traversal wins on quotes, sklearn on big batches. Answers are identical.
+        With `loader` instead, the sklearn forest is only loaded (loader() -> model or None) when
+        the first large input comes in, so processes that only serve quotes never hold a copy.
+        """
+        self.large_batch_model = model
+        self.large_batch_loader = loader
+        self.large_batch_rows = min_rows
+        return self
+
+    def _large(self, X):
+        if len(X) < self.large_batch_rows:
+            return False
+        if self.large_batch_loader is not None:
+            with self._large_batch_lock:
+                if self.large_batch_loader is not None:
+                    self.large_batch_model = self.large_batch_loader()
+                    self.large_batch_loader = None
+        return self.large_batch_model is not None
+
+    def to_arrays(self):
+        """The node arrays again (e.g. to save a pruned copy with save_forest_arrays)."""
+        arrays = {
+            'feature': self.feature, 'threshold': self.threshold, 'children': self.children,
+            'value': self.value, 'roots': self.roots,
+            'max_depth': np.array(self.max_depth, dtype=np.int32),
+            'n_features': np.array(self.n_features_in_, dtype=np.int32),
+        }
+        if self.columns is not None:
+            arrays['columns'] = np.array(self.columns)
+        return arrays
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.feature, self.threshold, self.children, self.value, self.roots))
+
+    @classmethod
+    def load(cls, path, mmap=False):
+        """Loads an .npz file or an .npy folder (mmap=True maps the folder's arrays read-only)."""
+        if os.path.isdir(path):
+            arrays = {
+                name[:-4]: np.load(os.path.join(path, name), mmap_mode='r' if mmap else None)
+                for name in os.listdir(path) if name.endswith('.npy')
+            }
+        else:
+            with np.load(path) as data:
+                arrays = {key: data[key] for key in data.files}
+        return cls(arrays)
+
+    @classmethod
+    def from_model(cls, model, columns=None):
+        arrays = flatten_forest(model)
+        if columns is not None:
+            arrays['columns'] = np.array(columns)
+        return cls(arrays)
+
+    def leaf_values(self, X):
+        """Returns a (rows x trees) array with the leaf value every tree picked for every row."""
+        if self._large(X):
+            return tree_predictions(self.large_batch_model, X)
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n_rows, n_features = X.shape
+        out = np.empty((n_rows, self.n_estimators), dtype=np.float64)
+
+        for lo in range(0, n_rows, self.chunk_rows):
+            block = X[lo:lo + self.chunk_rows]
+            flat = block.ravel()
+            row_offsets = (np.arange(block.shape[0], dtype=np.int32) * n_features)[:, None]
+            nodes = np.broadcast_to(self.roots, (block.shape[0], self.n_estimators))
+
+            # Every row walks every tree one level per step (leaves stay put)
+            for _ in range(self.max_depth):
+                went_right = flat[row_offsets + self.feature[nodes]] > self.threshold[nodes]
+                nodes = self.children_flat[2 * nodes + went_right]
+
+            out[lo:lo + self.chunk_rows] = self.value[nodes]
+
+        return out
+
+    def predict(self, X):
+        if self._large(X):
+            return self.large_batch_model.predict(X)
+        # cumsum adds tree by tree (like sklearn), np.sum would use pairwise sums
+        return tree_mean(self.leaf_values(X))
+
+
+if __name__ == "__main__":
+    # Export an already trained eta_model.pkl without retraining
+    model_dir = os.path.dirname(os.path.abspath(__file__))
+    model_file = os.path.join(model_dir, "eta_model.pkl")
+    columns_file = os.path.join(model_dir, "model_columns.pkl")
+
+    if not os.path.exists(model_file):
+        print(f"❌ Error: {model_file} not found. Please run train_model.py first.")
+    else:
+        model = joblib.load(model_file)
+        columns = joblib.load(columns_file) if os.path.exists(columns_file) else None
+        path = export_forest(model, os.path.join(model_dir, FOREST_FILE), columns)
+        print(f"💾 Compiled forest saved to: {os.path.abspath(path)}")
+
+        # Republish, or the registry would see a forest that no longer matches the manifest
+        from hot_reload import write_manifest
+        from model_registry import read_manifest
+        published = (read_manifest(model_dir) or {}).get('files') or ["eta_model.pkl"]
+        write_manifest(model_dir, published + [FOREST_FILE] * (FOREST_FILE not in published), FOREST_FILE)
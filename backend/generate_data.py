@@ -1,79 +1,156 @@
 import pandas as pd
 import numpy as np
-import random
-import time
 import os
+from concurrent.futures import ProcessPoolExecutor
 
-def generate_synthetic_data(num_samples=10000):
-    # Setting the seed so it's random but consistent
-    np.random.seed(int(time.time())) 
-    random.seed(time.time())
-
-    print(f"Generating synthetic data...") 
-    
-    # Udupi and Manipal map boundaries
-    lat_min, lat_max = 13.3200, 13.3700
-    lon_min, lon_max = 74.7200, 74.8000
-    
+# Udupi and Manipal map boundaries, and the distance the server prices with
+from geodesy import LAT_MIN, LAT_MAX, LON_MIN, LON_MAX, SERVICE_GRID, trip_distance as trip_distance_km
+from surge_engine import rush_hours
+
+# Vehicle attributes as arrays indexed by vehicle code, so a whole chunk is
+# looked up with one fancy-index instead of a dict lookup per row
+VEHICLE_TYPES = ['Bike', 'Auto', 'Mini', 'Sedan', 'SUV']
+# Average speeds for different vehicles in the city
+SPEEDS = np.array([42, 28, 32, 38, 35], dtype=np.float64)
+# Base price + per-km rate for each vehicle
+BASE_FARES = np.array([20, 30, 50, 70, 100], dtype=np.float64)
+KM_RATES = np.array([5, 8, 12, 15, 20], dtype=np.float64)
+
+DEFAULT_OUTPUT = os.path.join("data", "rides_dataset.csv")
+# Hour-partitioned Parquet folder with compact dtypes (see ride_dataset.py)
+DEFAULT_PARQUET_OUTPUT = os.path.join("data", "rides_dataset.parquet")
+# Rows per block: ~70 MB of columns at a time, whatever the total row count
+DEFAULT_CHUNK_SIZE = 1_000_000
+
+
+def generate_chunk(num_samples, rng):
+    """
+    One block of synthetic rides as a DataFrame (vehicle_type is a pandas Categorical).
+    Everything is drawn from `rng`, so the same generator state gives the same rows.
+    """
     # Pick random spots for start and end of rides
-    start_lats = np.round(np.random.uniform(lat_min, lat_max, num_samples), 4)
-    start_lons = np.round(np.random.uniform(lon_min, lon_max, num_samples), 4)
-    end_lats = np.round(np.random.uniform(lat_min, lat_max, num_samples), 4)
-    end_lons = np.round(np.random.uniform(lon_min, lon_max, num_samples), 4)
-
-    # Calculate distance using basic geometry (scaled to km)
-    dist = np.sqrt((end_lats - start_lats)**2 + (end_lons - start_lons)**2) * 111
-    trip_distance = np.round(dist, 2)
-    trip_distance = np.where(trip_distance < 0.1, 0.5, trip_distance)
-    
+    start_lats = np.round(rng.uniform(LAT_MIN, LAT_MAX, num_samples), 4)
+    start_lons = np.round(rng.uniform(LON_MIN, LON_MAX, num_samples), 4)
+    end_lats = np.round(rng.uniform(LAT_MIN, LAT_MAX, num_samples), 4)
+    end_lons = np.round(rng.uniform(LON_MIN, LON_MAX, num_samples), 4)
+
+    # Service-area zone of both ends, so zone tables can group rides without redoing the lookup
+    start_zones = SERVICE_GRID.zone_of(start_lats, start_lons).astype(np.uint16)
+    end_zones = SERVICE_GRID.zone_of(end_lats, end_lons).astype(np.uint16)
+
+    # Same distance the server prices and predicts with (see geodesy.DISTANCE_MODE)
+    trip_distance = np.round(trip_distance_km(start_lats, start_lons, end_lats, end_lons), 2)
+
     # Set time from 6 AM to 11 PM
-    hour_of_day = np.random.randint(6, 24, num_samples)
-    vehicle_types = ['Bike', 'Auto', 'Mini', 'Sedan', 'SUV']
-    vehicle_type = np.random.choice(vehicle_types, num_samples)
-    
+    hour_of_day = rng.integers(6, 24, num_samples)
+    vehicle_codes = rng.integers(0, len(VEHICLE_TYPES), num_samples)
+
     # Adding rush hour traffic (Morning and Evening)
     traffic_multiplier = np.ones(num_samples)
-    rush_hour_mask = ((hour_of_day >= 9) & (hour_of_day <= 11)) | ((hour_of_day >= 17) & (hour_of_day <= 20))
-    traffic_multiplier[rush_hour_mask] = np.random.uniform(1.2, 1.8, np.sum(rush_hour_mask))
-    
-    # Average speeds for different vehicles in the city
-    speed_map = {'Bike': 42, 'Auto': 28, 'Mini': 32, 'Sedan': 38, 'SUV': 35}
-    base_speed = np.array([speed_map[v] for v in vehicle_type])
-    
+    rush_hour_mask = rush_hours(hour_of_day)
+    traffic_multiplier[rush_hour_mask] = rng.uniform(1.2, 1.8, np.count_nonzero(rush_hour_mask))
+
     # Adding variance because every driver drives differently
-    speed_variance = np.random.uniform(0.85, 1.15, num_samples)
-    speed = base_speed * speed_variance
-        
+    speed = SPEEDS[vehicle_codes] * rng.uniform(0.85, 1.15, num_samples)
+
     # Basic math for trip duration
     duration_min = (trip_distance / speed) * 60 * traffic_multiplier
-    
+
     # Adding a bit of noise (traffic lights, cows, narrow roads)
     # Reduced this slightly to hit the 0.70-0.75 R2 mark
-    random_noise = np.random.normal(1.0, 2.2, num_samples) 
+    random_noise = rng.normal(1.0, 2.2, num_samples)
     duration_min = np.round(duration_min + random_noise, 1)
-    duration_min = np.maximum(duration_min, 2.5) 
-    
+    duration_min = np.maximum(duration_min, 2.5)
+
     # Estimating fares based on distance and vehicle type
-    fare_map = {'Bike': (20, 5), 'Auto': (30, 8), 'Mini': (50, 12), 'Sedan': (70, 15), 'SUV': (100, 20)}
-    bases = np.array([fare_map[v][0] for v in vehicle_type])
-    rates = np.array([fare_map[v][1] for v in vehicle_type])
-    fare = np.round((bases + (trip_distance * rates)) * traffic_multiplier, 0)
-    
-    # Putting everything into a dictionary
-    data_dict = {
+    fare = np.round((BASE_FARES[vehicle_codes] + (trip_distance * KM_RATES[vehicle_codes])) * traffic_multiplier, 0)
+
+    return pd.DataFrame({
         'start_lat': start_lats, 'start_lon': start_lons,
         'end_lat': end_lats, 'end_lon': end_lons,
-        'hour_of_day': hour_of_day, 'vehicle_type': vehicle_type,
+        'start_zone': start_zones, 'end_zone': end_zones,
+        'hour_of_day': hour_of_day,
+        'vehicle_type': pd.Categorical.from_codes(vehicle_codes, categories=VEHICLE_TYPES),
         'trip_distance': trip_distance, 'duration_min': duration_min,
         'fare': fare.astype(int)
-    }
-    
+    })
+
+
+def _chunk_from_seed(args):
+    # Module-level so process pools can pickle it
+    num_samples, seed_seq = args
+    return generate_chunk(num_samples, np.random.default_rng(seed_seq))
+
+
+def iter_synthetic_chunks(num_samples, chunk_size=DEFAULT_CHUNK_SIZE, seed=None, workers=1):
+    """
+    Yields DataFrames of at most chunk_size rows until num_samples rows have been made.
+
+    Every chunk gets its own child of one SeedSequence, so a given (seed, chunk_size)
+    gives the same rows whether they are made in 1 process or many.
+    seed=None draws fresh entropy (a different dataset every run).
+    workers > 1 builds chunks in a process pool, with at most 2 chunks per worker in flight
+    so memory stays flat even when the consumer (e.g. the CSV writer) is slower.
+    """
+    sizes = [min(chunk_size, num_samples - lo) for lo in range(0, num_samples, chunk_size)]
+    jobs = list(zip(sizes, np.random.SeedSequence(seed).spawn(len(sizes))))
+
+    if workers <= 1:
+        for job in jobs:
+            yield _chunk_from_seed(job)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = []
+        for job in jobs:
+            pending.append(executor.submit(_chunk_from_seed, job))
+            if len(pending) >= 2 * workers:
+                yield pending.pop(0).result()
+        for future in pending:
+            yield future.result()
+
+
+def write_synthetic_data(path, num_samples, chunk_size=DEFAULT_CHUNK_SIZE, seed=None, workers=1, file_format='csv'):
+    """
+    Streams the chunks into one CSV (header once, then appends) or, with file_format='parquet',
+    into the hour-partitioned Parquet folder. Returns the number of rows written.
+    """
+    directory = os.path.dirname(path)
+    if directory and not os.path.exists(directory): os.makedirs(directory)
+
+    chunks = iter_synthetic_chunks(num_samples, chunk_size, seed, workers)
+    if file_format == 'parquet':
+        from ride_dataset import write_parquet
+        return write_parquet(chunks, path)
+
+    written = 0
+    with open(path, 'w', newline='') as f:
+        for chunk in chunks:
+            chunk.to_csv(f, header=written == 0, index=False)
+            written += len(chunk)
+    return written
+
+
+def generate_synthetic_data(num_samples=10000, seed=None, chunk_size=DEFAULT_CHUNK_SIZE, workers=1, output_path=None, file_format='csv'):
+    print(f"Generating synthetic data...")
+
     # Save the file to the data folder
-    output_dir = "data"
-    if not os.path.exists(output_dir): os.makedirs(output_dir)
-    pd.DataFrame(data_dict).to_csv(os.path.join(output_dir, "rides_dataset.csv"), index=False)
-    
-    print(f"Data Generation Complete.\nSaved {num_samples} rows to data/rides_dataset.csv") 
+    if output_path is None:
+        output_path = DEFAULT_PARQUET_OUTPUT if file_format == 'parquet' else DEFAULT_OUTPUT
+    written = write_synthetic_data(output_path, num_samples, chunk_size, seed, workers, file_format)
+
+    print(f"Data Generation Complete.\nSaved {written} rows to {output_path}")
 
 if __name__ == "__main__":
-    generate_synthetic_data(10000)
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Generate the synthetic Udupi-Manipal rides dataset.")
+    parser.add_argument("--rows", type=int, default=10000, help="number of rides to generate")
+    parser.add_argument("--seed", type=int, default=None, help="seed for a reproducible dataset (default: random)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="rows generated and written per block")
+    parser.add_argument("--workers", type=int, default=1, help="processes generating chunks in parallel")
+    parser.add_argument("--format", choices=['csv', 'parquet'], default='csv', help="CSV file or hour-partitioned Parquet folder")
+    parser.add_argument("--output", default=None, help="where to write (default: data/rides_dataset.csv or .parquet)")
+    args = parser.parse_args()
+
+    generate_synthetic_data(args.rows, args.seed, args.chunk_size, args.workers, args.output, args.format)
@@ -0,0 +1,270 @@
+import math
+import os
+import threading
+import numpy as np
+
+# Trip distance for pricing, ETAs and the training data. Everything that needs the distance
+# between two points calls trip_distance(), so the model is trained on the same numbers it is served.
+#
+# DISTANCE_MODE:
+#   euclidean - the old degrees x 111 (ignores that a degree of longitude is shorter at 13°N);
+#               the default while data/rides_dataset.csv is generated with it
+#   haversine - great-circle distance (~1.5% shorter here)
+#   road      - haversine x the road detour between the two zones (precomputed zone-to-zone matrix)
+# A model must be served with the mode its training data was generated with: to switch, set the
+# mode, then run generate_data.py and train_model.py with it.
+DISTANCE_MODE = os.environ.get("DISTANCE_MODE", "euclidean")
+DISTANCE_MODES = ('haversine', 'road', 'euclidean')
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111
+
+# Udupi and Manipal map boundaries
+LAT_MIN, LAT_MAX = 13.3200, 13.3700
+LON_MIN, LON_MAX = 74.7200, 74.8000
+
+# Shorter trips are charged (and predicted) as this minimum, so we don't have 0km rides
+MIN_TRIP_KM = 0.1
+SHORT_TRIP_KM = 0.5
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+# Folder of .npy files (memory-mapped by every worker), built offline: python geodesy.py [--roads roads.csv]
+ROAD_MATRIX_DIR = os.environ.get("ROAD_MATRIX_DIR", os.path.join(BACKEND_DIR, "road_matrix"))
+# ~275 m zones: 20 x 32 = 640 zones, 1.6 MB per float32 zone-to-zone matrix
+ZONE_DEG = 0.0025
+# Coarser ~550 m zones (10 x 16 = 160) that rides are tagged with and zone_tables.py aggregates over
+SERVICE_ZONE_DEG = 0.005
+# Moving across a zone off the listed roads costs this much more than the straight line
+# (typical circuity of an Indian town street grid)
+GRID_DETOUR = 1.3
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km. Works on scalars and on whole arrays of trips."""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(a, dtype=np.float64)) for a in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+def _haversine_scalar(lat1, lon1, lat2, lon2):
+    # math instead of NumPy: several times faster for the one-trip quote path
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def degree_km(lat1, lon1, lat2, lon2):
+    """The old flat-map distance: Euclidean distance in degrees x 111."""
+    return np.sqrt((np.asarray(lat2) - lat1) ** 2 + (np.asarray(lon2) - lon1) ** 2) * KM_PER_DEGREE
+
+
+class ZoneGrid:
+    """
+    Fixed lat/lon grid over the service area. Zone id = row * n_lon + col, row counting
+    latitude bands from the south edge. Points outside the box belong to the nearest edge zone.
+
+    A point within EDGE_SNAP of a zone's upper edge counts as over it, so a 4-decimal coordinate
+    that sits exactly on an edge gets the same zone whether it is stored as float64 or float32.
+    """
+
+    EDGE_SNAP = 1e-3  # in zones (~0.5 m), well above the float32 rounding of a coordinate
+
+    def __init__(self, zone_deg=ZONE_DEG, lat_min=LAT_MIN, lat_max=LAT_MAX, lon_min=LON_MIN, lon_max=LON_MAX):
+        self.zone_deg = float(zone_deg)
+        self.lat_min = float(lat_min)
+        self.lon_min = float(lon_min)
+        self.n_lat = int(round((lat_max - lat_min) / zone_deg))
+        self.n_lon = int(round((lon_max - lon_min) / zone_deg))
+        self.n_zones = self.n_lat * self.n_lon
+
+    def zone_of(self, lat, lon):
+        """Zone id of every point (vectorized)."""
+        row = np.floor((np.asarray(lat, dtype=np.float64) - self.lat_min) / self.zone_deg + self.EDGE_SNAP)
+        col = np.floor((np.asarray(lon, dtype=np.float64) - self.lon_min) / self.zone_deg + self.EDGE_SNAP)
+        row = np.clip(row, 0, self.n_lat - 1).astype(np.int64)
+        col = np.clip(col, 0, self.n_lon - 1).astype(np.int64)
+        return row * self.n_lon + col
+
+    def zone_scalar(self, lat, lon):
+        """Same as zone_of for one point, in plain Python (no NumPy call overhead on the quote path)."""
+        row = min(max(math.floor((lat - self.lat_min) / self.zone_deg + self.EDGE_SNAP), 0), self.n_lat - 1)
+        col = min(max(math.floor((lon - self.lon_min) / self.zone_deg + self.EDGE_SNAP), 0), self.n_lon - 1)
+        return row * self.n_lon + col
+
+    def centres(self):
+        """(lat, lon) of every zone centre, indexed by zone id."""
+        zone = np.arange(self.n_zones)
+        return (self.lat_min + (zone // self.n_lon + 0.5) * self.zone_deg,
+                self.lon_min + (zone % self.n_lon + 0.5) * self.zone_deg)
+
+    def to_array(self):
+        return np.array([self.lat_min, self.lon_min, self.zone_deg, self.n_lat, self.n_lon], dtype=np.float64)
+
+    @classmethod
+    def from_array(cls, array):
+        lat_min, lon_min, zone_deg, n_lat, n_lon = (float(v) for v in array)
+        return cls(zone_deg, lat_min, lat_min + n_lat * zone_deg, lon_min, lon_min + n_lon * zone_deg)
+
+    def __eq__(self, other):
+        return isinstance(other, ZoneGrid) and np.allclose(self.to_array(), other.to_array())
+
+
+SERVICE_GRID = ZoneGrid(SERVICE_ZONE_DEG)
+
+
+class RoadMatrix:
+    """
+    Road distances between the ~275 m zones of the Udupi-Manipal box.
+
+    distance_km[a, b] is the shortest path between the centres of zones a and b, and
+    circuity[a, b] how much longer that is than the straight line (1.0 within a zone).
+    A trip's road distance is its haversine distance x the circuity of its two zones,
+    so two points in the same zone still get their exact distance.
+    Points outside the box use the nearest edge zone.
+    """
+
+    def __init__(self, distance_km, circuity, grid):
+        self.distance_km = distance_km
+        self.circuity = circuity
+        self.grid = grid
+
+    @classmethod
+    def build(cls, road_edges=None, zone_deg=ZONE_DEG, grid_detour=GRID_DETOUR):
+        """
+        All-pairs shortest paths over the zone grid (one Dijkstra run per zone, well under a second).
+
+        Every zone connects to its 8 neighbours at grid_detour x the straight-line distance.
+        road_edges, if given, is a list of (lat1, lon1, lat2, lon2[, length_km]) road segments
+        (e.g. exported from OpenStreetMap); each one links the zones of its two ends directly.
+        """
+        from scipy.sparse import coo_matrix
+        from scipy.sparse.csgraph import shortest_path
+
+        grid = ZoneGrid(zone_deg)
+        n_lat, n_lon = grid.n_lat, grid.n_lon
+        rows, cols = np.divmod(np.arange(grid.n_zones), n_lon)
+        centre_lat, centre_lon = grid.centres()
+
+        sources, targets, weights = [], [], []
+        for d_row, d_col in [(0, 1), (1, 0), (1, 1), (1, -1)]:
+            ok = (rows + d_row < n_lat) & (cols + d_col >= 0) & (cols + d_col < n_lon)
+            a = np.flatnonzero(ok)
+            b = (rows[a] + d_row) * n_lon + cols[a] + d_col
+            sources.append(a)
+            targets.append(b)
+            weights.append(haversine_km(centre_lat[a], centre_lon[a], centre_lat[b], centre_lon[b]) * grid_detour)
+
+        if road_edges is not None and len(road_edges):
+            edges = np.asarray(road_edges, dtype=np.float64)
+            a = grid.zone_of(edges[:, 0], edges[:, 1])
+            b = grid.zone_of(edges[:, 2], edges[:, 3])
+            length = edges[:, 4] if edges.shape[1] > 4 else haversine_km(*edges[:, :4].T)
+            sources.append(a)
+            targets.append(b)
+            weights.append(length)
+
+        graph = coo_matrix((np.concatenate(weights), (np.concatenate(sources), np.concatenate(targets))),
+                           shape=(grid.n_zones, grid.n_zones)).tocsr()
+        distance_km = shortest_path(graph, method='D', directed=False)
+
+        straight = haversine_km(centre_lat[:, None], centre_lon[:, None], centre_lat[None, :], centre_lon[None, :])
+        circuity = np.ones_like(distance_km)
+        apart = straight > 0
+        circuity[apart] = np.maximum(distance_km[apart] / straight[apart], 1.0)
+        return cls(distance_km.astype(np.float32), circuity.astype(np.float32), grid)
+
+    def road_km(self, lat1, lon1, lat2, lon2):
+        """Road distance of every trip: one haversine and one matrix lookup each."""
+        return haversine_km(lat1, lon1, lat2, lon2) * self.circuity[self.grid.zone_of(lat1, lon1), self.grid.zone_of(lat2, lon2)]
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        arrays = {
+            'distance_km': self.distance_km, 'circuity': self.circuity,
+            'grid': self.grid.to_array(),
+        }
+        for name, array in arrays.items():
+            # Write next to the old file and rename over it, like the compiled forest
+            final_path = os.path.join(path, f"{name}.npy")
+            with open(final_path + ".tmp", 'wb') as f:
+                np.save(f, array)
+            os.replace(final_path + ".tmp", final_path)
+        return path
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """mmap=True maps the matrices read-only, so every worker process shares one copy."""
+        mode = 'r' if mmap else None
+        return cls(np.load(os.path.join(path, "distance_km.npy"), mmap_mode=mode),
+                   np.load(os.path.join(path, "circuity.npy"), mmap_mode=mode),
+                   ZoneGrid.from_array(np.load(os.path.join(path, "grid.npy"))))
+
+
+_road_matrix = None
+_road_matrix_lock = threading.Lock()
+
+
+def road_matrix(path=None):
+    """
+    The shared road matrix, memory-mapped from ROAD_MATRIX_DIR. It is never built here (that would
+    put a build and a file write on a request): build it beforehand with `python geodesy.py`.
+    """
+    global _road_matrix
+    if _road_matrix is None:
+        with _road_matrix_lock:
+            if _road_matrix is None:
+                path = path or ROAD_MATRIX_DIR
+                if not os.path.exists(os.path.join(path, "grid.npy")):
+                    raise FileNotFoundError(f"Road matrix not found in {path}. DISTANCE_MODE=road needs it: "
+                                            "run python backend/geodesy.py [--roads roads.csv] first.")
+                _road_matrix = RoadMatrix.load(path)
+    return _road_matrix
+
+
+def trip_distance(start_lat, start_lon, end_lat, end_lon, mode=None):
+    """
+    Trip distance in km with the short-trip minimum applied.
+    Python/NumPy scalars in, float out (the single-quote path); arrays in, array out (batches, data generation).
+    """
+    mode = mode or DISTANCE_MODE
+    if mode not in DISTANCE_MODES:
+        raise ValueError(f"Unknown DISTANCE_MODE {mode!r}, expected one of {DISTANCE_MODES}")
+
+    if all(isinstance(v, (float, int)) for v in (start_lat, start_lon, end_lat, end_lon)):
+        if mode == 'euclidean':
+            dist = math.hypot(end_lat - start_lat, end_lon - start_lon) * KM_PER_DEGREE
+        else:
+            dist = _haversine_scalar(start_lat, start_lon, end_lat, end_lon)
+            if mode == 'road':
+                matrix = road_matrix()
+                grid = matrix.grid
+                dist *= float(matrix.circuity[grid.zone_scalar(start_lat, start_lon), grid.zone_scalar(end_lat, end_lon)])
+        return SHORT_TRIP_KM if dist < MIN_TRIP_KM else float(dist)
+
+    if mode == 'euclidean':
+        dist = degree_km(start_lat, start_lon, end_lat, end_lon)
+    elif mode == 'road':
+        dist = road_matrix().road_km(start_lat, start_lon, end_lat, end_lon)
+    else:
+        dist = haversine_km(start_lat, start_lon, end_lat, end_lon)
+    return np.where(dist < MIN_TRIP_KM, SHORT_TRIP_KM, dist)
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Build the zone-to-zone road distance matrix used by DISTANCE_MODE=road.")
+    parser.add_argument("--roads", default=None, help="CSV of road segments: lat1,lon1,lat2,lon2[,length_km] (default: street grid only)")
+    parser.add_argument("--zone-deg", type=float, default=ZONE_DEG, help="zone size in degrees")
+    parser.add_argument("--detour", type=float, default=GRID_DETOUR, help="detour factor for moves off the listed roads")
+    parser.add_argument("--out", default=ROAD_MATRIX_DIR, help="folder to write")
+    args = parser.parse_args()
+
+    edges = np.loadtxt(args.roads, delimiter=',', skiprows=1, ndmin=2) if args.roads else None
+    start = time.perf_counter()
+    matrix = RoadMatrix.build(edges, args.zone_deg, args.detour)
+    matrix.save(args.out)
+    print(f"🛣️ {matrix.grid.n_zones} zones, median circuity {np.median(matrix.circuity):.2f}, "
+          f"built in {time.perf_counter() - start:.1f} s")
+    print(f"💾 Road matrix saved to: {os.path.abspath(args.out)}")
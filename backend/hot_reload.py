@@ -0,0 +1,287 @@
+import asyncio
+import hmac
+import json
+import os
+import signal
+import threading
+import time
+import numpy as np
+from contextlib import asynccontextmanager
+from fastapi import Header, HTTPException
+
+from model_registry import registry, artifact_version, BACKEND_DIR, MANIFEST_FILE
+from quote_log import quote_log
+
+# --- HOT RELOAD SETTINGS (can be overridden with environment variables) ---
+# 'eager' loads + warms the model when the server starts, 'lazy' waits for the first quote
+MODEL_WARMUP = os.environ.get("MODEL_WARMUP", "eager")
+# How often (seconds) to look for a newly published model, 0 = never (use SIGHUP or /admin/reload)
+MODEL_WATCH_SECONDS = float(os.environ.get("MODEL_WATCH_SECONDS", 0))
+# A new model is refused if its holdout MAE is above this...
+MAX_HOLDOUT_MAE = float(os.environ.get("MODEL_MAX_HOLDOUT_MAE", 4.0))
+# ...or more than this much worse (relative) than the model it would replace
+MAX_MAE_REGRESSION = float(os.environ.get("MODEL_MAX_MAE_REGRESSION", 0.10))
+HOLDOUT_ROWS = int(os.environ.get("MODEL_HOLDOUT_ROWS", 2000))
+# /admin/reload and /admin/rollback need this in an X-Admin-Token header; unset = the routes are off
+MODEL_ADMIN_TOKEN = os.environ.get("MODEL_ADMIN_TOKEN", "")
+# prefork_server.py sets this for its workers: the launcher owns the model, so reloads go through it
+PREFORK_LAUNCHER_ENV = "PREFORK_LAUNCHER_PID"
+
+# train_model.py writes the manifest (MANIFEST_FILE) last, after every artifact is in place.
+# Watching it (not the artifacts) means we never pick up a half-written model.
+DATA_DIR = os.path.join(os.path.dirname(BACKEND_DIR), "data")
+
+_reload_lock = threading.Lock()
+_holdout = None
+_holdout_key = None
+last_reload = {}
+
+
+def write_manifest(output_dir, files, serve):
+    """
+    Called by train_model.py once all artifacts are saved: this is the 'new model is ready' signal.
+    Records the content hash of every file and which one to serve, so the registry only uses
+    artifacts that belong to this model.
+    """
+    versions = {name: artifact_version(os.path.join(output_dir, name)) for name in files}
+    manifest = {'published_at': time.time(), 'files': files, 'versions': versions, 'serve': serve}
+    tmp_path = os.path.join(output_dir, MANIFEST_FILE + ".tmp")
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, os.path.join(output_dir, MANIFEST_FILE))
+
+
+def dataset_stamp(path):
+    """(mtime, size) of the CSV, or of every file in the Parquet folder: changes whenever the dataset is rewritten."""
+    if not os.path.isdir(path):
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+    stats = [os.stat(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names]
+    return max((s.st_mtime_ns for s in stats), default=0), sum(s.st_size for s in stats), len(stats)
+
+
+def load_holdout(columns, n_rows=HOLDOUT_ROWS):
+    """
+    The same 20% test split train_model.py holds out (random_state=42), as NumPy arrays.
+    Kept between reloads so validating the next model is cheap, and rebuilt when the dataset
+    (or the model's columns) change. The features come from the dataset exactly as train_model.py
+    builds them, with the stored trip_distance, so DISTANCE_MODE does not change what is checked.
+    """
+    global _holdout, _holdout_key
+    # Only the reload path needs pandas/sklearn, so they are imported here, not at startup
+    from ride_dataset import dataset_path, load_rides, feature_frame, TRAINING_COLUMNS
+
+    path = dataset_path(DATA_DIR)
+    if path is None:
+        raise FileNotFoundError(f"No rides dataset in {DATA_DIR} to validate the model on.")
+    key = (path, dataset_stamp(path), tuple(columns) if columns is not None else None, n_rows)
+    if _holdout is None or key != _holdout_key:
+        from sklearn.model_selection import train_test_split
+
+        df = load_rides(TRAINING_COLUMNS, path=path)
+        X = feature_frame(df)
+        X = X.reindex(columns=columns, fill_value=0).astype(np.float64)
+        _, X_test, _, y_test = train_test_split(X, df['duration_min'], test_size=0.2, random_state=42)
+        _holdout, _holdout_key = (X_test.values[:n_rows], y_test.values[:n_rows]), key
+    return _holdout
+
+
+def column_mismatch(bundle, columns):
+    """
+    Why `bundle` cannot serve with these feature columns (None if it can). ranking_engine builds its
+    feature rows for the columns it started with, so a model trained on another order needs a restart.
+    """
+    if bundle.columns is not None and columns is not None and list(bundle.columns) != list(columns):
+        return f"model columns {bundle.columns} differ from the serving columns {list(columns)}, restart the server to use it"
+    return None
+
+
+def validate_bundle(bundle, columns, baseline=None):
+    """
+    Checks a candidate model on the holdout slice before it serves anyone.
+    Returns (ok, report). baseline is the bundle currently serving (if any).
+    """
+    if bundle.model is None:
+        return False, {'reason': bundle.error or "model did not load"}
+    reason = column_mismatch(bundle, columns)
+    if reason:
+        return False, {'reason': reason}
+
+    X, y = load_holdout(columns)
+    predictions = bundle.model.predict(X)
+    if not np.all(np.isfinite(predictions)):
+        return False, {'reason': "model returned NaN/inf on the holdout"}
+
+    report = {'holdout_rows': len(y), 'mae': float(np.mean(np.abs(predictions - y)))}
+    if report['mae'] > MAX_HOLDOUT_MAE:
+        report['reason'] = f"holdout MAE {report['mae']:.2f} is above the {MAX_HOLDOUT_MAE:.2f} limit"
+        return False, report
+
+    if baseline is not None and baseline.model is not None:
+        report['baseline_mae'] = float(np.mean(np.abs(baseline.model.predict(X) - y)))
+        if report['mae'] > report['baseline_mae'] * (1 + MAX_MAE_REGRESSION):
+            report['reason'] = f"holdout MAE {report['mae']:.2f} is worse than current {report['baseline_mae']:.2f}"
+            return False, report
+    return True, report
+
+
+def hot_reload(validate=True):
+    """
+    Loads the artifacts into a new bundle, warms it up, validates it and only then swaps it in.
+    Requests already running keep the old bundle until they finish. Returns a small report.
+    """
+    from ranking_engine import model_columns
+
+    # One reload at a time, a second trigger while one runs is simply skipped
+    if not _reload_lock.acquire(blocking=False):
+        return {'swapped': False, 'reason': "a reload is already running"}
+    try:
+        start = time.perf_counter()
+        current = registry.bundle
+        candidate = registry.read_bundle()
+        registry.warm_up(candidate)
+
+        if validate:
+            ok, report = validate_bundle(candidate, model_columns, current)
+        else:
+            # Even unvalidated, a model must get its features in the order it was trained on
+            reason = column_mismatch(candidate, model_columns) if candidate.model is not None else candidate.error
+            ok, report = reason is None, ({'reason': reason} if reason else {})
+        if ok:
+            registry.swap(candidate)
+            print(f"🔄 Model {candidate.version} is now serving.")
+        else:
+            print(f"❌ New model rejected: {report.get('reason')}")
+
+        report.update({'swapped': ok, 'version': candidate.version, 'seconds': time.perf_counter() - start})
+        last_reload.clear()
+        last_reload.update(report)
+        return report
+    finally:
+        _reload_lock.release()
+
+
+def rollback():
+    """Goes back to the model that was serving before the last swap."""
+    previous = registry.rollback()
+    if previous is None:
+        return {'rolled_back': False, 'reason': "no previous model to go back to"}
+    print(f"⏪ Rolled back to model {previous.version}.")
+    return {'rolled_back': True, 'version': previous.version}
+
+
+def require_admin_token(x_admin_token: str = Header(default="")):
+    """FastAPI dependency of the /admin routes: 404 while they are switched off, 403 without the right token."""
+    if not MODEL_ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Admin routes are off, set MODEL_ADMIN_TOKEN to use them.")
+    if not hmac.compare_digest(x_admin_token.encode(), MODEL_ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Wrong or missing X-Admin-Token.")
+
+
+def prefork_launcher():
+    """The pid of the prefork_server.py launcher this process is a worker of, None when serving on its own."""
+    pid = int(os.environ.get(PREFORK_LAUNCHER_ENV, 0))
+    return pid if pid and pid != os.getpid() else None
+
+
+def request_reload(validate=True):
+    """
+    /admin/reload. A prefork worker does not reload itself (its siblings would keep the old model):
+    it asks the launcher for a rolling restart instead, which always validates.
+    """
+    launcher = prefork_launcher()
+    if launcher is None:
+        return hot_reload(validate)
+    if not validate:
+        return {'swapped': False, 'reason': "under prefork_server.py every reload is validated"}
+    os.kill(launcher, signal.SIGHUP)
+    return {'swapped': None, 'launcher_pid': launcher,
+            'reason': "rolling restart requested from the launcher, /ready shows the new version once it is done"}
+
+
+def request_rollback():
+    """/admin/rollback, forwarded to the prefork launcher the same way as a reload."""
+    launcher = prefork_launcher()
+    if launcher is None:
+        return rollback()
+    os.kill(launcher, signal.SIGUSR1)
+    return {'rolled_back': None, 'launcher_pid': launcher,
+            'reason': "rollback requested from the launcher, /ready shows the version once every worker is replaced"}
+
+
+def reload_in_background(validate=True):
+    thread = threading.Thread(target=hot_reload, kwargs={'validate': validate}, name="model-reload", daemon=True)
+    thread.start()
+    return thread
+
+
+class ModelWatcher(threading.Thread):
+    """Polls the manifest written by train_model.py and hot-reloads (or calls on_change) when it changes."""
+
+    def __init__(self, interval=MODEL_WATCH_SECONDS, on_change=hot_reload):
+        super().__init__(name="model-watcher", daemon=True)
+        self.interval = interval
+        self.on_change = on_change
+        self.manifest_path = registry.path(MANIFEST_FILE)
+        self.stopped = threading.Event()
+        self.last_seen = self._mtime()
+
+    def _mtime(self):
+        return os.path.getmtime(self.manifest_path) if os.path.exists(self.manifest_path) else None
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            mtime = self._mtime()
+            if mtime is not None and mtime != self.last_seen:
+                self.last_seen = mtime
+                self.on_change()
+
+    def stop(self):
+        self.stopped.set()
+
+
+@asynccontextmanager
+async def lifespan(app):
+    """
+    FastAPI lifespan: warms the model up before the server takes traffic (unless MODEL_WARMUP=lazy),
+    reloads on SIGHUP, watches for new models if MODEL_WATCH_SECONDS is set, and flushes the quote log on shutdown.
+    Under prefork_server.py the launcher does the reloading and watching for all workers.
+    """
+    if MODEL_WARMUP == "eager":
+        await asyncio.to_thread(registry.warm_up)
+
+    loop = asyncio.get_running_loop()
+    standalone = prefork_launcher() is None
+    use_sighup = standalone and hasattr(signal, "SIGHUP") and threading.current_thread() is threading.main_thread()
+    if use_sighup:
+        loop.add_signal_handler(signal.SIGHUP, reload_in_background)
+
+    watcher = None
+    if standalone and MODEL_WATCH_SECONDS > 0:
+        watcher = ModelWatcher()
+        watcher.start()
+    yield
+    if watcher is not None:
+        watcher.stop()
+    if use_sighup:
+        loop.remove_signal_handler(signal.SIGHUP)
+    # Write out the quotes still waiting for the log writer
+    await asyncio.to_thread(quote_log.close)
+
+
+if __name__ == "__main__":
+    # Tell a running server to reload or roll back: python hot_reload.py rollback
+    import argparse
+    import httpx
+
+    parser = argparse.ArgumentParser(description="Hot reload / rollback the model of a running server.")
+    parser.add_argument("command", choices=["reload", "rollback", "status"])
+    parser.add_argument("--url", default="http://127.0.0.1:8001")
+    parser.add_argument("--token", default=MODEL_ADMIN_TOKEN, help="the server's MODEL_ADMIN_TOKEN (default: from the environment)")
+    args = parser.parse_args()
+
+    if args.command == "status":
+        response = httpx.get(f"{args.url}/ready")
+    else:
+        response = httpx.post(f"{args.url}/admin/{args.command}", headers={'X-Admin-Token': args.token}, timeout=120)
+    print(json.dumps(response.json(), indent=2))
@@ -0,0 +1,177 @@
+import os
+import json
+import shutil
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from sklearn.model_selection import KFold, ParameterGrid, ParameterSampler
+
+from ride_dataset import DATA_DIR, dataset_path, dataset_hash, load_rides, feature_frame, TRAINING_COLUMNS
+from forest_engine import CompiledForest, flatten_forest
+from model_compression import quote_features
+from train_model import FOREST_PARAMS, new_forest, evaluation_metrics
+
+# Feature matrices built from a dataset, one folder per dataset content hash
+FEATURE_CACHE_DIR = os.path.join(DATA_DIR, "feature_cache")
+
+DEFAULT_GRID = {
+    'n_estimators': [50, 100, 250],
+    'max_depth': [10, 15, 20],
+    'min_samples_leaf': [1, 5, 20],
+}
+
+
+def cached_features(data_path, cache_dir=FEATURE_CACHE_DIR):
+    """
+    Builds the model inputs (float32, the dtype sklearn trees use internally) and targets once
+    and saves them as .npy files under cache_dir/<dataset hash>. Returns that folder.
+    A changed dataset gets a new hash, so a stale cache is never used.
+    """
+    folder = os.path.join(cache_dir, dataset_hash(data_path))
+    if os.path.exists(os.path.join(folder, "columns.json")):
+        return folder
+
+    df = load_rides(TRAINING_COLUMNS, path=data_path)
+    features = feature_frame(df)
+    tmp_folder = folder + ".tmp"
+    os.makedirs(tmp_folder, exist_ok=True)
+    np.save(os.path.join(tmp_folder, "X.npy"), features.to_numpy(dtype=np.float32))
+    np.save(os.path.join(tmp_folder, "y.npy"), df['duration_min'].to_numpy(dtype=np.float64))
+    # columns.json is written last: the folder only counts as complete when it exists
+    with open(os.path.join(tmp_folder, "columns.json"), 'w') as f:
+        json.dump(list(features.columns), f)
+    if os.path.exists(folder):
+        shutil.rmtree(folder)
+    os.replace(tmp_folder, folder)
+    return folder
+
+
+def load_features(folder, mmap=True):
+    """(X, y, columns) from a cache folder. mmap=True lets every sweep worker share the same pages."""
+    mode = 'r' if mmap else None
+    with open(os.path.join(folder, "columns.json")) as f:
+        columns = json.load(f)
+    return np.load(os.path.join(folder, "X.npy"), mmap_mode=mode), np.load(os.path.join(folder, "y.npy"), mmap_mode=mode), columns
+
+
+def fit_fold(folder, params, fold, n_folds, seed):
+    """
+    Fits one (settings, fold) pair. Runs in a worker process: the folds are recomputed here
+    from the seed instead of shipping index arrays, and the data comes from the mmap cache.
+    Fold 0 also returns the flattened forest so latency can be timed later without other fits running.
+    """
+    X, y, _ = load_features(folder)
+    splits = KFold(n_splits=n_folds, shuffle=True, random_state=seed).split(np.arange(len(y)))
+    train_idx, test_idx = next(s for i, s in enumerate(splits) if i == fold)
+
+    start = time.perf_counter()
+    model = new_forest(params, n_jobs=1).fit(X[train_idx], y[train_idx])
+    fit_seconds = time.perf_counter() - start
+
+    scores = evaluation_metrics(y[test_idx], model.predict(X[test_idx]))
+    scores['fit_seconds'] = fit_seconds
+    return scores, flatten_forest(model) if fold == 0 else None
+
+
+def quote_latency_ms(arrays, columns, repeat=200):
+    """Median time for one quote (one trip, one row per vehicle) on the compiled forest used for serving."""
+    forest = CompiledForest(arrays)
+    rows = quote_features(columns)
+    forest.predict(rows)  # warm up
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        forest.predict(rows)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings) * 1000)
+
+
+def pareto_front(results):
+    """Marks results no other result beats on both MAE and quote latency."""
+    for r in results:
+        r['frontier'] = not any(
+            o['mae'] <= r['mae'] and o['quote_ms'] <= r['quote_ms'] and (o['mae'] < r['mae'] or o['quote_ms'] < r['quote_ms'])
+            for o in results
+        )
+    return results
+
+
+def run_sweep(candidates, data_path=None, n_folds=5, workers=None, seed=42, cache_dir=FEATURE_CACHE_DIR):
+    """
+    k-fold CV of every candidate settings dict across a process pool.
+    Returns one result per candidate (mean fold scores, quote latency, compiled size), best MAE first.
+    """
+    data_path = data_path or dataset_path()
+    if data_path is None:
+        raise FileNotFoundError(f"No rides dataset in {DATA_DIR}. Please run generate_data.py first.")
+    folder = cached_features(data_path, cache_dir)
+    _, _, columns = load_features(folder)
+
+    candidates = [{**FOREST_PARAMS, **params} for params in candidates]
+    jobs = [(i, fold) for i in range(len(candidates)) for fold in range(n_folds)]
+    fold_scores = [[] for _ in candidates]
+    forests = [None] * len(candidates)
+
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        futures = {executor.submit(fit_fold, folder, candidates[i], fold, n_folds, seed): (i, fold) for i, fold in jobs}
+        for future, (i, fold) in futures.items():
+            scores, arrays = future.result()
+            fold_scores[i].append(scores)
+            if arrays is not None:
+                forests[i] = arrays
+
+    results = []
+    for params, scores, arrays in zip(candidates, fold_scores, forests):
+        result = {'params': params}
+        for metric in scores[0]:
+            result[metric] = float(np.mean([s[metric] for s in scores]))
+        result['quote_ms'] = quote_latency_ms(arrays, columns)
+        result['size_mb'] = sum(a.nbytes for a in arrays.values()) / 1e6
+        results.append(result)
+
+    return sorted(pareto_front(results), key=lambda r: r['mae'])
+
+
+def print_results(results):
+    print("\n--- 🔍 Hyperparameter Sweep (k-fold mean, * = speed/accuracy frontier) ---")
+    print(f"  {'trees':>5} {'depth':>5} {'leaf':>4} | {'MAE':>5} {'RMSE':>5} {'R2':>5} {'MAPE%':>6} | {'quote ms':>8} {'size MB':>7} {'fit s':>6}")
+    for r in results:
+        p = r['params']
+        print(f"{'*' if r['frontier'] else ' '} {p['n_estimators']:>5} {str(p['max_depth']):>5} {p['min_samples_leaf']:>4} | "
+              f"{r['mae']:>5.2f} {r['rmse']:>5.2f} {r['r2']:>5.2f} {r['mape']:>6.2f} | "
+              f"{r['quote_ms']:>8.3f} {r['size_mb']:>7.1f} {r['fit_seconds']:>6.1f}")
+
+
+def parse_grid(spec):
+    """'n_estimators=50,100 max_depth=10,None' -> {'n_estimators': [50, 100], 'max_depth': [10, None]}"""
+    grid = {}
+    for part in spec.split():
+        name, values = part.split('=')
+        grid[name] = [None if v == 'None' else int(v) for v in values.split(',')]
+    return grid
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Cross-validated sweep over the ETA forest settings.")
+    parser.add_argument("--grid", default=None, help="e.g. 'n_estimators=50,100 max_depth=10,15' (default: a 27-point grid)")
+    parser.add_argument("--random", type=int, default=None, help="try N random points of the grid instead of all of them")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: one per CPU)")
+    parser.add_argument("--data", default=None, help="dataset to use (default: data/rides_dataset.parquet or .csv)")
+    parser.add_argument("--out", default=None, help="also save the results as JSON")
+    args = parser.parse_args()
+
+    grid = parse_grid(args.grid) if args.grid else DEFAULT_GRID
+    candidates = list(ParameterSampler(grid, args.random, random_state=42)) if args.random else list(ParameterGrid(grid))
+    results = run_sweep(candidates, args.data, args.folds, args.workers)
+    print_results(results)
+
+    best = results[0]['params']
+    print(f"\n🏆 Best MAE: python train_model.py --n-estimators {best['n_estimators']} "
+          f"--max-depth {best['max_depth']} --min-samples-leaf {best['min_samples_leaf']}")
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Results saved to: {os.path.abspath(args.out)}")
@@ -0,0 +1,88 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from functools import partial
+
+from metrics import metrics, stats_collector
+
+# --- POOL SETTINGS (can be overridden with environment variables) ---
+INFERENCE_WORKERS = int(os.environ.get("INFERENCE_WORKERS", min(4, os.cpu_count() or 1)))
+# How many requests may wait for a free worker before we start answering 429
+INFERENCE_QUEUE = int(os.environ.get("INFERENCE_QUEUE", 64))
+INFERENCE_POOL_KIND = os.environ.get("INFERENCE_POOL_KIND", "thread")   # 'thread' or 'process'
+
+
+class PoolSaturatedError(Exception):
+    """Raised when every worker is busy and the waiting queue is full."""
+
+
+class InferencePool:
+    """
+    Runs CPU-heavy model work off the event loop.
+
+    At most max_workers jobs run at once and at most max_queue more may wait.
+    Anything beyond that is refused straight away with PoolSaturatedError
+    (the apps turn it into a 429) instead of piling up and slowing everyone down.
+
+    kind='process' sidesteps the GIL, but every worker process loads its own model copy
+    and the function + arguments must be picklable (module-level functions are).
+    """
+
+    def __init__(self, max_workers=INFERENCE_WORKERS, max_queue=INFERENCE_QUEUE, kind=INFERENCE_POOL_KIND):
+        if kind == 'process':
+            self.executor = ProcessPoolExecutor(max_workers=max_workers)
+        elif kind == 'thread':
+            self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="inference")
+        else:
+            raise ValueError("kind must be 'thread' or 'process'")
+        self.kind = kind
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.rejected = 0
+        self.completed = 0
+
+    def _release(self, _future):
+        with self._lock:
+            self.in_flight -= 1
+            self.completed += 1
+        self._slots.release()
+
+    async def run(self, fn, *args, **kwargs):
+        """Runs fn(*args, **kwargs) in the pool and waits for it without blocking the event loop."""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise PoolSaturatedError("Inference pool is saturated, please retry shortly.")
+        with self._lock:
+            self.in_flight += 1
+
+        try:
+            future = self.executor.submit(partial(fn, *args, **kwargs))
+        except BaseException:
+            self._release(None)
+            raise
+        # The slot is given back when the job really finishes, even if the client gave up waiting
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'kind': self.kind,
+                'max_workers': self.max_workers,
+                'max_queue': self.max_queue,
+                'in_flight': self.in_flight,
+                'completed': self.completed,
+                'rejected': self.rejected,
+            }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
+
+
+inference_pool = InferencePool()
+metrics.collectors.append(stats_collector("udupi_inference_pool", inference_pool.stats))
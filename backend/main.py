@@ -1,11 +1,22 @@
 ##api for front end (react)
+import os
 import uvicorn
-import numpy as np
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
+from typing import List, Union
 from ranking_engine import get_vehicle_recommendations
+from quote_response import QuoteResponse, RecommendationList, encode_recommendations
+from quote_cache import quote_cache
+from inference_pool import inference_pool, PoolSaturatedError
+from micro_batcher import get_batched_recommendations, quote_batcher
+from quote_log import quote_log
+from model_registry import registry
+from hot_reload import lifespan, request_reload, request_rollback, require_admin_token, last_reload
+from metrics import metrics, MetricsMiddleware, StageTimer, ERRORS
+from batch_quotes import Trip, TripColumns, trips_to_columns, respond_to_batch
 
-app = FastAPI(title="Udupi Smart Ride - Production API")
+app = FastAPI(title="Udupi Smart Ride - Production API", lifespan=lifespan)
 
 # --- CORS CONFIGURATION ---
 # Allows your React frontend (localhost:5173) to talk to the AI model
@@ -16,28 +27,98 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Request counts and latency per route for /metrics
+app.add_middleware(MetricsMiddleware)
 
-@app.post("/predict_ride")
-def predict_ride(start_lat: float, start_lon: float, end_lat: float, end_lon: float, hour: int, preference: str = "balanced"):
+@app.exception_handler(PoolSaturatedError)
+async def pool_saturated(request: Request, exc: PoolSaturatedError):
+    """Backpressure: when the inference pool is full, clients get a 429 and retry."""
+    return JSONResponse(status_code=429, content={"error": str(exc)}, headers={"Retry-After": "1"})
+
+@app.post("/predict_ride", response_model=RecommendationList)
+async def predict_ride(start_lat: float, start_lon: float, end_lat: float, end_lon: float, hour: int, preference: str = "balanced", precise: bool = False, quantiles: bool = False):
     """
     Production endpoint for React Frontend.
     Provides ETA, Dynamic Pricing, and Ranking.
+    quantiles=true adds a p10/p50/p90 ETA range (eta_p10/eta_p50/eta_p90) to every option;
+    preference=reliable ranks on the slow end of that range.
+    """
+    try:
+        # 1. Get recommendations from the ML Ranking Engine (each row carries the trip distance)
+        recommendations = await get_batched_recommendations(start_lat, start_lon, end_lat, end_lon, hour, preference, precise, quantiles)
+        if isinstance(recommendations, dict):
+            # Model not loaded (yet): tell the load balancer to try another instance
+            return JSONResponse(status_code=503, content=recommendations)
+        timer = StageTimer('http')
+
+        # 2. Format for Frontend JSON (straight from the rows, see quote_response.py)
+        response = QuoteResponse(encode_recommendations(recommendations))
+        timer.lap('format')
+        return response
+    except PoolSaturatedError:
+        raise
+    except Exception as e:
+        ERRORS.inc(("/predict_ride", type(e).__name__))
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
+@app.post("/predict_rides", response_model=List[RecommendationList])
+async def predict_rides(trips: Union[List[Trip], TripColumns], stream: bool = False, precise: bool = False):
+    """
+    Batch endpoint for the dispatcher.
+    Accepts a JSON list of trips or columnar arrays, scores all trips x vehicles in one
+    model pass and returns the top 3 for each trip. Big batches are streamed as NDJSON.
     """
     try:
-        # 1. Distance Calculation (Udupi-Manipal Bounds)
-        dist = round(np.sqrt((end_lat - start_lat)**2 + (end_lon - start_lon)**2) * 111, 2)
-        
-        # 2. Get recommendations from the ML Ranking Engine
-        recommendations = get_vehicle_recommendations(start_lat, start_lon, end_lat, end_lon, hour, preference)
-        
-        # 3. Format for Frontend JSON
-        results = recommendations.to_dict(orient="records") if hasattr(recommendations, 'to_dict') else recommendations
-        for r in results:
-            r['distance'] = dist
-            
-        return results
+        # Scored in the inference pool (bounded, 429 when full), chunk by chunk when streamed
+        return await respond_to_batch(trips_to_columns(trips), precise, stream)
+    except PoolSaturatedError:
+        raise
     except Exception as e:
-        return {"error": str(e)}
+        ERRORS.inc(("/predict_rides", type(e).__name__))
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
+@app.get("/cache_stats")
+def cache_stats():
+    """Hit/miss/eviction counters of the quote cache in front of /predict_ride."""
+    return quote_cache.stats()
+
+@app.get("/batch_stats")
+def batch_stats():
+    """Batch size and queueing delay of the /predict_ride micro-batcher (for tuning the window)."""
+    return quote_batcher.stats()
+
+@app.get("/quote_log_stats")
+def quote_log_stats():
+    """Quotes written to the retraining log, and how many were dropped because the writer fell behind."""
+    return quote_log.stats()
+
+@app.get("/metrics")
+def prometheus_metrics():
+    """Prometheus scrape endpoint: request/stage latency histograms, error counts, cache/pool/model gauges."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/ready")
+def ready():
+    """Readiness check: 200 once the model is loaded (with its version and load time), 503 before."""
+    status = registry.status()
+    status['last_reload'] = last_reload
+    # Which worker answered (several share the port under prefork_server.py)
+    status['pid'] = os.getpid()
+    return JSONResponse(status_code=200 if status['ready'] else 503, content=status)
+
+@app.post("/admin/reload", dependencies=[Depends(require_admin_token)])
+def admin_reload(validate: bool = True):
+    """
+    Loads the newest model files, validates them on the holdout and swaps them in without a restart.
+    Under prefork_server.py the launcher does it for every worker (a rolling restart), so this returns before it is done.
+    Like /admin/rollback it needs the MODEL_ADMIN_TOKEN in an X-Admin-Token header (and is off without one).
+    """
+    return request_reload(validate)
+
+@app.post("/admin/rollback", dependencies=[Depends(require_admin_token)])
+def admin_rollback():
+    """Goes back to the model that was serving before the last swap."""
+    return request_rollback()
 
 if __name__ == "__main__":
     # Running on 8001 to avoid Port 8000 conflicts
@@ -0,0 +1,189 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+
+# Set METRICS_ENABLED=0 to turn every observe()/inc() into a no-op
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") == "1"
+
+# Latency buckets in seconds: 50 us up to 10 s (quote stages are often well under a millisecond)
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 10)
+
+
+def format_labels(labelnames, values):
+    if not labelnames:
+        return ""
+    pairs = ",".join(f'{name}="{str(value)}"' for name, value in zip(labelnames, values))
+    return "{" + pairs + "}"
+
+
+class Counter:
+    """Monotonic counter, one value per label combination."""
+
+    def __init__(self, name, help, labelnames=()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels=(), amount=1):
+        if not METRICS_ENABLED:
+            return
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in self._values.items():
+                lines.append(f"{self.name}{format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    """Fixed-bucket histogram (cumulative buckets + sum + count, like Prometheus)."""
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, labels=()):
+        if not METRICS_ENABLED:
+            return
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # [count per bucket (+Inf last), sum, count]
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, (counts, total, count) in self._series.items():
+                running = 0
+                for edge, bucket_count in zip(self.buckets + ("+Inf",), counts):
+                    running += bucket_count
+                    label_str = format_labels(self.labelnames + ("le",), labels + (edge,))
+                    lines.append(f"{self.name}_bucket{label_str} {running}")
+                label_str = format_labels(self.labelnames, labels)
+                lines.append(f"{self.name}_sum{label_str} {total}")
+                lines.append(f"{self.name}_count{label_str} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Holds every metric and renders them in the Prometheus text format.
+    Collectors are functions called at scrape time that return
+    (name, type, help, [(labels dict, value), ...]) tuples, for numbers that
+    already live somewhere else (cache counters, pool size, model version).
+    """
+
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def counter(self, name, help, labelnames=()):
+        metric = Counter(name, help, labelnames)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, help, labelnames, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        for collect in self.collectors:
+            try:
+                collected = collect()
+            except Exception as e:
+                print(f"❌ Error collecting metrics: {e}")
+                continue
+            for name, kind, help, samples in collected:
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{format_labels(tuple(labels), tuple(labels.values()))} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def stats_collector(prefix, stats):
+    """
+    Collector for a stats() dict (quote cache, micro-batcher, inference pool):
+    every plain number in it becomes a gauge called <prefix>_<key>.
+    """
+    def collect():
+        samples = []
+        for key, value in stats().items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                samples.append((f"{prefix}_{key}", "gauge", f"{key} from {prefix} stats.", [({}, value)]))
+        return samples
+    return collect
+
+
+metrics = MetricsRegistry()
+
+# --- THE QUOTE PATH ---
+REQUESTS = metrics.counter("udupi_http_requests_total", "HTTP requests by route and status code.", ("route", "method", "status"))
+REQUEST_LATENCY = metrics.histogram("udupi_http_request_seconds", "HTTP request latency (including serialization) by route.", ("route",))
+STAGE_LATENCY = metrics.histogram("udupi_quote_stage_seconds", "Time spent in each stage of a quote.", ("path", "stage"))
+QUOTES_BY_DEMAND = metrics.counter("udupi_quotes_total", "Trips quoted, split by surge (High) vs normal demand.", ("demand",))
+ERRORS = metrics.counter("udupi_errors_total", "Errors raised while serving, by route and exception type.", ("route", "error"))
+
+
+class StageTimer:
+    """
+    Cheap stopwatch for the hot path: timer.lap('predict') records the time since the previous lap.
+    Just a perf_counter() call and one histogram update per stage.
+    """
+    __slots__ = ('path', 'last')
+
+    def __init__(self, path):
+        self.path = path
+        self.last = time.perf_counter()
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        STAGE_LATENCY.observe(now - self.last, (self.path, stage))
+        self.last = now
+
+
+class MetricsMiddleware:
+    """
+    Plain ASGI middleware (much lighter than @app.middleware("http")) that counts every
+    HTTP request and times it by its route template, e.g. /predict_ride.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            # Route templates keep the label count small (unknown paths all share one label)
+            route_path = getattr(route, "path", "unmatched")
+            REQUEST_LATENCY.observe(time.perf_counter() - start, (route_path,))
+            REQUESTS.inc((route_path, scope["method"], status["code"]))
@@ -0,0 +1,160 @@
+import asyncio
+import os
+import time
+from collections import deque
+
+from ranking_engine import get_batch_recommendations
+from quote_cache import quote_cache, quote_key
+from inference_pool import inference_pool
+from surge_engine import surge
+from quote_log import quote_log
+from metrics import metrics, stats_collector
+
+# --- BATCHING SETTINGS (can be overridden with environment variables) ---
+# Wait at most this long for more quotes to join a batch...
+BATCH_WINDOW_MS = float(os.environ.get("QUOTE_BATCH_WINDOW_MS", 2))
+# ...or send the batch as soon as it has this many quotes
+BATCH_MAX_SIZE = int(os.environ.get("QUOTE_BATCH_MAX_SIZE", 64))
+
+# Upper edges of the batch size histogram buckets
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+class MicroBatcher:
+    """
+    Collects single requests for a short window and runs them as one batch.
+
+    submit() returns when the batch holding the item is done. run_batch takes a list of
+    items and returns one result per item (same order). It runs through `runner`
+    (the inference pool by default), so the event loop never does the heavy work.
+    """
+
+    def __init__(self, run_batch, window_ms=BATCH_WINDOW_MS, max_size=BATCH_MAX_SIZE, runner=None):
+        self.run_batch = run_batch
+        self.window_ms = window_ms
+        self.max_size = max_size
+        self.runner = runner or inference_pool.run
+        self._pending = []
+        self._timer = None
+        self._tasks = set()
+
+        # --- METRICS ---
+        self.batches = 0
+        self.items = 0
+        self.max_batch_size = 0
+        self.size_histogram = {edge: 0 for edge in BATCH_SIZE_BUCKETS}
+        self.size_histogram['+Inf'] = 0
+        # Queueing delay = time from submit() until the batch is handed to the pool
+        self.queue_delay_total = 0.0
+        self.recent_delays = deque(maxlen=2000)
+
+    async def submit(self, item):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future, time.perf_counter()))
+
+        if len(self._pending) >= self.max_size or self.window_ms <= 0:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window_ms / 1000, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        task = asyncio.ensure_future(self._run(batch))
+        # Keep a reference so the task is not garbage collected halfway
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _record(self, batch):
+        now = time.perf_counter()
+        size = len(batch)
+        self.batches += 1
+        self.items += size
+        self.max_batch_size = max(self.max_batch_size, size)
+        bucket = next((edge for edge in BATCH_SIZE_BUCKETS if size <= edge), '+Inf')
+        self.size_histogram[bucket] += 1
+        for _, _, submitted in batch:
+            delay = now - submitted
+            self.queue_delay_total += delay
+            self.recent_delays.append(delay)
+
+    async def _run(self, batch):
+        self._record(batch)
+        items = [item for item, _, _ in batch]
+        try:
+            results = await self.runner(self.run_batch, items)
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future, _), result in zip(batch, results):
+            # The client may have gone away (cancelled future) while we were working
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self):
+        delays = sorted(self.recent_delays)
+        def pct(q):
+            return delays[min(len(delays) - 1, int(q * len(delays)))] * 1000 if delays else 0.0
+        return {
+            'window_ms': self.window_ms,
+            'max_size': self.max_size,
+            'batches': self.batches,
+            'requests': self.items,
+            'mean_batch_size': self.items / self.batches if self.batches else 0.0,
+            'max_batch_size': self.max_batch_size,
+            'batch_size_histogram': {str(k): v for k, v in self.size_histogram.items()},
+            'mean_queue_delay_ms': self.queue_delay_total / self.items * 1000 if self.items else 0.0,
+            'p50_queue_delay_ms': pct(0.50),
+            'p99_queue_delay_ms': pct(0.99),
+        }
+
+
+def quote_trip_batch(trips):
+    """
+    Scores a list of (start_lat, start_lon, end_lat, end_lon, hour, preference, precise, live_surge, quantiles) trips.
+    One get_batch_recommendations call per (precise, quantiles) pair (almost always just one).
+    """
+    results = [None] * len(trips)
+    for precise, quantiles in ((False, False), (False, True), (True, False), (True, True)):
+        idx = [i for i, trip in enumerate(trips) if trip[6] == precise and trip[8] == quantiles]
+        if not idx:
+            continue
+        columns = list(zip(*(trips[i][:6] for i in idx)))
+        batch_results = get_batch_recommendations(*columns, precise=precise, live_surges=[trips[i][7] for i in idx],
+                                                  quantiles=quantiles)
+        if isinstance(batch_results, dict):
+            # e.g. model not loaded: every waiting request gets the same error
+            return [batch_results] * len(trips)
+        for i, trip_results in zip(idx, batch_results):
+            results[i] = trip_results
+    return results
+
+
+quote_batcher = MicroBatcher(quote_trip_batch)
+metrics.collectors.append(stats_collector("udupi_quote_batcher", quote_batcher.stats))
+
+
+async def get_batched_recommendations(start_lat, start_lon, end_lat, end_lon, hour, preference='balanced', precise=False, quantiles=False):
+    """
+    Async version of get_cached_recommendations: cache hits answer straight away,
+    misses join the next micro-batch instead of running their own tiny predict.
+    """
+    surge.record(start_lat, start_lon)
+    key = quote_key(start_lat, start_lon, end_lat, end_lon, hour, preference, precise, quantiles)
+    cached = quote_cache.get(key)
+    if cached is None:
+        cached = await quote_batcher.submit((key[0], key[1], key[2], key[3], int(hour), preference, precise, key[8], quantiles))
+        if isinstance(cached, dict):
+            return cached
+        quote_cache.put(key, cached)
+    quote_log.log(start_lat, start_lon, end_lat, end_lon, hour, preference, precise, cached)
+    # Recommendation rows are immutable, so every hit can share them (only the list is copied)
+    return list(cached)
@@ -0,0 +1,245 @@
+import numpy as np
+import os
+import time
+
+from forest_engine import CompiledForest
+from eta_surface import EtaSurface, grid_features, DEFAULT_HOURS, DEFAULT_DIST_MIN, DEFAULT_DIST_MAX, DEFAULT_VEHICLES
+
+# The ETA model only sees hour, distance and vehicle, so the 250-tree forest can be shrunk a lot.
+# Every compressed model here has the same predict(X) as the forest, so ranking_engine serves it unchanged.
+DISTILLED_FILE = "eta_distilled.npz"
+# Latency is timed on one quote for this trip: 6 PM (rush hour), 5 km
+QUOTE_TRIP_HOUR = 18
+QUOTE_TRIP_KM = 5.0
+
+
+def node_depths(forest):
+    """Depth of every node reachable from a root (-1 for unreachable nodes)."""
+    depth = np.full(len(forest.feature), -1, dtype=np.int32)
+    frontier = np.asarray(forest.roots)
+    level = 0
+    while frontier.size:
+        depth[frontier] = level
+        kids = np.asarray(forest.children)[frontier].ravel()
+        parents = np.repeat(frontier, 2)
+        # Leaves point to themselves, so they stop here
+        frontier = np.unique(kids[kids != parents])
+        level += 1
+    return depth
+
+
+def prune_forest(forest, n_trees=None, max_depth=None):
+    """
+    A smaller CompiledForest: only the first n_trees trees (random forest trees are interchangeable),
+    cut at max_depth. A cut node becomes a leaf predicting its own value, which sklearn already
+    stores as the mean ETA of the rides that reached it.
+    """
+    n_trees = min(n_trees or forest.n_estimators, forest.n_estimators)
+    # Trees are stored back to back, so the first n_trees are one prefix of the node arrays
+    end = int(forest.roots[n_trees]) if n_trees < forest.n_estimators else len(forest.feature)
+    children = np.array(forest.children[:end])
+    feature = np.array(forest.feature[:end])
+    threshold = np.array(forest.threshold[:end])
+    roots = np.array(forest.roots[:n_trees])
+
+    sub = CompiledForest({'feature': feature, 'threshold': threshold, 'children': children,
+                          'value': np.array(forest.value[:end]), 'roots': roots,
+                          'max_depth': np.array(forest.max_depth), 'n_features': np.array(forest.n_features_in_)})
+    depth = node_depths(sub)
+    new_max_depth = forest.max_depth
+    if max_depth is not None and max_depth < forest.max_depth:
+        cut = depth == max_depth
+        own = np.arange(end, dtype=children.dtype)
+        children[cut] = np.stack([own[cut], own[cut]], axis=1)
+        feature[cut] = 0
+        threshold[cut] = 0.0
+        depth[depth > max_depth] = -1
+        new_max_depth = max_depth
+
+    # Drop the nodes nobody can reach any more and renumber the rest
+    keep = depth >= 0
+    new_index = np.cumsum(keep, dtype=np.int64) - 1
+    arrays = {
+        'feature': feature[keep],
+        'threshold': threshold[keep],
+        'children': new_index[children[keep]].astype(np.int32),
+        'value': np.array(forest.value[:end])[keep],
+        'roots': new_index[roots].astype(np.int32),
+        'max_depth': np.array(new_max_depth, dtype=np.int32),
+        'n_features': np.array(forest.n_features_in_, dtype=np.int32),
+    }
+    if forest.columns is not None:
+        arrays['columns'] = np.array(forest.columns)
+    return CompiledForest(arrays)
+
+
+def quantize_forest(forest):
+    """
+    Halves the node arrays: float32 thresholds and leaves, uint8 feature ids.
+
+    Thresholds are rounded *down* to float32. Inputs are compared as float32 anyway, and for a
+    float32 x, x > t holds exactly when x > (largest float32 <= t), so splits do not change.
+    Leaves lose precision at the 1e-6 minute level.
+    """
+    threshold = np.asarray(forest.threshold)
+    rounded = threshold.astype(np.float32)
+    too_big = rounded.astype(np.float64) > threshold
+    rounded[too_big] = np.nextafter(rounded[too_big], np.float32(-np.inf))
+
+    arrays = forest.to_arrays()
+    arrays.update({
+        'feature': np.asarray(forest.feature).astype(np.uint8),
+        'threshold': rounded,
+        'value': np.asarray(forest.value).astype(np.float32),
+    })
+    return CompiledForest(arrays)
+
+
+class DistilledEta:
+    """
+    The forest distilled into a piecewise-linear function of distance for every (hour, vehicle):
+    table[hour, vehicle, knot] holds the ETA at each distance knot, answers are interpolated.
+
+    Fitted by least squares to the forest's own predictions on a fine distance grid, so each
+    line segment follows the average of the forest's steps instead of one sample of them.
+    Distances outside the knots are clamped to the first/last knot (the forest is flat there too).
+    """
+
+    def __init__(self, table, hour_min, knot_min, knot_step, vehicles, columns):
+        self.table = table
+        self.hour_min = int(hour_min)
+        self.hour_max = self.hour_min + table.shape[0] - 1
+        self.knot_min = float(knot_min)
+        self.knot_step = float(knot_step)
+        self.vehicles = [str(v) for v in vehicles]
+        self.columns = [str(c) for c in columns]
+        self.n_features_in_ = len(self.columns)
+        self._hour_col = self.columns.index('hour_of_day')
+        self._dist_col = self.columns.index('trip_distance')
+        # One-hot column of every vehicle (in self.vehicles order)
+        self._vehicle_cols = [self.columns.index(f'vehicle_type_{v}') for v in self.vehicles]
+
+    @classmethod
+    def fit(cls, teacher, columns, knot_step=0.25, vehicles=DEFAULT_VEHICLES, hours=DEFAULT_HOURS,
+            dist_min=DEFAULT_DIST_MIN, dist_max=DEFAULT_DIST_MAX, sample_step=0.01):
+        dense = EtaSurface.build(teacher, columns, vehicles, hours, dist_min, dist_max, sample_step)
+        n_hours, n_dists, n_vehicles = dense.table.shape
+        dists = dense.dist_min + np.arange(n_dists) * dense.dist_step
+
+        n_knots = int(np.ceil((dist_max - dist_min) / knot_step)) + 1
+        # Hat functions: the value at each knot falls off linearly to 0 at its neighbours
+        position = (dists - dist_min) / knot_step
+        basis = np.maximum(0.0, 1.0 - np.abs(position[:, None] - np.arange(n_knots)[None, :]))
+
+        # One least-squares solve shared by every (hour, vehicle) curve
+        targets = dense.table.transpose(1, 0, 2).reshape(n_dists, n_hours * n_vehicles)
+        coef, *_ = np.linalg.lstsq(basis, targets, rcond=None)
+        table = coef.reshape(n_knots, n_hours, n_vehicles).transpose(1, 2, 0)
+        return cls(table, dense.hour_min, dist_min, knot_step, vehicles, columns)
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        hour_idx = np.clip(X[:, self._hour_col].astype(np.int64), self.hour_min, self.hour_max) - self.hour_min
+        vehicle_idx = np.argmax(X[:, self._vehicle_cols], axis=1)
+
+        position = np.clip((X[:, self._dist_col] - self.knot_min) / self.knot_step, 0, self.table.shape[2] - 1)
+        left = np.minimum(position.astype(np.int64), self.table.shape[2] - 2)
+        weight = position - left
+        row = self.table[hour_idx, vehicle_idx]
+        return row[np.arange(len(X)), left] * (1 - weight) + row[np.arange(len(X)), left + 1] * weight
+
+    @property
+    def nbytes(self):
+        return self.table.nbytes
+
+    def save(self, path):
+        np.savez(path, table=self.table, hour_min=self.hour_min, knot_min=self.knot_min, knot_step=self.knot_step,
+                 vehicles=np.array(self.vehicles), columns=np.array(self.columns))
+        return path
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data['table'], data['hour_min'], data['knot_min'], data['knot_step'],
+                       list(data['vehicles']), list(data['columns']))
+
+
+def compression_candidates(model, columns):
+    """The compressed models worth comparing, by name (names are what train_model.py --serve takes)."""
+    full = CompiledForest.from_model(model, columns)
+    candidates = {'full': full, 'full-q': quantize_forest(full)}
+    for n_trees, max_depth in [(100, None), (100, 12), (50, 10)]:
+        pruned = prune_forest(full, n_trees, max_depth)
+        name = f"prune-{n_trees}x{max_depth or full.max_depth}"
+        candidates[name] = pruned
+        candidates[name + "-q"] = quantize_forest(pruned)
+    for knot_step in (0.5, 0.25, 0.1):
+        candidates[f"distill-{knot_step}km"] = DistilledEta.fit(model, columns, knot_step)
+    return candidates
+
+
+def quote_features(columns, hour=QUOTE_TRIP_HOUR, distance=QUOTE_TRIP_KM):
+    """The rows a single quote scores: one trip, one row per vehicle (same layout as ranking_engine's template)."""
+    return grid_features(list(columns), DEFAULT_VEHICLES, [hour], [distance])
+
+
+def quote_latency_ms(predictor, columns, repeat=200):
+    """Median time to predict one quote (one trip, one row per vehicle)."""
+    rows = quote_features(columns)
+    predictor.predict(rows)  # warm up
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        predictor.predict(rows)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings) * 1000)
+
+
+def compression_report(candidates, X_test, y_test, columns):
+    """
+    Accuracy (vs the real rides and vs the full forest), quote latency and size of every candidate.
+    The first candidate is the reference the others are compared with.
+    """
+    from train_model import evaluation_metrics
+
+    X_test = np.asarray(X_test, dtype=np.float64)
+    y_test = np.asarray(y_test, dtype=np.float64)
+    reference = None
+    report = []
+    for name, predictor in candidates.items():
+        predictions = predictor.predict(X_test)
+        if reference is None:
+            reference = predictions
+        row = {'name': name, **evaluation_metrics(y_test, predictions)}
+        row['fidelity_mae'] = float(np.mean(np.abs(predictions - reference)))
+        row['shown_eta_changed_pct'] = float(np.mean(np.round(predictions, 1) != np.round(reference, 1)) * 100)
+        row['quote_ms'] = quote_latency_ms(predictor, columns)
+        row['size_mb'] = predictor.nbytes / 1e6
+        report.append(row)
+    return report
+
+
+def print_compression_report(report):
+    print("\n--- 🗜️ Model Compression (MAE vs rides | drift vs full forest | speed) ---")
+    print(f"{'candidate':>18} | {'MAE':>5} {'R2':>5} {'MAPE%':>6} | {'vs full':>7} {'ETA chg%':>8} | {'quote ms':>8} {'size MB':>7}")
+    for r in report:
+        print(f"{r['name']:>18} | {r['mae']:>5.2f} {r['r2']:>5.2f} {r['mape']:>6.2f} | "
+              f"{r['fidelity_mae']:>7.3f} {r['shown_eta_changed_pct']:>8.1f} | {r['quote_ms']:>8.3f} {r['size_mb']:>7.2f}")
+
+
+def save_served_model(predictor, output_dir):
+    """
+    Writes the predictor the server should use: a (compressed) forest goes to the compiled forest
+    folder, a distilled model to DISTILLED_FILE. Returns the file name for the manifest.
+    """
+    from forest_engine import save_forest_arrays, FOREST_FILE
+
+    distilled_file = os.path.join(output_dir, DISTILLED_FILE)
+    if isinstance(predictor, DistilledEta):
+        predictor.save(distilled_file)
+        return DISTILLED_FILE
+    # A forest is being published: an old distilled model must not shadow it
+    if os.path.exists(distilled_file):
+        os.remove(distilled_file)
+    save_forest_arrays(predictor.to_arrays(), os.path.join(output_dir, FOREST_FILE))
+    return FOREST_FILE
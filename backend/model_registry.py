@@ -0,0 +1,301 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import deque
+import numpy as np
+import joblib
+
+from forest_engine import CompiledForest, FOREST_FILE, same_forest
+from eta_surface import EtaSurface, SURFACE_FILE, DEFAULT_VEHICLES
+from model_compression import DistilledEta, DISTILLED_FILE
+from zone_tables import ZoneTables, ZONE_TABLES_FILE
+from metrics import metrics
+
+# Artifacts live next to this file (the backend folder), no matter where the server was started from.
+# MODEL_DIR can point somewhere else, e.g. a shared volume.
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_DIR = os.environ.get("MODEL_DIR", BACKEND_DIR)
+MODEL_FILE = "eta_model.pkl"
+COLUMNS_FILE = "model_columns.pkl"
+# train_model.py writes this file last, after every artifact is in place (see hot_reload.write_manifest)
+MANIFEST_FILE = "model_manifest.json"
+# Memory-map the compiled forest so several worker processes share one copy of it
+USE_MMAP = os.environ.get("MODEL_MMAP", "1") == "1"
+# Opt-in: inputs with this many rows (big /predict_rides batches, holdout checks) go to the sklearn
+# forest instead of the compiled one, which is slower there (e.g. 500, see forest_engine.LARGE_BATCH_ROWS).
+# It is loaded on the first such batch, and then every process holds its own copy: 0 = never
+MODEL_LARGE_BATCH_ROWS = int(os.environ.get("MODEL_LARGE_BATCH_ROWS", 0))
+# How many previous models we keep in memory for rollback
+MODEL_HISTORY = int(os.environ.get("MODEL_HISTORY", 2))
+
+
+def artifact_version(path):
+    """Short content hash of a file (or of every file in a folder), used as the model version."""
+    digest = hashlib.sha1()
+    files = [os.path.join(path, name) for name in sorted(os.listdir(path))] if os.path.isdir(path) else [path]
+    for file in files:
+        with open(file, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+def exact_model(model_file, compiled):
+    """The sklearn forest in model_file if `compiled` is exactly it flattened (not a pruned/quantized copy), else None."""
+    full_model = joblib.load(model_file)
+    if same_forest(compiled, full_model):
+        return full_model
+    print(f"⚠️ {model_file} is not the forest being served, large batches stay on the compiled forest.")
+    return None
+
+
+def read_manifest(model_dir=MODEL_DIR):
+    """The manifest train_model.py published in model_dir, or None if there is none (or it is unreadable)."""
+    try:
+        with open(os.path.join(model_dir, MANIFEST_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class ModelBundle:
+    """Everything one quote needs from a model load. Never changed after creation."""
+    __slots__ = ('model', 'eta_surface', 'version', 'load_number', 'source', 'load_seconds', 'loaded_at', 'error', 'zone_tables',
+                 'columns')
+
+    def __init__(self, model, eta_surface, version, load_number, source, load_seconds, loaded_at, error=None, zone_tables=None,
+                 columns=None):
+        self.model = model
+        # The feature order the model was trained on (model_columns.pkl next to it), None if unknown
+        self.columns = columns
+        self.eta_surface = eta_surface
+        self.zone_tables = zone_tables
+        self.version = version
+        self.load_number = load_number
+        self.source = source
+        self.load_seconds = load_seconds
+        self.loaded_at = loaded_at
+        self.error = error
+
+
+class ModelRegistry:
+    """
+    Owns the loaded model. Nothing is read from disk until get() (lazy) or warm_up() (explicit).
+
+    get() hands out the current ModelBundle. A request should grab it once and use it to the end,
+    so a reload in the middle never mixes an old model with a new ETA table, and requests
+    already running when a new model is swapped in finish on the old one.
+    """
+
+    def __init__(self, model_dir=MODEL_DIR, mmap=USE_MMAP):
+        self.model_dir = model_dir
+        self.mmap = mmap
+        self.bundle = None
+        # Goes up by one every time the current bundle changes, so caches can tell old answers apart
+        self.generation = 0
+        self.loads = 0
+        # Bundles that were swapped out, newest last (for rollback)
+        self.history = deque(maxlen=MODEL_HISTORY)
+        # Functions to call after a reload (e.g. the quote cache clearing itself)
+        self.listeners = []
+        # Re-entrant so get() can call load() while holding it
+        self._lock = threading.RLock()
+
+    def path(self, filename):
+        return os.path.join(self.model_dir, filename)
+
+    def _read_artifacts(self):
+        """
+        Returns (model, eta_surface, zone_tables, source file, version) read from model_dir.
+
+        train_model.py writes a manifest with the content hash of every artifact it published and
+        the one to serve. An artifact is only used if its content still matches, so file times
+        (e.g. the order a checkout or copy wrote them in) never decide which model serves.
+        Without a manifest (files exported by hand) every artifact found is used.
+        """
+        manifest = read_manifest(self.model_dir)
+        versions = manifest.get('versions') if manifest else None
+        hashes = {}
+
+        def current(name):
+            path = self.path(name)
+            if not os.path.exists(path):
+                return False
+            if versions is None:
+                return True
+            hashes[name] = artifact_version(path)
+            return hashes[name] == versions.get(name)
+
+        # The compiled forest gives the same answers as the pickle, much faster, and a distilled
+        # model (train_model.py --serve distill-...) is smaller still
+        serve = manifest.get('serve') if versions is not None else None
+        for name in [serve] if serve else [DISTILLED_FILE, FOREST_FILE]:
+            if name != MODEL_FILE and current(name):
+                served = name
+                break
+        else:
+            served = MODEL_FILE
+            if not os.path.exists(self.path(MODEL_FILE)):
+                raise FileNotFoundError(f"Model not found in {self.model_dir}. Please run train_model.py first!")
+            if serve and serve != MODEL_FILE:
+                print(f"⚠️ {serve} does not match {MANIFEST_FILE}, serving {MODEL_FILE} instead.")
+
+        source = self.path(served)
+        if served == DISTILLED_FILE:
+            model = DistilledEta.load(source)
+        elif served == FOREST_FILE:
+            model = CompiledForest.load(source, mmap=self.mmap)
+            model_file = self.path(MODEL_FILE)
+            if MODEL_LARGE_BATCH_ROWS > 0 and os.path.exists(model_file):
+                model.use_for_large_batches(min_rows=MODEL_LARGE_BATCH_ROWS,
+                                            loader=lambda compiled=model: exact_model(model_file, compiled))
+        else:
+            model = joblib.load(source)
+
+        # The tables were measured on the model the manifest serves, they are wrong for any other
+        derived = serve is None or served == serve
+        eta_surface = None
+        if derived and current(SURFACE_FILE):
+            eta_surface = EtaSurface.load(self.path(SURFACE_FILE))
+            if eta_surface.vehicles != DEFAULT_VEHICLES:
+                print("❌ Error: ETA surface has a different vehicle order, ignoring it.")
+                eta_surface = None
+        zone_tables = ZoneTables.load(self.path(ZONE_TABLES_FILE)) if derived and current(ZONE_TABLES_FILE) else None
+        return model, eta_surface, zone_tables, source, hashes.get(served) or artifact_version(source)
+
+    def read_bundle(self):
+        """Reads the artifacts from disk into a new bundle, without using it yet."""
+        start = time.perf_counter()
+        try:
+            model, eta_surface, zone_tables, source, version = self._read_artifacts()
+            columns, error = load_columns(self.model_dir), None
+        except Exception as e:
+            print(f"❌ Error loading model: {e}")
+            model, eta_surface, zone_tables, source, version, columns, error = None, None, None, None, None, None, str(e)
+        with self._lock:
+            self.loads += 1
+            load_number = self.loads
+        return ModelBundle(model, eta_surface, version, load_number, source,
+                           time.perf_counter() - start, time.time(), error, zone_tables, columns)
+
+    def swap(self, bundle, keep_history=True):
+        """Makes `bundle` the current one in a single reference swap and tells every listener."""
+        with self._lock:
+            old = self.bundle
+            if keep_history and old is not None and old.model is not None:
+                self.history.append(old)
+            self.bundle = bundle
+            self.generation += 1
+        for listener in self.listeners:
+            listener()
+        return old
+
+    def rollback(self):
+        """Goes back to the previous model. Returns it, or None if there is nothing to go back to."""
+        with self._lock:
+            if not self.history:
+                return None
+            previous = self.history.pop()
+            self.bundle = previous
+            self.generation += 1
+        for listener in self.listeners:
+            listener()
+        return previous
+
+    def load(self):
+        """Reads the artifacts from disk and makes them the current bundle."""
+        with self._lock:
+            bundle = self.read_bundle()
+            self.bundle = bundle
+            self.generation += 1
+            return bundle
+
+    def get(self):
+        """The current bundle, loading it first if nothing was loaded yet."""
+        bundle = self.bundle
+        if bundle is None:
+            with self._lock:
+                if self.bundle is None:
+                    self.load()
+                bundle = self.bundle
+        return bundle
+
+    def reload(self):
+        """
+        Loads the files again (e.g. after retraining) and swaps them in straight away.
+        See hot_reload.py for the careful version (warm up + validate first).
+        """
+        bundle = self.read_bundle()
+        self.swap(bundle)
+        return bundle
+
+    def use_surface(self, eta_surface):
+        """Swaps in a new ETA table for the current model (e.g. one built at startup)."""
+        old = self.get()
+        bundle = ModelBundle(old.model, eta_surface, old.version, old.load_number, old.source,
+                             old.load_seconds, old.loaded_at, old.error, old.zone_tables, old.columns)
+        self.swap(bundle, keep_history=False)
+        return bundle
+
+    def warm_up(self, bundle=None):
+        """Loads the model now (not on the first request) and runs one dummy prediction through it."""
+        bundle = bundle or self.get()
+        if bundle.model is not None:
+            bundle.model.predict(np.zeros((1, bundle.model.n_features_in_)))
+        return bundle
+
+    @property
+    def ready(self):
+        return self.bundle is not None and self.bundle.model is not None
+
+    def status(self):
+        """What the /ready endpoint reports. Does not trigger a load."""
+        bundle = self.bundle
+        if bundle is None:
+            return {'ready': False, 'loaded': False}
+        return {
+            'ready': bundle.model is not None,
+            'loaded': True,
+            'version': bundle.version,
+            'generation': self.generation,
+            'load_number': bundle.load_number,
+            'rollback_available': len(self.history),
+            'source': bundle.source,
+            'model_kind': type(bundle.model).__name__ if bundle.model is not None else None,
+            'eta_surface': bundle.eta_surface is not None,
+            'zone_tables': bundle.zone_tables is not None,
+            'mmap': self.mmap,
+            'load_seconds': round(bundle.load_seconds, 4),
+            'loaded_at': bundle.loaded_at,
+            'error': bundle.error,
+        }
+
+
+def load_columns(model_dir=MODEL_DIR, default=None):
+    """Column order saved by train_model.py (falls back to `default` if it is missing)."""
+    columns_file = os.path.join(model_dir, COLUMNS_FILE)
+    try:
+        if os.path.exists(columns_file):
+            return list(joblib.load(columns_file))
+    except Exception as e:
+        print(f"❌ Error loading model columns, using defaults: {e}")
+    return default
+
+
+registry = ModelRegistry()
+
+
+def collect_model_info():
+    """Scrape-time gauges: which model version is serving (as a label) and how often it was swapped."""
+    status = registry.status()
+    info_labels = {'version': status.get('version') or 'none', 'source': status.get('source') or 'none'}
+    return [
+        ("udupi_model_info", "gauge", "The model currently serving (always 1, see labels).", [(info_labels, 1)]),
+        ("udupi_model_ready", "gauge", "1 once a model is loaded and serving.", [({}, int(status['ready']))]),
+        ("udupi_model_generation", "gauge", "How many times a model has been swapped in.", [({}, registry.generation)]),
+    ]
+
+
+metrics.collectors.append(collect_model_info)
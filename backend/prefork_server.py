@@ -0,0 +1,317 @@
+import gc
+import importlib
+import os
+import select
+import signal
+import socket
+import sys
+import time
+import traceback
+import uvicorn
+
+from model_registry import registry
+from surge_engine import surge
+
+# --- LAUNCHER SETTINGS (can be overridden with environment variables) ---
+SERVER_WORKERS = int(os.environ.get("SERVER_WORKERS", os.cpu_count() or 1))
+# A new worker that has not warmed up and started accepting within this many seconds is given up on
+WORKER_READY_TIMEOUT = float(os.environ.get("WORKER_READY_TIMEOUT", 60))
+# How long a retiring worker may take to finish the requests it already has
+WORKER_GRACEFUL_TIMEOUT = float(os.environ.get("WORKER_GRACEFUL_TIMEOUT", 30))
+# A worker that dies this soon after starting is restarted with a growing delay (crash loops)
+MIN_WORKER_LIFETIME = 5.0
+MAX_RESTART_DELAY = 30.0
+# Udupi -> Manipal at 6 PM: rush hour, so the warm-up quote goes through the surge path too
+WARMUP_TRIP = (13.3409, 74.7421, 13.3525, 74.7868, 18)
+
+
+def load_app(target):
+    """'module:attribute' -> the ASGI app, e.g. 'main:app'."""
+    module_name, _, attribute = target.partition(":")
+    return getattr(importlib.import_module(module_name), attribute or "app")
+
+
+def warm_up():
+    """Loads the model and runs one synthetic quote through the table and the precise path."""
+    from ranking_engine import get_vehicle_recommendations
+
+    bundle = registry.warm_up()
+    if bundle.model is None:
+        return False
+    for precise in (False, True):
+        get_vehicle_recommendations(*WARMUP_TRIP, 'balanced', precise=precise)
+    return True
+
+
+def freeze_heap():
+    """
+    Moves everything allocated so far out of the garbage collector's reach. Forked workers then
+    never write to those objects' headers, so their pages stay shared copy-on-write.
+    """
+    gc.collect()
+    gc.freeze()
+
+
+class WorkerServer(uvicorn.Server):
+    """uvicorn in a forked worker: tells the launcher once it is really accepting connections."""
+
+    def __init__(self, config, ready_fd):
+        super().__init__(config)
+        self.ready_fd = ready_fd
+
+    async def startup(self, sockets=None):
+        await super().startup(sockets)
+        if self.started and self.ready_fd is not None:
+            os.write(self.ready_fd, b"1")
+            os.close(self.ready_fd)
+            self.ready_fd = None
+
+
+class Worker:
+    __slots__ = ('pid', 'ready_fd', 'started_at', 'ready')
+
+    def __init__(self, pid, ready_fd):
+        self.pid = pid
+        self.ready_fd = ready_fd
+        self.started_at = time.monotonic()
+        self.ready = False
+
+
+class PreforkServer:
+    """
+    Runs N uvicorn workers of one app on a shared listening socket.
+
+    The launcher imports the app, loads and warms the model, moves the surge counters into
+    shared memory and only then forks, so the forest arrays (memory-mapped or on the heap) and
+    the ETA tables are shared copy-on-write instead of loaded N times. Each worker warms itself
+    up with a synthetic quote before it starts accepting; until then the kernel keeps its share
+    of new connections queued for the workers that are already serving.
+
+    Signals to the launcher:
+      SIGHUP           hot-reload the model here (validated, see hot_reload.py), then replace the
+                       workers one by one: a new one must be ready before an old one is retired.
+      SIGUSR1          roll back to the previous model here, then replace the workers the same way.
+      SIGTERM/SIGINT   graceful shutdown: workers finish the requests they have, then exit.
+    Workers that die are restarted (with a growing delay if they keep dying at startup).
+    A worker's /admin/reload and /admin/rollback send these signals to the launcher, and MODEL_WATCH_SECONDS
+    is watched here, so every worker always serves the same model.
+    """
+
+    def __init__(self, app_target="main:app", host="127.0.0.1", port=8001, workers=SERVER_WORKERS,
+                 ready_timeout=WORKER_READY_TIMEOUT, graceful_timeout=WORKER_GRACEFUL_TIMEOUT, log_level="warning"):
+        self.app_target = app_target
+        self.host = host
+        self.port = port
+        self.n_workers = max(1, workers)
+        self.ready_timeout = ready_timeout
+        self.graceful_timeout = graceful_timeout
+        self.log_level = log_level
+        self.app = None
+        self.sock = None
+        self.workers = {}
+        # Workers told to stop, waiting to be reaped: pid -> deadline for a SIGKILL
+        self.retiring = {}
+        self.restarts = 0
+        self._restart_delay = 0.0
+        self._stopping = False
+        self._reload_requested = False
+        self._rollback_requested = False
+
+    # --- launcher side ---
+
+    def bind(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(2048)
+        sock.set_inheritable(True)
+        self.port = sock.getsockname()[1]
+        return sock
+
+    def prepare(self):
+        """Everything that should happen once, before forking."""
+        self.app = load_app(self.app_target)
+        if not warm_up():
+            raise RuntimeError(f"Model not loaded ({registry.status().get('error')}). Please run train_model.py first!")
+        surge.share()
+        freeze_heap()
+
+    def spawn(self):
+        ready_read, ready_write = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(ready_read)
+            code = 0
+            try:
+                self._worker_main(ready_write)
+            except BaseException:
+                traceback.print_exc()
+                code = 1
+            finally:
+                os._exit(code)
+        os.close(ready_write)
+        worker = Worker(pid, ready_read)
+        self.workers[pid] = worker
+        return worker
+
+    def wait_ready(self, worker, timeout=None):
+        """Blocks until `worker` accepts connections. False if it died or timed out first."""
+        if worker.ready:
+            return True
+        readable, _, _ = select.select([worker.ready_fd], [], [], self.ready_timeout if timeout is None else timeout)
+        worker.ready = bool(readable) and os.read(worker.ready_fd, 1) == b"1"
+        if readable or worker.ready:
+            os.close(worker.ready_fd)
+            worker.ready_fd = None
+        return worker.ready
+
+    def retire(self, pid, sig=signal.SIGTERM):
+        worker = self.workers.pop(pid, None)
+        if worker is not None and worker.ready_fd is not None:
+            os.close(worker.ready_fd)
+        self.retiring[pid] = time.monotonic() + self.graceful_timeout
+        try:
+            os.kill(pid, sig)
+        except ProcessLookupError:
+            pass
+
+    def reap(self):
+        """Collects exited workers. Returns the pids of serving workers that died unexpectedly."""
+        died = []
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            if self.retiring.pop(pid, None) is not None:
+                continue
+            worker = self.workers.pop(pid, None)
+            if worker is not None:
+                if worker.ready_fd is not None:
+                    os.close(worker.ready_fd)
+                lived = time.monotonic() - worker.started_at
+                print(f"❌ Worker {pid} exited (status {os.waitstatus_to_exitcode(status)}) after {lived:.1f}s.", flush=True)
+                self._restart_delay = min(MAX_RESTART_DELAY, max(1.0, self._restart_delay * 2)) if lived < MIN_WORKER_LIFETIME else 0.0
+                died.append(pid)
+        # Workers that ignore a graceful stop for too long are killed
+        now = time.monotonic()
+        for pid, deadline in list(self.retiring.items()):
+            if now > deadline:
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+                self.retiring[pid] = float('inf')
+        return died
+
+    def rolling_restart(self, back=False):
+        """Reloads (or rolls back) the model in the launcher and swaps every worker for a freshly forked one."""
+        from hot_reload import hot_reload, rollback
+
+        gc.unfreeze()
+        report = rollback() if back else hot_reload()
+        if not report.get('rolled_back' if back else 'swapped'):
+            print(f"❌ Keeping the current workers: {report.get('reason')}", flush=True)
+            freeze_heap()
+            return report
+        warm_up()
+        freeze_heap()
+
+        for old_pid in list(self.workers):
+            new = self.spawn()
+            if not self.wait_ready(new):
+                print(f"❌ Replacement worker {new.pid} did not become ready, stopping the rolling restart.", flush=True)
+                self.retire(new.pid, signal.SIGKILL)
+                break
+            self.retire(old_pid)
+        print(f"🔄 {len(self.workers)} workers serving model {report.get('version')}.", flush=True)
+        return report
+
+    def _on_signal(self, signum, _frame):
+        if signum == signal.SIGHUP:
+            self._reload_requested = True
+        elif signum == signal.SIGUSR1:
+            self._rollback_requested = True
+        else:
+            self._stopping = True
+
+    def run(self):
+        from hot_reload import PREFORK_LAUNCHER_ENV, MODEL_WATCH_SECONDS, ModelWatcher
+
+        self.sock = self.bind()
+        # Tells the workers' admin routes where to send reloads and rollbacks
+        os.environ[PREFORK_LAUNCHER_ENV] = str(os.getpid())
+        self.prepare()
+        for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP, signal.SIGUSR1):
+            signal.signal(sig, self._on_signal)
+        watcher = None
+        if MODEL_WATCH_SECONDS > 0:
+            watcher = ModelWatcher(on_change=lambda: self._on_signal(signal.SIGHUP, None))
+            watcher.start()
+
+        for _ in range(self.n_workers):
+            self.spawn()
+        ready = sum(self.wait_ready(w) for w in list(self.workers.values()))
+        print(f"🚀 {ready}/{self.n_workers} workers serving {self.app_target} on http://{self.host}:{self.port} "
+              f"(model {registry.bundle.version}, launcher pid {os.getpid()})", flush=True)
+
+        while not self._stopping:
+            if self._reload_requested:
+                self._reload_requested = False
+                self.rolling_restart()
+            if self._rollback_requested:
+                self._rollback_requested = False
+                self.rolling_restart(back=True)
+            if self.reap() and self._restart_delay:
+                time.sleep(self._restart_delay)
+            while not self._stopping and len(self.workers) < self.n_workers:
+                self.spawn()
+                self.restarts += 1
+            for worker in list(self.workers.values()):
+                if not worker.ready and worker.ready_fd is not None:
+                    self.wait_ready(worker, timeout=0)
+            time.sleep(0.2)
+        if watcher is not None:
+            watcher.stop()
+        self.shutdown()
+
+    def shutdown(self):
+        for pid in list(self.workers):
+            self.retire(pid)
+        while self.retiring:
+            self.reap()
+            time.sleep(0.1)
+        self.sock.close()
+        print("👋 All workers stopped.", flush=True)
+
+    # --- worker side ---
+
+    def _worker_main(self, ready_fd):
+        # The launcher's handlers are no use here: uvicorn installs its own for a graceful stop, and
+        # SIGHUP/SIGUSR1 are only for the launcher (the app's lifespan leaves them alone in a worker)
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, signal.SIG_DFL)
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        signal.signal(signal.SIGUSR1, signal.SIG_IGN)
+        # The heap stays frozen: unfreezing would let the collector touch (and copy) every shared page
+        warm_up()
+        config = uvicorn.Config(self.app, log_level=self.log_level, timeout_graceful_shutdown=self.graceful_timeout)
+        WorkerServer(config, ready_fd).run(sockets=[self.sock])
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve the quote API from several pre-forked, pre-warmed workers.")
+    parser.add_argument("--app", default="main:app", help="'module:attribute' of the ASGI app (main:app or app:app)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--workers", type=int, default=SERVER_WORKERS)
+    parser.add_argument("--log-level", default="warning")
+    args = parser.parse_args()
+
+    if not hasattr(os, "fork"):
+        sys.exit("❌ Error: prefork_server.py needs fork() (Linux/macOS). Use uvicorn --workers elsewhere.")
+    PreforkServer(args.app, args.host, args.port, args.workers, log_level=args.log_level).run()
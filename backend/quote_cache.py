@@ -0,0 +1,126 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from ranking_engine import get_vehicle_recommendations
+from model_registry import registry
+from surge_engine import surge
+from quote_log import quote_log
+from metrics import metrics, stats_collector
+
+# --- CACHE SETTINGS (can be overridden with environment variables) ---
+CACHE_SIZE = int(os.environ.get("QUOTE_CACHE_SIZE", 10000))
+CACHE_TTL = float(os.environ.get("QUOTE_CACHE_TTL", 60))          # seconds a quote stays valid
+CACHE_POLICY = os.environ.get("QUOTE_CACHE_POLICY", "lru")         # 'lru' or 'fifo'
+# 3 decimals of a degree is ~110 m, so riders in the same pickup spot share a quote
+COORD_DECIMALS = int(os.environ.get("QUOTE_CACHE_COORD_DECIMALS", 3))
+
+
+class QuoteCache:
+    """
+    Bounded, thread-safe cache of ranked quotes with a time-to-live.
+
+    policy='lru' moves an entry to the back on every hit (least recently used goes first),
+    policy='fifo' evicts in insertion order no matter how often an entry is read.
+    """
+
+    def __init__(self, max_size=CACHE_SIZE, ttl=CACHE_TTL, policy=CACHE_POLICY, clock=time.monotonic):
+        if policy not in ('lru', 'fifo'):
+            raise ValueError("policy must be 'lru' or 'fifo'")
+        self.max_size = max_size
+        self.ttl = ttl
+        self.policy = policy
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        """Returns the cached value, or None if it is missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if self.clock() >= expires_at:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            if self.policy == 'lru':
+                self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            if key in self._entries:
+                del self._entries[key]
+            self._entries[key] = (self.clock() + self.ttl, value)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'policy': self.policy,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+quote_cache = QuoteCache()
+# A new model means new ETAs, so every cached quote is dropped on reload
+registry.listeners.append(quote_cache.clear)
+metrics.collectors.append(stats_collector("udupi_quote_cache", quote_cache.stats))
+
+
+def quote_key(start_lat, start_lon, end_lat, end_lon, hour, preference, precise=False, quantiles=False):
+    # The pickup zone's live surge is part of the key: when it changes, riders get a freshly priced quote
+    start_lat, start_lon = round(start_lat, COORD_DECIMALS), round(start_lon, COORD_DECIMALS)
+    return (
+        start_lat, start_lon,
+        round(end_lat, COORD_DECIMALS), round(end_lon, COORD_DECIMALS),
+        int(hour), preference, precise, registry.generation, surge.multiplier(start_lat, start_lon), quantiles
+    )
+
+
+def get_cached_recommendations(start_lat, start_lon, end_lat, end_lon, hour, preference='balanced', precise=False, quantiles=False):
+    """
+    Same as get_vehicle_recommendations, with the quote cache in front of it.
+    Quotes are computed from the rounded coordinates, so everyone hitting the same key
+    gets exactly the answer a fresh computation for that key would give.
+    Every call (hit or miss) counts as demand for the pickup zone's live surge.
+    """
+    surge.record(start_lat, start_lon)
+    key = quote_key(start_lat, start_lon, end_lat, end_lon, hour, preference, precise, quantiles)
+    cached = quote_cache.get(key)
+    if cached is None:
+        cached = get_vehicle_recommendations(key[0], key[1], key[2], key[3], hour, preference, precise, key[8], quantiles)
+        if isinstance(cached, dict):
+            # Errors (e.g. model not loaded) are never cached
+            return cached
+        quote_cache.put(key, cached)
+    quote_log.log(start_lat, start_lon, end_lat, end_lon, hour, preference, precise, cached)
+    # Recommendation rows are immutable, so every hit can share them (only the list is copied)
+    return list(cached)
@@ -0,0 +1,301 @@
+import atexit
+import csv
+import glob
+import gzip
+import io
+import os
+import queue
+import threading
+import time
+import numpy as np
+import pandas as pd
+
+from model_registry import registry
+from ride_dataset import DATA_DIR, VEHICLE_CATEGORIES
+from metrics import metrics, stats_collector
+
+# --- QUOTE LOG SETTINGS (can be overridden with environment variables) ---
+# Set QUOTE_LOG_ENABLED=0 to serve without recording quotes
+QUOTE_LOG_ENABLED = os.environ.get("QUOTE_LOG_ENABLED", "1") == "1"
+QUOTE_LOG_DIR = os.environ.get("QUOTE_LOG_DIR", os.path.join(DATA_DIR, "quote_logs"))
+# Quotes waiting for the writer; when it falls this far behind, new quotes are dropped (and counted)
+QUOTE_LOG_BUFFER = int(os.environ.get("QUOTE_LOG_BUFFER", 10000))
+# The writer collects up to this many quotes per write...
+QUOTE_LOG_BATCH = int(os.environ.get("QUOTE_LOG_BATCH", 500))
+# ...or writes what it has once the oldest has waited this long (seconds)
+QUOTE_LOG_FLUSH_SECONDS = float(os.environ.get("QUOTE_LOG_FLUSH_SECONDS", 1.0))
+# A log file is closed and a new one started at this size (compressed bytes) or age (seconds)
+QUOTE_LOG_MAX_BYTES = int(os.environ.get("QUOTE_LOG_MAX_BYTES", 64 * 1024 * 1024))
+QUOTE_LOG_MAX_SECONDS = float(os.environ.get("QUOTE_LOG_MAX_SECONDS", 3600))
+
+# One row per ride option offered: the trip as requested, which model answered and what it quoted.
+# rank is the option's place in the ranking the rider asked for (preference), 0 = shown first.
+LOG_COLUMNS = ['ts', 'model_version', 'start_lat', 'start_lon', 'end_lat', 'end_lon', 'hour_of_day',
+               'preference', 'precise', 'rank', 'vehicle_type', 'trip_distance', 'eta', 'fare', 'surge',
+               'eta_p10', 'eta_p90']
+LOG_DTYPES = {
+    'ts': 'float64', 'model_version': 'string',
+    'start_lat': 'float32', 'start_lon': 'float32', 'end_lat': 'float32', 'end_lon': 'float32',
+    'hour_of_day': 'uint8', 'preference': 'string', 'precise': 'bool', 'rank': 'uint8',
+    'vehicle_type': pd.CategoricalDtype(VEHICLE_CATEGORIES), 'trip_distance': 'float32',
+    'eta': 'float32', 'fare': 'float32', 'surge': 'float32', 'eta_p10': 'float32', 'eta_p90': 'float32',
+}
+# Closed files are quotes-<opened at>-<pid>-<number>.csv.gz; the file being written ends in .part until then
+LOG_PATTERN = "quotes-*.csv.gz"
+_STOP = object()
+
+# --- TRIP MIX (train_model.py --quote-logs) ---
+# Rides are reweighted per hour and distance band of this width (km); longer trips share the last band
+MIX_DISTANCE_BIN_KM = 0.5
+MAX_MIX_DISTANCE_KM = 10.0
+# No ride counts more than this many times (or less than 1/this) its plain weight
+MAX_MIX_WEIGHT = 10.0
+
+
+class QuoteLogger:
+    """
+    Appends every served quote to gzipped CSV files, off the request path.
+
+    log()/log_batch() only put a reference to the (immutable) rows on a bounded queue; a
+    background thread takes them in batches, formats and compresses them, and rotates the file
+    by size and age. When the queue is full the quote is dropped and counted, never waited for.
+
+    Each process writes its own files (the writer is started again after a fork), so the
+    prefork workers never share a file.
+    """
+
+    def __init__(self, log_dir=QUOTE_LOG_DIR, buffer_size=QUOTE_LOG_BUFFER, batch_size=QUOTE_LOG_BATCH,
+                 flush_seconds=QUOTE_LOG_FLUSH_SECONDS, max_bytes=QUOTE_LOG_MAX_BYTES,
+                 max_seconds=QUOTE_LOG_MAX_SECONDS, enabled=QUOTE_LOG_ENABLED, clock=time.time):
+        self.log_dir = log_dir
+        self.buffer_size = buffer_size
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        self.enabled = enabled
+        self.clock = clock
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self._drop_lock = threading.Lock()
+        # The open file (only touched by the writer thread)
+        self._raw = self._gzip = self._text = self._csv = None
+        self._path = None
+        self._opened_at = 0.0
+        self._file_number = 0
+
+        # --- METRICS ---
+        self.quotes_dropped = 0
+        self.quotes_written = 0
+        self.rows_written = 0
+        self.writes = 0
+        self.write_errors = 0
+        self.files_closed = 0
+
+    # --- request side ---
+
+    def log(self, start_lat, start_lon, end_lat, end_lon, hour, preference, precise, rows):
+        """Records one quote (the Recommendation rows it answered with)."""
+        self._put(((start_lat,), (start_lon,), (end_lat,), (end_lon,), (hour,), (preference,), precise, (rows,)), 1)
+
+    def log_batch(self, columns, precise, results):
+        """Records a batch quote: trips_to_columns() columns and one list of rows per trip."""
+        self._put((columns['start_lats'], columns['start_lons'], columns['end_lats'], columns['end_lons'],
+                   columns['hours'], columns['preferences'], precise, results), len(results))
+
+    def _put(self, quotes, count):
+        if not self.enabled:
+            return
+        if self._pid != os.getpid():
+            self._start()
+        bundle = registry.bundle
+        try:
+            self._queue.put_nowait((self.clock(), bundle.version if bundle is not None else None) + quotes)
+        except queue.Full:
+            with self._drop_lock:
+                self.quotes_dropped += count
+
+    def _start(self):
+        with self._start_lock:
+            # After a fork the parent's writer thread does not exist here: start this process's own
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(maxsize=self.buffer_size)
+            self._raw = self._gzip = self._text = self._csv = None
+            self._thread = threading.Thread(target=self._run, name="quote-log-writer", daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def close(self, timeout=5.0):
+        """Writes what is still queued and closes the current file. A later log() starts again."""
+        with self._start_lock:
+            if self._pid != os.getpid():
+                return
+            try:
+                self._queue.put(_STOP, timeout=timeout)
+            except queue.Full:
+                print("❌ Error: quote log writer is stuck, closing without the queued quotes.")
+            self._thread.join(timeout)
+            self._pid = None
+
+    # --- writer side ---
+
+    def _run(self):
+        while True:
+            try:
+                batch = [self._queue.get(timeout=self.flush_seconds)]
+            except queue.Empty:
+                batch = []
+            # Keep collecting until the batch is full or the first quote has waited flush_seconds
+            deadline = time.monotonic() + self.flush_seconds
+            while batch and batch[-1] is not _STOP and len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = bool(batch) and batch[-1] is _STOP
+            if stop:
+                batch.pop()
+            if self._raw is not None and (self._raw.tell() >= self.max_bytes or
+                                          self.clock() - self._opened_at >= self.max_seconds):
+                self._close_file()
+            if batch:
+                self._write(batch)
+            if stop:
+                self._close_file()
+                return
+
+    def _write(self, batch):
+        try:
+            if self._raw is None:
+                self._open_file()
+            rows = self._csv_rows(batch)
+            self._csv.writerows(rows)
+            self._text.flush()
+            # A sync flush: everything written so far can be decompressed even if the process dies
+            self._gzip.flush()
+            self.writes += 1
+            self.rows_written += len(rows)
+            self.quotes_written += sum(len(quotes[-1]) for quotes in batch)
+        except (OSError, ValueError) as e:
+            self.write_errors += 1
+            print(f"❌ Error writing the quote log ({self._path}): {e}")
+            self._close_file()
+
+    @staticmethod
+    def _csv_rows(batch):
+        rows = []
+        for ts, version, start_lats, start_lons, end_lats, end_lons, hours, preferences, precise, results in batch:
+            if isinstance(preferences, str):
+                preferences = [preferences] * len(results)
+            ts = round(ts, 3)
+            for trip in zip(start_lats, start_lons, end_lats, end_lons, hours, preferences, results):
+                options = trip[6]
+                if isinstance(options, dict):
+                    continue  # an error answer, nothing was quoted
+                for rank, row in enumerate(options):
+                    rows.append((ts, version, *trip[:6], int(precise), rank, row.vehicle, row.distance,
+                                 row.eta, row.fare, row.surge, row.eta_p10, row.eta_p90))
+        return rows
+
+    def _open_file(self):
+        os.makedirs(self.log_dir, exist_ok=True)
+        self._opened_at = self.clock()
+        # The file number keeps names apart when files fill up within the same second
+        self._file_number += 1
+        opened = time.strftime('%Y%m%d-%H%M%S', time.localtime(self._opened_at))
+        name = f"quotes-{opened}-{os.getpid()}-{self._file_number:04d}.csv.gz"
+        self._path = os.path.join(self.log_dir, name)
+        self._raw = open(self._path + ".part", 'wb')
+        self._gzip = gzip.GzipFile(fileobj=self._raw, mode='wb')
+        self._text = io.TextIOWrapper(self._gzip, encoding='utf-8', newline='')
+        self._csv = csv.writer(self._text)
+        self._csv.writerow(LOG_COLUMNS)
+
+    def _close_file(self):
+        if self._raw is None:
+            return
+        try:
+            self._text.close()  # also writes the gzip trailer
+            self._raw.close()
+            # Renamed only once complete, so readers never see a half-written file
+            os.replace(self._path + ".part", self._path)
+            self.files_closed += 1
+        except (OSError, ValueError) as e:
+            self.write_errors += 1
+            print(f"❌ Error closing the quote log ({self._path}): {e}")
+        self._raw = self._gzip = self._text = self._csv = None
+
+    def stats(self):
+        running = self._pid == os.getpid()
+        return {
+            'enabled': self.enabled,
+            'log_dir': self.log_dir,
+            'current_file': self._path if self._raw is not None else None,
+            'buffer_size': self.buffer_size,
+            'queued': self._queue.qsize() if running else 0,
+            'quotes_written': self.quotes_written,
+            'quotes_dropped': self.quotes_dropped,
+            'rows_written': self.rows_written,
+            'writes': self.writes,
+            'write_errors': self.write_errors,
+            'files_closed': self.files_closed,
+        }
+
+
+quote_log = QuoteLogger()
+metrics.collectors.append(stats_collector("udupi_quote_log", quote_log.stats))
+# Plain `python main.py` exits through here; uvicorn workers also close it in the lifespan
+atexit.register(quote_log.close)
+
+
+# --- READING THE LOGS BACK (for train_model.py) ---
+
+def log_files(log_dir=QUOTE_LOG_DIR):
+    """The closed log files, oldest first (files still being written are skipped)."""
+    return sorted(glob.glob(os.path.join(log_dir, LOG_PATTERN)))
+
+
+def load_quote_logs(log_dir=QUOTE_LOG_DIR, since=None):
+    """Every logged ride option as one DataFrame (LOG_COLUMNS), optionally only those after `since` (unix time)."""
+    frames = [pd.read_csv(path, dtype=LOG_DTYPES) for path in log_files(log_dir)]
+    if not frames:
+        return pd.DataFrame({column: pd.Series(dtype=dtype) for column, dtype in LOG_DTYPES.items()})
+    logs = pd.concat(frames, ignore_index=True)
+    if since is not None:
+        logs = logs[logs['ts'] >= since].reset_index(drop=True)
+    return logs
+
+
+def quoted_trips(logs):
+    """One row per quote (its first option): the trip a rider asked for, whatever vehicles were shown."""
+    return logs[logs['rank'] == 0].reset_index(drop=True)
+
+
+def trip_mix_weights(logs, hours, distances, distance_bin_km=MIX_DISTANCE_BIN_KM, max_weight=MAX_MIX_WEIGHT):
+    """
+    Training weights that give rides the (hour, distance) mix riders actually ask for.
+
+    The log holds what was quoted, not how long rides took, so it is never used as labels:
+    served ETAs are the model's own output (with zone corrections and ETA-table snapping), and
+    only the top 3 vehicles of each quote are logged. Only the trip mix is taken from it, per
+    quote, so the vehicle mix of the training rides is left alone.
+
+    Every ride gets share in the log / share in the training rides of its (hour, distance bin),
+    both with add-one smoothing, scaled to a mean of 1 and clipped to [1 / max_weight, max_weight].
+    """
+    trips = quoted_trips(logs)
+    n_bins = int(MAX_MIX_DISTANCE_KM / distance_bin_km) + 1
+
+    def bins(hour, distance):
+        distance_bin = np.minimum(np.asarray(distance, dtype=np.float64) // distance_bin_km, n_bins - 1)
+        return np.asarray(hour, dtype=np.int64) * n_bins + distance_bin.astype(np.int64)
+
+    ride_bins = bins(hours, distances)
+    logged = np.bincount(bins(trips['hour_of_day'], trips['trip_distance']), minlength=24 * n_bins) + 1.0
+    ridden = np.bincount(ride_bins, minlength=24 * n_bins) + 1.0
+    weights = (logged / logged.sum() / (ridden / ridden.sum()))[ride_bins]
+    return np.clip(weights / weights.mean(), 1 / max_weight, max_weight)
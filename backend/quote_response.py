@@ -0,0 +1,75 @@
+from typing import List, NamedTuple, Optional
+from pydantic import BaseModel
+from starlette.responses import Response
+
+
+class Recommendation(NamedTuple):
+    """
+    One ranked ride option, as the ranking engine returns it.
+
+    A tuple: small, typed, built without a per-row dict, and immutable, so the quote cache
+    can hand the same rows to every hit instead of copying them.
+    score is only set for the balanced ranking, the eta_p* range only for quantile quotes;
+    fields that are not set are left out of the JSON.
+    """
+    vehicle: str
+    eta: float
+    fare: int
+    distance: float
+    demand: str
+    surge: float
+    score: Optional[float] = None
+    eta_p10: Optional[float] = None
+    eta_p50: Optional[float] = None
+    eta_p90: Optional[float] = None
+
+    def to_dict(self):
+        return {name: value for name, value in zip(self._fields, self) if value is not None}
+
+
+class RecommendationModel(BaseModel):
+    """The same row for the OpenAPI docs (response_model). Routes answer with encode_recommendations."""
+    vehicle: str
+    eta: float
+    fare: int
+    distance: float
+    demand: str
+    surge: float
+    score: Optional[float] = None
+    eta_p10: Optional[float] = None
+    eta_p50: Optional[float] = None
+    eta_p90: Optional[float] = None
+
+
+RecommendationList = List[RecommendationModel]
+
+# The JSON for one row, with the keys in the order clients have always seen them.
+# vehicle and demand come from fixed sets of plain words (ranking_engine), so no escaping is needed;
+# the numbers are Python floats/ints, whose repr is valid JSON (the same text json.dumps writes).
+_ROW_JSON = '{"vehicle":"%s","eta":%r,"fare":%d,"distance":%r,"demand":"%s","surge":%r'
+_RANGE_JSON = ',"eta_p10":%r,"eta_p50":%r,"eta_p90":%r'
+
+
+def encode_row(row):
+    vehicle, eta, fare, distance, demand, surge, score, p10, p50, p90 = row
+    text = _ROW_JSON % (vehicle, eta, fare, distance, demand, surge)
+    if score is not None:
+        text += f',"score":{score!r}'
+    if p10 is not None:
+        text += _RANGE_JSON % (p10, p50, p90)
+    return text + '}'
+
+
+def encode_recommendations(rows):
+    """One trip's recommendations as a JSON array (str), without going through dicts."""
+    return '[' + ','.join([encode_row(row) for row in rows]) + ']'
+
+
+def encode_batch(results):
+    """Many trips' recommendations (get_batch_recommendations) as one JSON array of arrays."""
+    return '[' + ','.join([encode_recommendations(rows) for rows in results]) + ']'
+
+
+class QuoteResponse(Response):
+    """Sends JSON from encode_recommendations/encode_batch as it is (no jsonable_encoder + json.dumps pass)."""
+    media_type = "application/json"
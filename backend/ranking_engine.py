@@ -1,95 +1,344 @@
-import pandas as pd
 import numpy as np
-import joblib
-import os
-
-# We look for the trained AI model (the brain) in the backend folder
-model_path = os.path.join('backend', 'eta_model.pkl')
-
-model = None
-try:
-    if os.path.exists(model_path):
-        model = joblib.load(model_path)
-    elif os.path.exists('eta_model.pkl'):
-        model = joblib.load('eta_model.pkl')
+import warnings
+
+from eta_surface import EtaSurface
+from model_registry import registry, load_columns
+from metrics import StageTimer, QUOTES_BY_DEMAND
+from geodesy import trip_distance
+from surge_engine import surge, rush_hour, rush_hours, RUSH_MULTIPLIER
+from quote_response import Recommendation
+from forest_engine import tree_predictions, tree_mean, tree_quantiles
+
+# The model was trained on a DataFrame, but we feed it a plain NumPy matrix
+# (much cheaper to build), so sklearn's feature-name warning is expected here
+warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+# --- FEATURE LAYOUT ---
+# The column order saved by train_model.py is the order the AI expects.
+# (The model itself is loaded lazily by the registry, see model_registry.py)
+DEFAULT_COLUMNS = [
+    'hour_of_day', 'trip_distance',
+    'vehicle_type_Auto', 'vehicle_type_Bike', 'vehicle_type_Mini',
+    'vehicle_type_SUV', 'vehicle_type_Sedan'
+]
+model_columns = load_columns(registry.model_dir, DEFAULT_COLUMNS)
+
+VEHICLE_TYPES = ['Bike', 'Auto', 'Mini', 'Sedan', 'SUV']
+
+# Base price + per-km rate for each vehicle (same numbers as generate_data.py)
+FARE_MAP = {'Bike': (20, 5), 'Auto': (30, 8), 'Mini': (50, 12), 'Sedan': (70, 15), 'SUV': (100, 20)}
+BASE_FARES = np.array([FARE_MAP[v][0] for v in VEHICLE_TYPES], dtype=np.float64)
+KM_RATES = np.array([FARE_MAP[v][1] for v in VEHICLE_TYPES], dtype=np.float64)
+
+# The ETA range quoted with quantiles=True (and ranked on by preference='reliable'): p10, p50, p90
+ETA_QUANTILES = (0.1, 0.5, 0.9)
+
+HOUR_COL = model_columns.index('hour_of_day')
+DIST_COL = model_columns.index('trip_distance')
+
+# One row per vehicle with its one-hot column already switched on.
+# Each quote copies this and only fills in the hour and distance columns.
+FEATURE_TEMPLATE = np.zeros((len(VEHICLE_TYPES), len(model_columns)), dtype=np.float64)
+for i, vehicle in enumerate(VEHICLE_TYPES):
+    v_col = f'vehicle_type_{vehicle}'
+    if v_col in model_columns:
+        FEATURE_TEMPLATE[i, model_columns.index(v_col)] = 1
+
+
+def reload_model():
+    """Reloads the model files from disk and tells every listener (caches) about it."""
+    return registry.reload()
+
+
+def build_eta_surface(**grid):
+    """
+    Builds the ETA table from the live model (e.g. at startup) and starts using it.
+    grid takes the EtaSurface.build options: hours, dist_min, dist_max, dist_step.
+    """
+    bundle = registry.get()
+    eta_surface = EtaSurface.build(bundle.model, model_columns, VEHICLE_TYPES, **grid)
+    registry.use_surface(eta_surface)
+    return eta_surface
+
+
+def build_feature_matrix(hour, dist):
+    """Returns the (5 x n_features) matrix the AI scores in a single call."""
+    features = FEATURE_TEMPLATE.copy()
+    features[:, HOUR_COL] = hour
+    features[:, DIST_COL] = dist
+    return features
+
+
+def trip_features(hours, dists):
+    """The (trips * 5 x n_features) matrix for many trips: row trip * 5 + vehicle."""
+    features = np.tile(FEATURE_TEMPLATE, (len(hours), 1))
+    features[:, HOUR_COL] = np.repeat(hours, len(VEHICLE_TYPES))
+    features[:, DIST_COL] = np.repeat(dists, len(VEHICLE_TYPES))
+    return features
+
+
+def rank_options(etas, fares, preference='balanced', eta_p90=None):
+    """
+    Returns the row order for the given preference (best first).
+    etas and fares are the already rounded values we show to the rider.
+    'reliable' sorts on the slow end of the ETA range (eta_p90), or on etas when there is no range.
+    """
+    scores = None
+    if preference == 'reliable':
+        order = np.argsort(etas if eta_p90 is None else eta_p90, kind='stable')
+    elif preference == 'fastest' or preference == '3':
+        order = np.argsort(etas, kind='stable')
+    elif preference == 'cheapest' or preference == '1':
+        order = np.argsort(fares, kind='stable')
     else:
-        print(f"❌ Error: Model not found at {model_path}. Please run train_model.py first!")
-except Exception as e:
-    print(f"❌ Error loading model: {e}")
+        # Balanced score: 60% importance to time, 40% importance to money
+        scores = (etas * 0.6) + (fares * 0.04)
+        order = np.argsort(scores, kind='stable')
+    return order, scores
 
-def get_vehicle_recommendations(start_lat, start_lon, end_lat, end_lon, hour, preference='balanced'):
+
+def predict_trip_etas(hours, dists, precise=False, bundle=None):
+    """
+    Raw ETAs for many trips: returns a (trips x 5 vehicles) array.
+    Trips inside the ETA table are looked up, the rest (or all of them when precise=True)
+    go through the model in one predict call.
+    """
+    bundle = bundle or registry.get()
+    model, eta_surface = bundle.model, bundle.eta_surface
+    n_trips, n_vehicles = len(hours), len(VEHICLE_TYPES)
+    etas = np.empty((n_trips, n_vehicles), dtype=np.float64)
+
+    if eta_surface is not None and not precise:
+        in_table = eta_surface.covers(hours, dists)
+        etas[in_table] = eta_surface.lookup(hours[in_table], dists[in_table])
+        rest = ~in_table
+    else:
+        rest = np.ones(n_trips, dtype=bool)
+
+    if rest.any():
+        n_rest = int(rest.sum())
+        etas[rest] = model.predict(trip_features(hours[rest], dists[rest])).reshape(n_rest, n_vehicles)
+
+    return etas
+
+
+def predict_trip_ranges(hours, dists, precise=False, bundle=None):
+    """
+    predict_trip_etas plus an ETA range: returns (etas, ranges), ranges is (trips x 5 vehicles x 3)
+    with the p10/p50/p90 of the trees' predictions.
+
+    Every trip goes through one tree traversal, and the ETA is the mean of those same tree values,
+    unless the ETA table answers it (then it is exactly what predict_trip_etas returns).
+    ranges is None for models without trees (a distilled model): the quote then has no range.
+    """
+    bundle = bundle or registry.get()
+    n_trips, n_vehicles = len(hours), len(VEHICLE_TYPES)
+    leaves = tree_predictions(bundle.model, trip_features(hours, dists))
+    if leaves is None:
+        return predict_trip_etas(hours, dists, precise, bundle), None
+
+    etas = tree_mean(leaves).reshape(n_trips, n_vehicles)
+    ranges = tree_quantiles(leaves, ETA_QUANTILES).reshape(n_trips, n_vehicles, len(ETA_QUANTILES))
+    eta_surface = bundle.eta_surface
+    if eta_surface is not None and not precise:
+        in_table = eta_surface.covers(hours, dists)
+        etas[in_table] = eta_surface.lookup(hours[in_table], dists[in_table])
+    return etas, ranges
+
+
+def round_ranges(ranges, etas):
+    """Rounds ranges like the ETAs and widens them where needed so p10 <= eta <= p90."""
+    ranges = np.round(ranges, 1)
+    ranges[..., 0] = np.minimum(ranges[..., 0], etas)
+    ranges[..., -1] = np.maximum(ranges[..., -1], etas)
+    return ranges
+
+
+def get_vehicle_recommendations(start_lat, start_lon, end_lat, end_lon, hour, preference='balanced', precise=False, live_surge=None,
+                                quantiles=False):
     """
     How this works:
     1. We calculate the real distance using latitudes and longitudes.
-    2. we check if it's rush hour to add extra 'surge' costs.
-    3. We ask the AI to predict the time for each car type.
-    4. We sort them based on what the user wants (Cheap, Fast, or Balanced).
+    2. we check if it's rush hour, or the pickup zone is busy right now, to add extra 'surge' costs
+       (live_surge overrides the live multiplier, e.g. the one a cached quote was keyed on).
+    3. We ask the AI to predict the time for all car types in one go
+       (or read it from the ETA table, unless precise=True), and correct it
+       by the pickup/drop zone pair's historical error (zone tables, also skipped when precise=True).
+    4. We sort them based on what the user wants (Cheap, Fast, Balanced, or Reliable).
+
+    quantiles=True (always on for 'reliable') adds a p10/p50/p90 ETA range per vehicle, from the
+    spread of the forest's trees (one traversal, see predict_trip_ranges).
+    Returns the top 3 options as a list of Recommendation rows (quote_response.py).
     """
+    # One snapshot of the model for the whole quote (a reload can't swap it halfway)
+    bundle = registry.get()
+    model, eta_surface = bundle.model, bundle.eta_surface
     if model is None:
         return {"error": "The AI model is not loaded correctly."}
+    timer = StageTimer('single')
 
     # --- STEP 1: DISTANCE MATH ---
-    # We use basic geometry to find the distance between two points on the map
-    dist = np.sqrt((end_lat - start_lat)**2 + (end_lon - start_lon)**2) * 111
-    if dist < 0.1: dist = 0.5 # Minimum distance so we don't have 0km rides
+    # Haversine (or road) distance between the two points, with the short-trip minimum
+    dist = trip_distance(start_lat, start_lon, end_lat, end_lon)
+    timer.lap('distance')
 
     # --- STEP 2: TRAFFIC & PRICE CHECK ---
-    # Peak hours in Udupi usually happen in the morning and evening
-    is_rush_hour = (9 <= hour <= 11) or (17 <= hour <= 21)
-    surge_multiplier = 1.45 if is_rush_hour else 1.0
-    demand_label = "High" if is_rush_hour else "Normal"
-
-    vehicle_types = ['Bike', 'Auto', 'Mini', 'Sedan', 'SUV']
-    analysis_output = []
-
-    # --- STEP 3: AI PREDICTION LOOP ---
-    for vehicle in vehicle_types:
-        # We tell the AI the current hour, distance, and vehicle type
-        input_dict = {
-            'hour_of_day': hour, 
-            'trip_distance': dist,
-            'vehicle_type_Auto': 0, 
-            'vehicle_type_Bike': 0,
-            'vehicle_type_Mini': 0, 
-            'vehicle_type_SUV': 0, 
-            'vehicle_type_Sedan': 0
-        }
-        
-        # We set only the current vehicle to '1' (Active)
-        v_col = f'vehicle_type_{vehicle}'
-        if v_col in input_dict: 
-            input_dict[v_col] = 1
-        
-        # Converting the dictionary to a format the AI understands (DataFrame)
-        input_df = pd.DataFrame([input_dict])
-        predicted_eta = model.predict(input_df)[0]
-
-        # Calculate fare based on base price + km rate
-        fare_map = {'Bike': (20, 5), 'Auto': (30, 8), 'Mini': (50, 12), 'Sedan': (70, 15), 'SUV': (100, 20)}
-        base, rate = fare_map[vehicle]
-        total_fare = (base + (dist * rate)) * surge_multiplier
-
-        analysis_output.append({
-            'vehicle': vehicle,
-            'eta': round(predicted_eta, 1),
-            'fare': int(round(total_fare, 0)),
-            'distance': round(dist, 2),
-            'demand': demand_label
-        })
+    # Peak hours in Udupi usually happen in the morning and evening; busy zones surge at any hour
+    if live_surge is None:
+        live_surge = surge.multiplier(start_lat, start_lon)
+    surge_multiplier = float(max(RUSH_MULTIPLIER if rush_hour(hour) else 1.0, live_surge))
+    demand_label = "High" if surge_multiplier > 1.0 else "Normal"
+    QUOTES_BY_DEMAND.inc((demand_label,))
+    timer.lap('surge')
+
+    # --- STEP 3: AI PREDICTION (ONE CALL FOR ALL VEHICLES) ---
+    ranges = None
+    if quantiles or preference == 'reliable':
+        # Every tree's ETA for every vehicle: the range, and the mean if the table doesn't answer
+        leaves = tree_predictions(model, build_feature_matrix(hour, dist))
+        if leaves is not None:
+            ranges = tree_quantiles(leaves, ETA_QUANTILES)
+        timer.lap('trees')
+    if eta_surface is not None and not precise and eta_surface.covers(hour, dist):
+        etas = eta_surface.lookup(hour, dist)
+        timer.lap('eta_table')
+    elif ranges is not None:
+        etas = tree_mean(leaves)
+    else:
+        features = build_feature_matrix(hour, dist)
+        timer.lap('features')
+        etas = model.predict(features)
+        timer.lap('predict')
+    zone_tables = bundle.zone_tables
+    if zone_tables is not None and not precise:
+        residual = float(zone_tables.eta_residual[zone_tables.pair(start_lat, start_lon, end_lat, end_lon)])
+        etas = etas + residual
+        if ranges is not None:
+            ranges = ranges + residual
+        timer.lap('zones')
+    etas = np.round(etas, 1)
+    if ranges is not None:
+        ranges = round_ranges(ranges, etas)
+
+    # Calculate fare based on base price + km rate
+    fares = np.round((BASE_FARES + (dist * KM_RATES)) * surge_multiplier, 0)
 
     # --- STEP 4: RANKING LOGIC ---
-    df = pd.DataFrame(analysis_output)
+    order, scores = rank_options(etas, fares, preference, ranges[:, -1] if ranges is not None else None)
 
-    if preference == 'fastest' or preference == '3':
-        df = df.sort_values(by='eta')
-    elif preference == 'cheapest' or preference == '1':
-        df = df.sort_values(by='fare')
+    distance = float(round(dist, 2))
+    etas, fares = etas.tolist(), fares.tolist()
+    scores = scores.tolist() if scores is not None else None
+    # Without quantiles the range fields stay None (and are left out of the JSON)
+    ranges = ranges.tolist() if ranges is not None else [(None, None, None)] * len(etas)
+    results = [
+        Recommendation(VEHICLE_TYPES[i], etas[i], int(fares[i]), distance, demand_label, surge_multiplier,
+                       scores[i] if scores is not None else None, *ranges[i])
+        for i in order[:3]
+    ]
+    timer.lap('ranking')
+
+    return results
+
+
+def get_batch_recommendations(start_lats, start_lons, end_lats, end_lons, hours, preferences='balanced', top_k=3, precise=False,
+                              live_surges=None, quantiles=False):
+    """
+    Same as get_vehicle_recommendations, but for many trips at once.
+    All trips x 5 vehicles are scored in one model.predict call.
+
+    preferences can be one string for every trip or one per trip.
+    live_surges (optional, one per trip) overrides the live surge multipliers.
+    quantiles=True adds the ETA range to every trip (it is also computed, for all of them,
+    as soon as one trip asks for the 'reliable' ranking).
+    Returns a list with the top_k Recommendation rows for each trip (same order as the input).
+    """
+    bundle = registry.get()
+    if bundle.model is None:
+        return {"error": "The AI model is not loaded correctly."}
+
+    start_lats = np.asarray(start_lats, dtype=np.float64)
+    start_lons = np.asarray(start_lons, dtype=np.float64)
+    end_lats = np.asarray(end_lats, dtype=np.float64)
+    end_lons = np.asarray(end_lons, dtype=np.float64)
+    hours = np.asarray(hours, dtype=np.int64)
+    n_trips = len(start_lats)
+    if isinstance(preferences, str):
+        preferences = [preferences] * n_trips
+
+    if not (len(start_lons) == len(end_lats) == len(end_lons) == len(hours) == len(preferences) == n_trips):
+        raise ValueError("All trip columns must have the same length.")
+    if n_trips == 0:
+        return []
+    timer = StageTimer('batch')
+
+    # --- STEP 1: DISTANCE MATH (ALL TRIPS) ---
+    dist = trip_distance(start_lats, start_lons, end_lats, end_lons)
+    timer.lap('distance')
+
+    # --- STEP 2: TRAFFIC & PRICE CHECK ---
+    if live_surges is None:
+        live_surges = surge.multipliers_at(start_lats, start_lons)
+    surge_multiplier = np.maximum(np.where(rush_hours(hours), RUSH_MULTIPLIER, 1.0), np.asarray(live_surges, dtype=np.float64))
+    is_surge = surge_multiplier > 1.0
+    n_surge = int(is_surge.sum())
+    QUOTES_BY_DEMAND.inc(("High",), n_surge)
+    QUOTES_BY_DEMAND.inc(("Normal",), n_trips - n_surge)
+    timer.lap('surge')
+
+    # --- STEP 3: ONE AI PREDICTION FOR TRIPS x VEHICLES ---
+    preferences = np.asarray(preferences)
+    reliable = preferences == 'reliable'
+    ranges = None
+    if quantiles or reliable.any():
+        etas, ranges = predict_trip_ranges(hours, dist, precise, bundle)
     else:
-        # Balanced score: 60% importance to time, 40% importance to money
-        df['score'] = (df['eta'] * 0.6) + (df['fare'] * 0.04)
-        df = df.sort_values(by='score')
+        etas = predict_trip_etas(hours, dist, precise, bundle)
+    timer.lap('predict')
+    if bundle.zone_tables is not None and not precise:
+        pairs = bundle.zone_tables.pairs(start_lats, start_lons, end_lats, end_lons)
+        residuals = bundle.zone_tables.eta_residual[pairs][:, None]
+        etas += residuals
+        if ranges is not None:
+            ranges += residuals[:, :, None]
+        timer.lap('zones')
+    etas = np.round(etas, 1)
+    if ranges is not None:
+        ranges = round_ranges(ranges, etas)
+
+    fares = np.round((BASE_FARES + (dist[:, None] * KM_RATES)) * surge_multiplier[:, None], 0)
+
+    # --- STEP 4: RANKING LOGIC (PER PREFERENCE GROUP) ---
+    fastest = (preferences == 'fastest') | (preferences == '3')
+    cheapest = (preferences == 'cheapest') | (preferences == '1')
+    balanced = ~(fastest | cheapest | reliable)
+
+    scores = (etas * 0.6) + (fares * 0.04)
+    sort_keys = np.where(fastest[:, None], etas, np.where(cheapest[:, None], fares, scores))
+    if reliable.any():
+        sort_keys = np.where(reliable[:, None], etas if ranges is None else ranges[:, :, -1], sort_keys)
+    order = np.argsort(sort_keys, axis=1, kind='stable')[:, :top_k]
+
+    distances = np.round(dist, 2).tolist()
+    etas, fares, scores = etas.tolist(), fares.tolist(), scores.tolist()
+    balanced, is_surge, order = balanced.tolist(), is_surge.tolist(), order.tolist()
+    surge_multiplier = surge_multiplier.tolist()
+    no_range = [(None, None, None)] * len(VEHICLE_TYPES)
+    ranges = ranges.tolist() if ranges is not None else [no_range] * n_trips
+
+    results = []
+    for t in range(n_trips):
+        demand_label = "High" if is_surge[t] else "Normal"
+        trip_etas, trip_fares, trip_scores = etas[t], fares[t], scores[t] if balanced[t] else None
+        trip_ranges = ranges[t]
+        results.append([
+            Recommendation(VEHICLE_TYPES[i], trip_etas[i], int(trip_fares[i]), distances[t], demand_label,
+                           surge_multiplier[t], trip_scores[i] if trip_scores is not None else None, *trip_ranges[i])
+            for i in order[t]
+        ])
+    timer.lap('ranking')
 
-    return df.head(3)
+    return results
 
 if __name__ == "__main__":
     print("\n" + "="*50)
@@ -121,7 +370,8 @@ if __name__ == "__main__":
         result = get_vehicle_recommendations(s_lat, s_lon, e_lat, e_lon, hr, selected_pref)
         
         # Printing a nice clean table
-        print(result[['vehicle', 'distance', 'fare', 'eta', 'demand']].to_string(index=False))
+        import pandas as pd
+        print(pd.DataFrame(result)[['vehicle', 'distance', 'fare', 'eta', 'demand']].to_string(index=False))
         print("-" * 50)
         
     except ValueError:
@@ -0,0 +1,254 @@
+import hashlib
+import os
+import shutil
+import numpy as np
+import pandas as pd
+
+# pyarrow is only needed for the Parquet dataset; without it everything falls back to the CSV
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = ds = pq = None
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(os.path.dirname(BACKEND_DIR), "data")
+CSV_FILE = "rides_dataset.csv"
+# A folder of Parquet files partitioned by hour: rides_dataset.parquet/hour_of_day=18/part-00000-0.parquet
+PARQUET_DIR = "rides_dataset.parquet"
+
+# Sorted, so the one-hot columns come out in the same order pd.get_dummies gives on strings
+VEHICLE_CATEGORIES = ['Auto', 'Bike', 'Mini', 'SUV', 'Sedan']
+
+# Compact column types: ~21 bytes per ride instead of ~86 as float64/int64/object.
+# float32 is lossless for training: sklearn trees cast X to float32 anyway.
+DTYPES = {
+    'start_lat': np.float32, 'start_lon': np.float32,
+    'end_lat': np.float32, 'end_lon': np.float32,
+    'start_zone': np.uint16, 'end_zone': np.uint16,
+    'hour_of_day': np.uint8,
+    'vehicle_type': pd.CategoricalDtype(VEHICLE_CATEGORIES),
+    'trip_distance': np.float32, 'duration_min': np.float32,
+    'fare': np.uint16,
+}
+
+# The columns a model script needs (column projection: nothing else is read from disk)
+TRAINING_COLUMNS = ['hour_of_day', 'trip_distance', 'vehicle_type', 'duration_min']
+
+
+def parquet_available():
+    return pa is not None
+
+
+def dataset_path(data_dir=DATA_DIR):
+    """The dataset to read: the Parquet folder when it exists (and pyarrow is installed), else the CSV, else None."""
+    parquet_path = os.path.join(data_dir, PARQUET_DIR)
+    if parquet_available() and os.path.isdir(parquet_path):
+        return parquet_path
+    csv_path = os.path.join(data_dir, CSV_FILE)
+    return csv_path if os.path.exists(csv_path) else None
+
+
+def dataset_hash(path):
+    """Short content hash of the CSV file or of every file in the Parquet folder (cache key for derived data)."""
+    digest = hashlib.sha1()
+    if os.path.isdir(path):
+        files = sorted(os.path.join(root, name) for root, _, names in os.walk(path) for name in names)
+    else:
+        files = [path]
+    for file in files:
+        digest.update(os.path.relpath(file, path).encode())
+        with open(file, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+def dataset_fingerprint(path, nbytes=1 << 20):
+    """
+    Hash of the start of the dataset (the first nbytes of the CSV, or of the first Parquet file in
+    iter_rides order), and how many bytes it covers. Hashing the same number of bytes again later
+    gives the same hash after rides are appended, and a different one if the dataset was regenerated.
+    """
+    first = path if not os.path.isdir(path) else min(
+        (os.path.join(root, name) for root, _, names in os.walk(path) for name in names if name.endswith('.parquet')),
+        key=lambda f: (os.path.basename(f), f), default=None)
+    digest = hashlib.sha1()
+    hashed = 0
+    if first is not None:
+        with open(first, 'rb') as f:
+            block = f.read(nbytes)
+        digest.update(block)
+        hashed = len(block)
+    return digest.hexdigest()[:12], hashed
+
+
+def dataset_columns(path=None):
+    """Column names of the dataset, without reading any rows."""
+    path = path or dataset_path()
+    if path is None:
+        raise FileNotFoundError(f"No rides dataset in {DATA_DIR}. Please run generate_data.py first.")
+    if os.path.isdir(path):
+        if not parquet_available():
+            raise ImportError("pyarrow is required to read the Parquet dataset (pip install pyarrow)")
+        return ds.dataset(path, format='parquet', partitioning=_hour_partitioning()).schema.names
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+def compact_dtypes(df):
+    """Casts the known ride columns of a DataFrame to DTYPES (other columns are left alone)."""
+    df = df.astype({col: dtype for col, dtype in DTYPES.items() if col in df.columns and col != 'vehicle_type'})
+    if 'vehicle_type' in df.columns:
+        # Not astype: unordered categoricals with the same values in another order count as
+        # equal there and keep their old codes. set_categories recodes by value.
+        vehicle_type = df['vehicle_type'].astype('category').cat.set_categories(VEHICLE_CATEGORIES)
+        df = df.assign(vehicle_type=vehicle_type)
+    return df
+
+
+def _hour_partitioning():
+    return ds.partitioning(pa.schema([('hour_of_day', pa.uint8())]), flavor='hive')
+
+
+def write_parquet(chunks, path):
+    """
+    Writes DataFrame chunks (e.g. from generate_data.iter_synthetic_chunks) as an hour-partitioned
+    Parquet folder, one chunk at a time. Returns the number of rows written.
+
+    The folder is built next to `path` and renamed over it at the end, so a reader never sees half a dataset.
+    """
+    if not parquet_available():
+        raise ImportError("pyarrow is required for the Parquet dataset (pip install pyarrow)")
+
+    tmp_path = path.rstrip(os.sep) + ".tmp"
+    if os.path.exists(tmp_path):
+        shutil.rmtree(tmp_path)
+
+    written = 0
+    for i, chunk in enumerate(chunks):
+        table = pa.Table.from_pandas(compact_dtypes(chunk), preserve_index=False)
+        pq.write_to_dataset(table, tmp_path, partitioning=_hour_partitioning(),
+                            basename_template=f"part-{i:05d}-{{i}}.parquet")
+        written += len(chunk)
+
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    os.replace(tmp_path, path)
+    return written
+
+
+def csv_to_parquet(csv_path, parquet_path, chunk_size=1_000_000):
+    """One-shot converter: streams the CSV in chunks so memory stays flat for any file size."""
+    chunks = pd.read_csv(csv_path, dtype=DTYPES, chunksize=chunk_size)
+    return write_parquet(chunks, parquet_path)
+
+
+def load_rides(columns=None, hours=None, path=None):
+    """
+    Reads the rides dataset with compact dtypes.
+
+    columns: only these columns are read from disk (None = all).
+    hours: only these hours of day (whole partitions are skipped on Parquet).
+
+    Row order is deterministic for a given file (Parquet: hour partition, then write order),
+    so a seeded train_test_split picks the same holdout in every script.
+    """
+    path = path or dataset_path()
+    if path is None:
+        raise FileNotFoundError(f"No rides dataset in {DATA_DIR}. Please run generate_data.py first.")
+
+    if os.path.isdir(path):
+        if not parquet_available():
+            raise ImportError("pyarrow is required to read the Parquet dataset (pip install pyarrow)")
+        dataset = ds.dataset(path, format='parquet', partitioning=_hour_partitioning())
+        row_filter = ds.field('hour_of_day').isin(list(hours)) if hours is not None else None
+        # self_destruct frees each Arrow column as soon as pandas has it, so the data is not held twice
+        df = dataset.to_table(columns=columns, filter=row_filter).to_pandas(split_blocks=True, self_destruct=True)
+        if columns is None:
+            # The partition column comes back last, put it back where the CSV has it
+            df = df[[col for col in DTYPES if col in df.columns]]
+    else:
+        usecols = columns
+        if hours is not None and columns is not None and 'hour_of_day' not in columns:
+            usecols = list(columns) + ['hour_of_day']
+        df = pd.read_csv(path, usecols=usecols, dtype={k: v for k, v in DTYPES.items() if usecols is None or k in usecols})
+        if hours is not None:
+            df = df[df['hour_of_day'].isin(list(hours))].reset_index(drop=True)
+        if columns is not None:
+            df = df[list(columns)]
+
+    return compact_dtypes(df)
+
+
+def iter_rides(columns=None, chunk_rows=1_000_000, path=None, skip_rows=0):
+    """
+    Yields the dataset as DataFrames of about chunk_rows rows (compact dtypes), for training
+    on data that does not fit in memory. The first skip_rows rows are left out (they are still
+    scanned, not kept) and chunks start after them, so a resumed run starts at the first row it
+    has not seen and reads it in whole chunks.
+
+    Parquet files are read in write order (part-00000 of every hour, then part-00001, ...)
+    rather than hour by hour, so every chunk holds a mix of hours like the CSV does.
+    """
+    path = path or dataset_path()
+    if path is None:
+        raise FileNotFoundError(f"No rides dataset in {DATA_DIR}. Please run generate_data.py first.")
+
+    if not os.path.isdir(path):
+        # Row 0 is the header
+        for chunk in pd.read_csv(path, usecols=columns, chunksize=chunk_rows, skiprows=range(1, skip_rows + 1),
+                                 dtype={k: v for k, v in DTYPES.items() if columns is None or k in columns}):
+            # Skipping every row still gives one empty chunk
+            if len(chunk):
+                yield compact_dtypes(chunk)
+        return
+
+    if not parquet_available():
+        raise ImportError("pyarrow is required to read the Parquet dataset (pip install pyarrow)")
+    files = sorted((os.path.join(root, name) for root, _, names in os.walk(path) for name in names if name.endswith('.parquet')),
+                   key=lambda f: (os.path.basename(f), f))
+    dataset = ds.dataset(files, format='parquet', partitioning=_hour_partitioning(), partition_base_dir=path)
+
+    pending, pending_rows = [], 0
+    for batch in dataset.to_batches(columns=columns, batch_size=chunk_rows):
+        if skip_rows >= batch.num_rows:
+            skip_rows -= batch.num_rows
+            continue
+        if skip_rows:
+            batch, skip_rows = batch.slice(skip_rows), 0
+        pending.append(batch)
+        pending_rows += batch.num_rows
+        if pending_rows >= chunk_rows:
+            yield compact_dtypes(pa.Table.from_batches(pending).to_pandas())
+            pending, pending_rows = [], 0
+    if pending_rows:
+        yield compact_dtypes(pa.Table.from_batches(pending).to_pandas())
+
+
+def feature_frame(df):
+    """
+    Model inputs (hour, distance, one-hot vehicle) straight from the categorical codes.
+    Same columns and order as pd.get_dummies(df[['hour_of_day', 'trip_distance', 'vehicle_type']]).
+    """
+    codes = pd.Categorical(df['vehicle_type'], categories=VEHICLE_CATEGORIES).codes
+    features = {'hour_of_day': df['hour_of_day'].to_numpy(), 'trip_distance': df['trip_distance'].to_numpy()}
+    for i, vehicle in enumerate(VEHICLE_CATEGORIES):
+        features[f'vehicle_type_{vehicle}'] = codes == i
+    return pd.DataFrame(features, index=df.index)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Convert data/rides_dataset.csv to the hour-partitioned Parquet dataset.")
+    parser.add_argument("--csv", default=os.path.join(DATA_DIR, CSV_FILE), help="CSV file to convert")
+    parser.add_argument("--out", default=os.path.join(DATA_DIR, PARQUET_DIR), help="Parquet folder to write")
+    parser.add_argument("--chunk-size", type=int, default=1_000_000, help="CSV rows read per block")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.csv):
+        print(f"❌ Error: {args.csv} not found. Please run generate_data.py first.")
+    else:
+        rows = csv_to_parquet(args.csv, args.out, args.chunk_size)
+        print(f"💾 Converted {rows} rows to: {os.path.abspath(args.out)}")
@@ -0,0 +1,182 @@
+import mmap
+import os
+import threading
+import time
+import numpy as np
+
+from geodesy import SERVICE_GRID
+from metrics import metrics, stats_collector
+
+# --- SCHEDULED SURGE ---
+# Udupi rush hours (inclusive). generate_data.py simulates rush traffic for the same hours.
+RUSH_HOURS = ((9, 11), (17, 21))
+RUSH_MULTIPLIER = 1.45
+
+# --- LIVE SURGE (can be overridden with environment variables) ---
+SURGE_LIVE = os.environ.get("SURGE_LIVE", "1") == "1"
+WINDOW_SECONDS = float(os.environ.get("SURGE_WINDOW_SECONDS", 120))   # demand is measured over this window
+BUCKET_SECONDS = float(os.environ.get("SURGE_BUCKET_SECONDS", 5))     # ...in ring-buffer slots this long
+# Quote requests per minute from one pickup zone that count as normal demand
+BASELINE_PER_MIN = float(os.environ.get("SURGE_BASELINE_PER_MIN", 20))
+# Surge rises by this much for every 1x of demand above the baseline
+SENSITIVITY = float(os.environ.get("SURGE_SENSITIVITY", 0.25))
+MAX_SURGE = float(os.environ.get("SURGE_MAX", 2.0))
+# Multipliers move in steps, so prices (and quote cache keys) don't change on every request
+SURGE_STEP = 0.05
+
+
+def _shared_copy(array):
+    """A copy of `array` in anonymous shared memory: processes forked afterwards all see the same data."""
+    buffer = mmap.mmap(-1, max(1, array.nbytes))
+    shared = np.frombuffer(buffer, dtype=array.dtype, count=array.size).reshape(array.shape)
+    shared[...] = array
+    return shared
+
+
+def rush_hour(hour):
+    """Scheduled rush hour check for one hour of day (plain Python, for the single-quote path)."""
+    return any(lo <= hour <= hi for lo, hi in RUSH_HOURS)
+
+
+def rush_hours(hours):
+    """Vectorized rush_hour for an array of hours of day."""
+    hours = np.asarray(hours)
+    mask = np.zeros(hours.shape, dtype=bool)
+    for lo, hi in RUSH_HOURS:
+        mask |= (hours >= lo) & (hours <= hi)
+    return mask
+
+
+class SurgeEngine:
+    """
+    Live demand per pickup zone, counted in sliding time windows.
+
+    counts[slot, zone] is a ring buffer per zone: one slot per BUCKET_SECONDS, and the oldest
+    slot is reused (zeroed) when a new bucket starts. slot_bucket remembers which bucket each
+    slot holds, so slots older than the window are simply left out of the sum.
+
+    Nothing on the request path takes a lock:
+      record()     one in-place add into the current slot. Two threads racing on the same cell
+                   can lose a count, which a demand estimate tolerates.
+      multiplier() one read from the published multipliers array.
+    When a bucket ends, the multipliers are recomputed into a new array and published with one
+    reference swap, so readers see either the old or the new table, never a mix. The refresh
+    only runs in whichever thread gets its non-blocking lock first; the others carry on.
+    """
+
+    def __init__(self, grid=SERVICE_GRID, window_seconds=WINDOW_SECONDS, bucket_seconds=BUCKET_SECONDS,
+                 baseline_per_min=BASELINE_PER_MIN, sensitivity=SENSITIVITY, max_surge=MAX_SURGE,
+                 step=SURGE_STEP, enabled=SURGE_LIVE, clock=time.monotonic):
+        self.grid = grid
+        self.bucket_seconds = bucket_seconds
+        self.n_slots = max(1, int(round(window_seconds / bucket_seconds)))
+        self.window_minutes = self.n_slots * bucket_seconds / 60
+        self.baseline_per_min = baseline_per_min
+        self.sensitivity = sensitivity
+        self.max_surge = max_surge
+        self.step = step
+        self.enabled = enabled
+        self.clock = clock
+
+        self.counts = np.zeros((self.n_slots, grid.n_zones), dtype=np.int64)
+        self.slot_bucket = np.full(self.n_slots, -1, dtype=np.int64)
+        self.multipliers = np.ones(grid.n_zones)
+        self._refreshed_bucket = -1
+        self._refresh_lock = threading.Lock()
+        self.refreshes = 0
+
+    def _bucket(self, now=None):
+        return int((self.clock() if now is None else now) // self.bucket_seconds)
+
+    def _slot(self, bucket):
+        slot = bucket % self.n_slots
+        if self.slot_bucket[slot] != bucket:
+            # First request of a new bucket: reuse the oldest slot and publish new multipliers
+            self.counts[slot] = 0
+            self.slot_bucket[slot] = bucket
+            self.refresh(bucket)
+        return slot
+
+    def record(self, lat, lon, now=None):
+        """Counts one quote request picked up at (lat, lon)."""
+        if not self.enabled:
+            return
+        self.counts[self._slot(self._bucket(now)), self.grid.zone_scalar(lat, lon)] += 1
+
+    def record_many(self, lats, lons, now=None):
+        """Counts many requests that arrived in the same bucket (replays, tests)."""
+        if not self.enabled:
+            return
+        zones = self.grid.zone_of(lats, lons)
+        self.counts[self._slot(self._bucket(now))] += np.bincount(zones, minlength=self.grid.n_zones)
+
+    def demand_per_min(self, bucket=None):
+        """Requests per minute from every zone over the current window."""
+        bucket = self._bucket() if bucket is None else bucket
+        live = (self.slot_bucket > bucket - self.n_slots) & (self.slot_bucket <= bucket)
+        return self.counts[live].sum(axis=0) / self.window_minutes
+
+    def refresh(self, bucket=None):
+        """Recomputes every zone's multiplier from the window and publishes them (skipped if another thread is on it)."""
+        if not self._refresh_lock.acquire(blocking=False):
+            return
+        try:
+            bucket = self._bucket() if bucket is None else bucket
+            ratio = self.demand_per_min(bucket) / self.baseline_per_min
+            surge = np.clip(1.0 + self.sensitivity * (ratio - 1.0), 1.0, self.max_surge)
+            # Round down to the step (the small epsilon keeps e.g. 1.15 from becoming 1.1)
+            self.multipliers = np.floor(surge / self.step + 1e-9) * self.step
+            self._refreshed_bucket = bucket
+            self.refreshes += 1
+        finally:
+            self._refresh_lock.release()
+
+    def _current(self, now=None):
+        # Demand falls off even when no requests come in to roll the window forward
+        bucket = self._bucket(now)
+        if bucket != self._refreshed_bucket:
+            self.refresh(bucket)
+        return self.multipliers
+
+    def multiplier(self, lat, lon, now=None):
+        """Live surge multiplier for a pickup at (lat, lon)."""
+        if not self.enabled:
+            return 1.0
+        return float(self._current(now)[self.grid.zone_scalar(lat, lon)])
+
+    def multipliers_at(self, lats, lons, now=None):
+        """Vectorized multiplier for many pickups."""
+        if not self.enabled:
+            return np.ones(len(lats))
+        return self._current(now)[self.grid.zone_of(lats, lons)]
+
+    def share(self):
+        """
+        Moves the demand counters into shared memory (prefork_server.py does this before forking),
+        so every worker process counts into, and surges from, the same window. Each process still
+        publishes its own multipliers; they agree because they read the same counts.
+        """
+        self.counts = _shared_copy(self.counts)
+        self.slot_bucket = _shared_copy(self.slot_bucket)
+        return self
+
+    def reset(self):
+        self.counts[:] = 0
+        self.slot_bucket[:] = -1
+        self.multipliers = np.ones(self.grid.n_zones)
+        self._refreshed_bucket = -1
+
+    def stats(self):
+        multipliers = self.multipliers
+        return {
+            'enabled': self.enabled,
+            'window_seconds': self.n_slots * self.bucket_seconds,
+            'requests_in_window': int(self.demand_per_min().sum() * self.window_minutes),
+            'zones_surging': int(np.count_nonzero(multipliers > 1.0)),
+            'max_multiplier': float(multipliers.max()),
+            'refreshes': self.refreshes,
+        }
+
+
+surge = SurgeEngine()
+metrics.collectors.append(stats_collector("udupi_surge", surge.stats))
@@ -0,0 +1,43 @@
+import sys
+import os
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+
+# This tells Python to look one folder up (the backend folder) for the logic
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from eta_surface import EtaSurface, grid_features, DEFAULT_VEHICLES
+
+COLUMNS = [
+    'hour_of_day', 'trip_distance',
+    'vehicle_type_Auto', 'vehicle_type_Bike', 'vehicle_type_Mini',
+    'vehicle_type_SUV', 'vehicle_type_Sedan'
+]
+
+
+def make_model():
+    rng = np.random.default_rng(3)
+    hours = rng.integers(6, 24, 300)
+    dists = rng.uniform(0.5, 9.0, 300)
+    X = grid_features(COLUMNS, DEFAULT_VEHICLES, hours, dists)
+    y = X[:, 1] * 2 + X[:, 2] * 3 + rng.normal(0, 0.5, len(X))
+    return RandomForestRegressor(n_estimators=10, max_depth=5, random_state=0, n_jobs=1).fit(X, y)
+
+
+def test_surface_is_exact_on_grid_points():
+    model = make_model()
+    surface = EtaSurface.build(model, COLUMNS, dist_max=3.0, dist_step=0.5)
+
+    hours = np.array([6, 12, 23])
+    dists = np.array([0.5, 1.5, 3.0])
+    exact = model.predict(grid_features(COLUMNS, DEFAULT_VEHICLES, hours, dists)).reshape(3, 5)
+    assert np.allclose(surface.lookup(hours, dists), exact)
+
+
+def test_surface_covers_only_its_grid(tmp_path):
+    surface = EtaSurface.build(make_model(), COLUMNS, dist_max=3.0, dist_step=0.5)
+    surface = EtaSurface.load(surface.save(str(tmp_path / "surface.npz")))
+    assert surface.covers(6, 0.5) and surface.covers(23, 3.0)
+    assert not surface.covers(5, 1.0)
+    assert not surface.covers(12, 3.2)
+    assert surface.vehicles == DEFAULT_VEHICLES
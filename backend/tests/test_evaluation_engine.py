@@ -0,0 +1,69 @@
+import sys
+import os
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+
+# This tells Python to look one folder up (the backend folder) for the logic
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from generate_data import write_synthetic_data
+from ride_dataset import load_rides, feature_frame, TRAINING_COLUMNS
+from evaluation_engine import predict_unique, group_errors, evaluate
+
+
+class CountingModel:
+    """Wraps a model and counts how many rows it was asked to predict."""
+
+    def __init__(self, model):
+        self.model = model
+        self.rows = 0
+
+    def predict(self, X):
+        self.rows += len(X)
+        return self.model.predict(X)
+
+
+def fitted_model(data_path):
+    df = load_rides(TRAINING_COLUMNS, path=data_path)
+    X = feature_frame(df).to_numpy(dtype=np.float64)
+    return RandomForestRegressor(n_estimators=5, max_depth=6, random_state=0, n_jobs=1).fit(X, df['duration_min'])
+
+
+def test_predict_unique_matches_full_predict():
+    rng = np.random.default_rng(0)
+    X = np.zeros((3000, 3), dtype=np.float32)
+    X[:, 0] = rng.integers(6, 9, 3000)
+    X[:, 1] = np.round(rng.uniform(0.5, 2, 3000), 1)
+    y = X[:, 0] + X[:, 1]
+    model = CountingModel(RandomForestRegressor(n_estimators=3, random_state=0).fit(X, y))
+    expected = model.model.predict(X)
+
+    assert np.array_equal(predict_unique(model, X), expected)
+    assert model.rows < 100          # 3 hours x 16 distances
+
+
+def test_group_errors_match_groupby():
+    rng = np.random.default_rng(1)
+    residuals = rng.normal(0, 2, 500)
+    groups = rng.integers(0, 4, 500)
+    rows = group_errors(residuals, groups, ['a', 'b', 'c', 'd'])
+    expected = pd.Series(residuals).abs().groupby(groups).mean()
+    np.testing.assert_allclose([r['mae'] for r in rows], expected.values)
+    assert sum(r['rides'] for r in rows) == 500
+
+
+def test_predictions_are_cached_per_model_version(tmp_path):
+    data_path = str(tmp_path / "rides.csv")
+    write_synthetic_data(data_path, 2000, seed=4)
+    model = CountingModel(fitted_model(data_path))
+
+    first, _, _ = evaluate(model, "v1", data_path, str(tmp_path / "cache"))
+    asked = model.rows
+    second, _, _ = evaluate(model, "v1", data_path, str(tmp_path / "cache"))
+    assert model.rows == asked and second['predictions_cached']
+    assert second['mae'] == first['mae'] and first['test_rows'] == 400
+    assert {'hour', 'vehicle', 'distance_band'} == set(first['breakdowns'])
+
+    evaluate(model, "v2", data_path, str(tmp_path / "cache"))
+    assert model.rows > asked
@@ -0,0 +1,86 @@
+import sys
+import os
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+
+# This tells Python to look one folder up (the backend folder) for the logic
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from forest_engine import CompiledForest, export_forest, same_forest, tree_predictions, tree_mean, tree_quantiles
+
+
+def make_forest():
+    rng = np.random.default_rng(7)
+    X = np.zeros((400, 7))
+    X[:, 0] = rng.integers(6, 24, 400)
+    X[:, 1] = rng.uniform(0.5, 9.0, 400)
+    X[np.arange(400), 2 + rng.integers(0, 5, 400)] = 1
+    y = X[:, 1] * 2.5 + (X[:, 0] > 16) * 3 + rng.normal(0, 1, 400)
+    model = RandomForestRegressor(n_estimators=20, max_depth=6, random_state=0, n_jobs=1).fit(X, y)
+    return model, X
+
+
+def test_compiled_forest_matches_sklearn():
+    model, X = make_forest()
+    compiled = CompiledForest.from_model(model)
+    assert np.array_equal(compiled.predict(X), model.predict(X))
+
+
+def test_large_inputs_go_to_sklearn():
+    model, X = make_forest()
+    compiled = CompiledForest.from_model(model).use_for_large_batches(model, min_rows=100)
+    assert same_forest(compiled, model)
+    traversals = []
+    compiled.large_batch_model = type('Spy', (), {'predict': lambda self, X: traversals.append(len(X)) or model.predict(X),
+                                                  'estimators_': model.estimators_})()
+    assert np.array_equal(compiled.predict(X), model.predict(X)) and traversals == [400]
+    assert np.array_equal(compiled.predict(X[:99]), model.predict(X[:99])) and traversals == [400]
+    assert np.array_equal(compiled.leaf_values(X), tree_predictions(model, X))
+    # A pruned copy is not the same forest, so the server never routes its batches to the full model
+    pruned = CompiledForest.from_model(model)
+    pruned.threshold = pruned.threshold.astype(np.float16).astype(np.float64)
+    assert not same_forest(pruned, model)
+
+
+def test_large_batch_model_is_loaded_on_the_first_large_input():
+    model, X = make_forest()
+    loads = []
+    compiled = CompiledForest.from_model(model).use_for_large_batches(
+        min_rows=100, loader=lambda: loads.append(1) or model)
+    compiled.predict(X[:5])
+    assert loads == [] and compiled.large_batch_model is None
+    assert np.array_equal(compiled.predict(X), model.predict(X))
+    compiled.predict(X)
+    assert loads == [1] and compiled.large_batch_model is model
+
+
+def test_compiled_forest_roundtrip(tmp_path):
+    model, X = make_forest()
+    path = export_forest(model, str(tmp_path / "forest.npz"), columns=[f"c{i}" for i in range(7)])
+    compiled = CompiledForest.load(path)
+    assert compiled.columns == [f"c{i}" for i in range(7)]
+    assert np.array_equal(compiled.predict(X[:5]), model.predict(X[:5]))
+
+
+def test_compiled_forest_memory_mapped_folder(tmp_path):
+    model, X = make_forest()
+    path = export_forest(model, str(tmp_path / "forest"))
+    compiled = CompiledForest.load(path, mmap=True)
+    assert isinstance(compiled.threshold, np.memmap)
+    assert np.array_equal(compiled.predict(X), model.predict(X))
+
+
+def test_tree_predictions_and_quantiles():
+    model, X = make_forest()
+    compiled = CompiledForest.from_model(model)
+    leaves = tree_predictions(compiled, X)
+    per_tree = np.stack([tree.predict(X) for tree in model.estimators_], axis=1)
+    np.testing.assert_allclose(leaves, per_tree)
+    np.testing.assert_allclose(tree_predictions(model, X), per_tree)
+    assert np.array_equal(tree_mean(leaves), model.predict(X))
+
+    quantiles = tree_quantiles(leaves, (0.1, 0.5, 0.9))
+    np.testing.assert_allclose(quantiles, np.quantile(per_tree, [0.1, 0.5, 0.9], axis=1).T)
+    assert (quantiles[:, 0] <= quantiles[:, 2]).all()
+    # Models without trees have no spread to report
+    assert tree_predictions(object(), X) is None
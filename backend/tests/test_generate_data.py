@@ -0,0 +1,33 @@
+import sys
+import os
+
+# This tells Python to look one folder up (the backend folder) for the logic
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pandas as pd
+from generate_data import iter_synthetic_chunks, write_synthetic_data, VEHICLE_TYPES
+
+
+def test_chunks_have_requested_sizes():
+    sizes = [len(chunk) for chunk in iter_synthetic_chunks(2500, chunk_size=1000, seed=1)]
+    assert sizes == [1000, 1000, 500]
+
+
+def test_same_seed_same_rows_any_worker_count():
+    serial = pd.concat(iter_synthetic_chunks(3000, chunk_size=1000, seed=7), ignore_index=True)
+    parallel = pd.concat(iter_synthetic_chunks(3000, chunk_size=1000, seed=7, workers=2), ignore_index=True)
+    pd.testing.assert_frame_equal(serial, parallel)
+
+    other = pd.concat(iter_synthetic_chunks(3000, chunk_size=1000, seed=8), ignore_index=True)
+    assert not serial.equals(other)
+
+
+def test_written_csv_matches_chunks(tmp_path):
+    path = str(tmp_path / "rides.csv")
+    assert write_synthetic_data(path, 1500, chunk_size=400, seed=3) == 1500
+
+    df = pd.read_csv(path)
+    assert len(df) == 1500
+    assert set(df['vehicle_type']) <= set(VEHICLE_TYPES)
+    assert df['hour_of_day'].between(6, 23).all()
+    assert (df['duration_min'] >= 2.5).all()
@@ -0,0 +1,105 @@
+import sys
+import os
+
+# This tells Python to look one folder up (the backend folder) for the logic
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import geodesy
+from geodesy import haversine_km, degree_km, trip_distance, road_matrix, RoadMatrix, ZoneGrid, LAT_MIN, LAT_MAX, LON_MIN, LON_MAX
+from ride_dataset import DATA_DIR, CSV_FILE
+
+
+def random_trips(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return (rng.uniform(LAT_MIN, LAT_MAX, n), rng.uniform(LON_MIN, LON_MAX, n),
+            rng.uniform(LAT_MIN, LAT_MAX, n), rng.uniform(LON_MIN, LON_MAX, n))
+
+
+def test_haversine_scales_longitude():
+    # One degree of latitude is ~111.2 km everywhere, one degree of longitude at 13.3°N only ~108.2 km
+    assert haversine_km(13.3, 74.7, 14.3, 74.7) == pytest.approx(111.2, abs=0.1)
+    assert haversine_km(13.3, 74.7, 13.3, 75.7) == pytest.approx(108.2, abs=0.1)
+    assert degree_km(13.3, 74.7, 13.3, 75.7) == pytest.approx(111.0)
+
+
+def test_scalar_and_batch_paths_agree():
+    trips = random_trips(200)
+    for mode in ('haversine', 'euclidean'):
+        batch = trip_distance(*trips, mode=mode)
+        single = [trip_distance(*(float(c[i]) for c in trips), mode=mode) for i in range(200)]
+        np.testing.assert_allclose(batch, single, rtol=1e-12)
+        assert isinstance(single[0], float)
+
+
+def test_short_trips_get_the_minimum():
+    assert trip_distance(13.34, 74.75, 13.34, 74.75) == 0.5
+    np.testing.assert_array_equal(trip_distance(np.array([13.34, 13.34]), np.array([74.75, 74.75]),
+                                                np.array([13.34, 13.36]), np.array([74.75, 74.75]), mode='haversine'),
+                                  [0.5, haversine_km(13.34, 74.75, 13.36, 74.75)])
+
+
+def test_default_mode_matches_the_committed_dataset():
+    csv_path = os.path.join(DATA_DIR, CSV_FILE)
+    if not os.path.exists(csv_path):
+        pytest.skip("no rides dataset")
+    rides = pd.read_csv(csv_path, nrows=2000)
+    # The server must compute distances the way the training rows were generated
+    distance = np.round(trip_distance(rides['start_lat'].to_numpy(), rides['start_lon'].to_numpy(),
+                                      rides['end_lat'].to_numpy(), rides['end_lon'].to_numpy()), 2)
+    np.testing.assert_array_equal(distance, rides['trip_distance'])
+
+
+def test_missing_road_matrix_fails_clearly(tmp_path, monkeypatch):
+    monkeypatch.setattr(geodesy, '_road_matrix', None)
+    with pytest.raises(FileNotFoundError, match="geodesy.py"):
+        road_matrix(str(tmp_path / "road_matrix"))
+    assert not os.path.exists(tmp_path / "road_matrix")
+
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        trip_distance(13.34, 74.75, 13.35, 74.76, mode='manhattan')
+
+
+def test_road_matrix(tmp_path):
+    matrix = RoadMatrix.build()
+    n_zones = matrix.grid.n_zones
+    assert matrix.distance_km.shape == (n_zones, n_zones)
+    np.testing.assert_allclose(matrix.distance_km, matrix.distance_km.T, rtol=1e-6)
+    assert matrix.circuity.min() >= 1.0
+
+    trips = random_trips(500, seed=1)
+    road = matrix.road_km(*trips)
+    assert np.all(road >= haversine_km(*trips) - 1e-9)
+    # Same zone: no detour
+    assert matrix.road_km(13.3401, 74.7501, 13.3402, 74.7502) == pytest.approx(haversine_km(13.3401, 74.7501, 13.3402, 74.7502))
+
+    loaded = RoadMatrix.load(matrix.save(str(tmp_path / "road_matrix")))
+    assert isinstance(loaded.circuity, np.memmap)
+    np.testing.assert_allclose(loaded.road_km(*trips), road)
+
+
+def test_road_edges_shorten_paths():
+    # A straight road across the box beats the street grid
+    road = [(13.3213, 74.7213, 13.3688, 74.7988)]
+    grid_only = RoadMatrix.build()
+    with_road = RoadMatrix.build(road)
+    assert with_road.road_km(13.3213, 74.7213, 13.3688, 74.7988) < grid_only.road_km(13.3213, 74.7213, 13.3688, 74.7988)
+
+
+def test_zone_grid():
+    grid = ZoneGrid(0.005)
+    assert (grid.n_lat, grid.n_lon) == (10, 16)
+    trips = random_trips(1000, seed=2)
+    zones = grid.zone_of(trips[0], trips[1])
+    assert zones.min() >= 0 and zones.max() < grid.n_zones
+    assert [grid.zone_scalar(a, b) for a, b in zip(trips[0], trips[1])] == zones.tolist()
+    # Every zone centre lies in its own zone, and the grid survives a save/load
+    assert np.array_equal(grid.zone_of(*grid.centres()), np.arange(grid.n_zones))
+    assert ZoneGrid.from_array(grid.to_array()) == grid
+    # Outside the box: nearest edge zone
+    assert grid.zone_scalar(10.0, 70.0) == 0 and grid.zone_scalar(20.0, 80.0) == grid.n_zones - 1
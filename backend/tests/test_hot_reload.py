@@ -0,0 +1,161 @@
+import sys
+import os
+import signal
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+
+# This tells Python to look one folder up (the backend folder) for the logic
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import hot_reload
+from forest_engine import export_forest, FOREST_FILE
+from model_registry import ModelRegistry
+
+
+def publish_forest(model_dir, seed):
+    rng = np.random.default_rng(seed)
+    X = rng.uniform(0, 10, (200, 7))
+    y = X[:, 1] * 2 + rng.normal(0, 0.1, 200)
+    model = RandomForestRegressor(n_estimators=5, max_depth=4, random_state=seed, n_jobs=1).fit(X, y)
+    export_forest(model, os.path.join(model_dir, FOREST_FILE))
+    return X, y
+
+
+def test_swap_keeps_old_bundle_for_inflight_requests_and_rollback(tmp_path):
+    registry = ModelRegistry(model_dir=str(tmp_path), mmap=True)
+    publish_forest(str(tmp_path), seed=1)
+    first = registry.get()
+
+    publish_forest(str(tmp_path), seed=2)
+    second = registry.read_bundle()
+    in_flight = registry.get()        # a request that started before the swap
+    registry.swap(second)
+
+    assert registry.get() is second
+    assert in_flight is first and in_flight.version != second.version
+    # The old (memory-mapped) model still answers after its files were replaced
+    assert np.all(np.isfinite(in_flight.model.predict(np.ones((3, 7)))))
+
+    assert registry.rollback() is first
+    assert registry.get() is first
+    assert registry.rollback() is None
+
+
+def test_validation_rejects_a_worse_model(tmp_path, monkeypatch):
+    registry = ModelRegistry(model_dir=str(tmp_path))
+    X, y = publish_forest(str(tmp_path), seed=1)
+    good = registry.get()
+
+    monkeypatch.setattr(hot_reload, 'load_holdout', lambda columns: (X, y))
+    ok, report = hot_reload.validate_bundle(good, columns=None)
+    assert ok and report['mae'] < 1
+
+    # Same model but a holdout it can't predict: the MAE limit kicks in
+    monkeypatch.setattr(hot_reload, 'load_holdout', lambda columns: (X, y + 100))
+    ok, report = hot_reload.validate_bundle(good, columns=None, baseline=good)
+    assert not ok and 'above' in report['reason']
+
+
+def test_holdout_is_rebuilt_when_the_dataset_changes(tmp_path, monkeypatch):
+    from ride_dataset import CSV_FILE
+
+    def write_rides(duration):
+        pd.DataFrame({'hour_of_day': np.arange(50) % 24, 'trip_distance': np.arange(1, 51) * 0.25,
+                      'vehicle_type': ['Auto', 'Bike'] * 25, 'duration_min': duration}).to_csv(tmp_path / CSV_FILE, index=False)
+
+    monkeypatch.setattr(hot_reload, 'DATA_DIR', str(tmp_path))
+    monkeypatch.setattr(hot_reload, '_holdout', None)
+    columns = ['hour_of_day', 'trip_distance', 'vehicle_type_Auto', 'vehicle_type_Bike']
+    write_rides(10.0)
+    first = hot_reload.load_holdout(columns)
+    assert len(first[1]) == 10 and set(first[1]) == {10.0}
+    assert hot_reload.load_holdout(columns) is first
+    # The stored distances are used as they are (no DISTANCE_MODE recomputation)
+    assert set(first[0][:, 1]) <= set(np.arange(1, 51) * 0.25)
+
+    write_rides(20.0)
+    os.utime(tmp_path / CSV_FILE, ns=(0, 0))
+    assert set(hot_reload.load_holdout(columns)[1]) == {20.0}
+
+
+def test_prefork_worker_forwards_admin_routes_to_the_launcher(monkeypatch):
+    from fastapi.testclient import TestClient
+    import main
+
+    sent = []
+    monkeypatch.setattr(hot_reload.os, 'kill', lambda pid, sig: sent.append((pid, sig)))
+    monkeypatch.setattr(hot_reload, 'hot_reload', lambda validate=True: pytest.fail("a worker reloaded on its own"))
+    monkeypatch.setattr(hot_reload, 'rollback', lambda: pytest.fail("a worker rolled back on its own"))
+    monkeypatch.setenv(hot_reload.PREFORK_LAUNCHER_ENV, str(os.getpid() + 1))
+    monkeypatch.setattr(hot_reload, 'MODEL_ADMIN_TOKEN', "s3cret")
+
+    client = TestClient(main.app, headers={'X-Admin-Token': "s3cret"})
+    assert client.post("/admin/reload").json()['launcher_pid'] == os.getpid() + 1
+    assert client.post("/admin/rollback").json()['rolled_back'] is None
+    assert client.post("/admin/reload", params={'validate': False}).json()['swapped'] is False
+    assert sent == [(os.getpid() + 1, signal.SIGHUP), (os.getpid() + 1, signal.SIGUSR1)]
+
+    # The launcher itself (same pid) is not a worker
+    monkeypatch.setenv(hot_reload.PREFORK_LAUNCHER_ENV, str(os.getpid()))
+    assert hot_reload.prefork_launcher() is None
+
+
+def test_registry_picks_artifacts_by_content_not_file_times(tmp_path):
+    import joblib
+    from model_registry import MODEL_FILE
+
+    rng = np.random.default_rng(3)
+    X = rng.uniform(0, 10, (200, 7))
+    model = RandomForestRegressor(n_estimators=5, max_depth=4, random_state=3, n_jobs=1).fit(X, X[:, 1])
+    joblib.dump(model, tmp_path / MODEL_FILE)
+    export_forest(model, str(tmp_path / FOREST_FILE))
+    hot_reload.write_manifest(str(tmp_path), [MODEL_FILE, FOREST_FILE], FOREST_FILE)
+
+    # The pickle looks newer than the forest (e.g. the order a fresh clone wrote them in)
+    os.utime(tmp_path / FOREST_FILE / "value.npy", (0, 0))
+    bundle = ModelRegistry(model_dir=str(tmp_path)).get()
+    assert bundle.source.endswith(FOREST_FILE) and type(bundle.model).__name__ == 'CompiledForest'
+
+    # A forest that is not the one published is never served
+    np.save(tmp_path / FOREST_FILE / "value.npy", np.zeros_like(np.load(tmp_path / FOREST_FILE / "value.npy")))
+    bundle = ModelRegistry(model_dir=str(tmp_path)).get()
+    assert bundle.source.endswith(MODEL_FILE) and isinstance(bundle.model, RandomForestRegressor)
+
+
+def test_model_with_other_columns_is_never_swapped_in(tmp_path, monkeypatch):
+    import joblib
+    from model_registry import COLUMNS_FILE
+    import ranking_engine
+
+    publish_forest(str(tmp_path), seed=2)
+    joblib.dump(list(reversed(ranking_engine.model_columns)), tmp_path / COLUMNS_FILE)
+    candidate = ModelRegistry(model_dir=str(tmp_path)).read_bundle()
+    ok, report = hot_reload.validate_bundle(candidate, ranking_engine.model_columns)
+    assert not ok and 'restart' in report['reason']
+
+    monkeypatch.setattr(hot_reload.registry, 'read_bundle', lambda: candidate)
+    monkeypatch.setattr(hot_reload.registry, 'warm_up', lambda bundle: bundle)
+    serving = hot_reload.registry.bundle
+    for validate in (True, False):
+        assert hot_reload.hot_reload(validate)['swapped'] is False
+    assert hot_reload.registry.bundle is serving
+
+
+def test_admin_routes_need_the_token(monkeypatch):
+    from fastapi.testclient import TestClient
+    import main
+    import app as console
+
+    monkeypatch.setattr(hot_reload, 'hot_reload', lambda validate=True: pytest.fail("reloaded without the token"))
+    monkeypatch.setattr(hot_reload, 'rollback', lambda: pytest.fail("rolled back without the token"))
+    for api in (main.app, console.app):
+        client = TestClient(api)
+        # No MODEL_ADMIN_TOKEN: the routes are off
+        monkeypatch.setattr(hot_reload, 'MODEL_ADMIN_TOKEN', "")
+        assert client.post("/admin/reload", headers={'X-Admin-Token': ""}).status_code == 404
+        monkeypatch.setattr(hot_reload, 'MODEL_ADMIN_TOKEN', "s3cret")
+        for route in ("/admin/reload", "/admin/rollback"):
+            assert client.post(route).status_code == 403
+            assert client.post(route, headers={'X-Admin-Token': "guess"}).status_code == 403
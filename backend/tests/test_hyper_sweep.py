@@ -0,0 +1,44 @@
+import sys
+import os
+
+# This tells Python to look one folder up (the backend folder) for the logic
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from generate_data import write_synthetic_data
+from hyper_sweep import cached_features, load_features, pareto_front, run_sweep
+
+
+def test_feature_cache_is_keyed_by_dataset_content(tmp_path):
+    data_path = str(tmp_path / "rides.csv")
+    cache_dir = str(tmp_path / "cache")
+    write_synthetic_data(data_path, 500, seed=1)
+
+    folder = cached_features(data_path, cache_dir)
+    X, y, columns = load_features(folder)
+    assert X.shape == (500, 7) and len(y) == 500 and columns[0] == 'hour_of_day'
+    assert cached_features(data_path, cache_dir) == folder
+
+    write_synthetic_data(data_path, 500, seed=2)
+    assert cached_features(data_path, cache_dir) != folder
+
+
+def test_pareto_front_keeps_only_unbeaten_models():
+    results = pareto_front([
+        {'mae': 1.9, 'quote_ms': 0.5},   # most accurate
+        {'mae': 2.0, 'quote_ms': 0.2},   # fastest
+        {'mae': 2.1, 'quote_ms': 0.4},   # beaten on both
+    ])
+    assert [r['frontier'] for r in results] == [True, True, False]
+
+
+def test_sweep_reports_accuracy_latency_and_size(tmp_path):
+    data_path = str(tmp_path / "rides.csv")
+    write_synthetic_data(data_path, 600, seed=3)
+
+    results = run_sweep([{'n_estimators': 3, 'max_depth': 4}, {'n_estimators': 5, 'max_depth': 6}],
+                        data_path, n_folds=2, workers=1, cache_dir=str(tmp_path / "cache"))
+    assert len(results) == 2
+    assert results[0]['mae'] <= results[1]['mae']
+    for r in results:
+        assert r['params']['min_samples_leaf'] == 5     # unspecified settings come from FOREST_PARAMS
+        assert r['quote_ms'] > 0 and r['size_mb'] > 0 and 0 < r['r2'] <= 1
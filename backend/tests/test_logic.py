@@ -1,11 +1,11 @@
 import sys
 import os
-import pandas as pd
 
 # This tells Python to look one folder up (the backend folder) for the logic
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from ranking_engine import get_vehicle_recommendations
+from quote_response import Recommendation
 
 def test_recommendations():
     print("\n--- 🧪 RUNNING AI BACKEND VALIDATION TESTS ---")
@@ -18,9 +18,9 @@ def test_recommendations():
     try:
         results = get_vehicle_recommendations(start_lat, start_lon, end_lat, end_lon, rush_hour, 'balanced')
         
-        # Test 1: Check if result is a DataFrame (standard for feature pipelines)
-        if not isinstance(results, pd.DataFrame):
-            print("❌ FAILED: Results should be a Pandas DataFrame.")
+        # Test 1: Check if result is a list of Recommendation rows (ready for JSON)
+        if not isinstance(results, list) or not all(isinstance(r, Recommendation) for r in results):
+            print("❌ FAILED: Results should be a list of Recommendation rows.")
             return
 
         # Test 2: Check result count
@@ -31,13 +31,13 @@ def test_recommendations():
 
         # Test 3: Validate column requirements (Scikit-learn evaluation metrics)
         required_cols = ['vehicle', 'fare', 'eta', 'distance', 'demand']
-        if all(col in results.columns for col in required_cols):
+        if all(col in ride.to_dict() for ride in results for col in required_cols):
             print("✅ SUCCESS: All required data columns are present.")
         else:
-            print(f"❌ FAILED: Missing columns. Found: {list(results.columns)}")
+            print(f"❌ FAILED: Missing columns. Found: {list(results[0].to_dict())}")
 
         # Test 4: Verify Rush Hour Surge Logic
-        if results['demand'].iloc[0] == "High":
+        if results[0].demand == "High":
             print("✅ SUCCESS: Surge pricing/demand logic is active for Udupi peak hours.")
         else:
             print("❌ FAILED: Demand should be 'High' at 18:00 (6 PM).")
@@ -47,5 +47,64 @@ def test_recommendations():
     except Exception as e:
         print(f"❌ CRITICAL ERROR DURING TESTING: {e}")
 
+
+def test_batch_matches_single_quotes():
+    import pytest
+    from ranking_engine import get_batch_recommendations
+    from model_registry import registry
+    if registry.get().model is None:
+        pytest.skip("no trained model")
+
+    trips = [
+        (13.34, 74.7480, 13.35, 74.7550, 18, 'balanced'),
+        (13.3516, 74.7421, 13.3441, 74.7860, 10, 'fastest'),
+        (13.36, 74.78, 13.36, 74.78, 7, 'cheapest'),
+        (13.33, 74.73, 13.37, 74.79, 23, '3'),
+    ]
+    columns = list(zip(*trips))
+    batch = get_batch_recommendations(*columns)
+
+    assert len(batch) == len(trips)
+    for trip, batch_results in zip(trips, batch):
+        assert batch_results == get_vehicle_recommendations(*trip)
+
+
+def test_quantile_quotes_and_reliable_ranking():
+    import pytest
+    from ranking_engine import get_batch_recommendations, ETA_QUANTILES
+    from model_registry import registry, ModelBundle
+    bundle = registry.get()
+    if bundle.model is None:
+        pytest.skip("no trained model")
+    trip = (13.3516, 74.7421, 13.3441, 74.7860, 10)
+
+    plain = get_vehicle_recommendations(*trip, 'fastest')
+    ranged = get_vehicle_recommendations(*trip, 'fastest', quantiles=True)
+    assert plain[0].eta_p90 is None and 'eta_p90' not in plain[0].to_dict()
+    # Same quote, now with a range around each ETA
+    assert [r._replace(eta_p10=None, eta_p50=None, eta_p90=None) for r in ranged] == plain
+    assert all(r.eta_p10 <= r.eta_p50 <= r.eta_p90 and r.eta_p10 <= r.eta <= r.eta_p90 for r in ranged)
+    assert get_batch_recommendations(*([v] for v in trip), 'fastest', quantiles=True)[0] == ranged
+
+    reliable = get_vehicle_recommendations(*trip, 'reliable')
+    assert [r.eta_p90 for r in reliable] == sorted(r.eta_p90 for r in reliable)
+    assert get_batch_recommendations(*([v] for v in trip), ['reliable'])[0] == reliable
+
+    # A model without trees (distilled) quotes without a range and 'reliable' falls back to the ETA
+    class NoTrees:
+        n_features_in_ = bundle.model.n_features_in_
+        predict = staticmethod(bundle.model.predict)
+    registry.swap(ModelBundle(NoTrees(), bundle.eta_surface, bundle.version, bundle.load_number, bundle.source,
+                              bundle.load_seconds, bundle.loaded_at, bundle.error, bundle.zone_tables), keep_history=False)
+    try:
+        fallback = get_vehicle_recommendations(*trip, 'reliable', quantiles=True)
+    finally:
+        registry.swap(bundle, keep_history=False)
+    assert fallback[0].eta_p90 is None
+    assert [r.eta for r in fallback] == sorted(r.eta for r in fallback)
+    assert len(ETA_QUANTILES) == 3
+
+
 if __name__ == "__main__":
-    test_recommendations()
\ No newline at end of file
+    test_recommendations()
+    test_batch_matches_single_quotes()
\ No newline at end of file
@@ -0,0 +1,54 @@
+import sys
+import os
+
+# This tells Python to look one folder up (the backend folder) for the logic
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+from fastapi.testclient import TestClient
+
+from metrics import Counter, Histogram, MetricsRegistry, stats_collector
+from model_registry import registry
+import main
+
+
+def test_counter_and_histogram_render_prometheus_text():
+    counter = Counter("demo_total", "Demo counter.", ("route",))
+    counter.inc(("/a",))
+    counter.inc(("/a",), 2)
+    assert 'demo_total{route="/a"} 3' in counter.render()
+
+    histogram = Histogram("demo_seconds", "Demo latency.", buckets=(0.1, 1))
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+    histogram.observe(5)
+    lines = histogram.render()
+    # Buckets are cumulative and end with +Inf == count
+    assert 'demo_seconds_bucket{le="0.1"} 1' in lines
+    assert 'demo_seconds_bucket{le="1"} 2' in lines
+    assert 'demo_seconds_bucket{le="+Inf"} 3' in lines
+    assert 'demo_seconds_count 3' in lines
+
+
+def test_stats_collector_skips_non_numbers():
+    registry = MetricsRegistry()
+    registry.collectors.append(stats_collector("demo", lambda: {'hits': 4, 'policy': 'lru', 'hit_rate': 0.5}))
+    text = registry.render()
+    assert 'demo_hits 4' in text and 'demo_hit_rate 0.5' in text
+    assert 'policy' not in text
+
+
+def test_metrics_endpoint_counts_quotes():
+    if registry.get().model is None:
+        pytest.skip("no trained model")
+    with TestClient(main.app) as client:
+        response = client.post("/predict_ride", params={
+            'start_lat': 13.34, 'start_lon': 74.74, 'end_lat': 13.35, 'end_lon': 74.79, 'hour': 18})
+        assert response.status_code == 200
+        text = client.get("/metrics").text
+
+    assert 'udupi_http_requests_total{route="/predict_ride",method="POST",status="200"}' in text
+    assert 'udupi_quote_stage_seconds_count{path="batch",stage="predict"}' in text
+    assert 'udupi_quotes_total{demand="High"}' in text
+    assert 'udupi_model_ready 1' in text
+    assert 'udupi_quote_cache_misses' in text
@@ -0,0 +1,51 @@
+import sys
+import os
+import asyncio
+
+# This tells Python to look one folder up (the backend folder) for the logic
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from micro_batcher import MicroBatcher
+
+
+async def run_inline(fn, *args):
+    return fn(*args)
+
+
+def test_requests_in_one_window_share_a_batch():
+    calls = []
+
+    def double_all(items):
+        calls.append(list(items))
+        return [item * 2 for item in items]
+
+    async def scenario():
+        batcher = MicroBatcher(double_all, window_ms=20, max_size=100, runner=run_inline)
+        results = await asyncio.gather(*(batcher.submit(i) for i in range(5)))
+        return batcher, results
+
+    batcher, results = asyncio.run(scenario())
+    assert results == [0, 2, 4, 6, 8]
+    assert calls == [[0, 1, 2, 3, 4]]
+    stats = batcher.stats()
+    assert stats['batches'] == 1 and stats['mean_batch_size'] == 5
+
+
+def test_full_batch_is_sent_without_waiting():
+    async def scenario():
+        batcher = MicroBatcher(lambda items: items, window_ms=10000, max_size=3, runner=run_inline)
+        return await asyncio.wait_for(asyncio.gather(*(batcher.submit(i) for i in range(3))), timeout=1)
+
+    assert asyncio.run(scenario()) == [0, 1, 2]
+
+
+def test_batch_errors_reach_every_caller():
+    def broken(items):
+        raise RuntimeError("boom")
+
+    async def scenario():
+        batcher = MicroBatcher(broken, window_ms=1, max_size=10, runner=run_inline)
+        return await asyncio.gather(batcher.submit(1), batcher.submit(2), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(r, RuntimeError) for r in results)
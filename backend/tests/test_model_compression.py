@@ -0,0 +1,73 @@
+import sys
+import os
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+
+# This tells Python to look one folder up (the backend folder) for the logic
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from forest_engine import CompiledForest
+from model_compression import prune_forest, quantize_forest, DistilledEta, quote_features
+
+COLUMNS = ['hour_of_day', 'trip_distance', 'vehicle_type_Auto', 'vehicle_type_Bike',
+           'vehicle_type_Mini', 'vehicle_type_SUV', 'vehicle_type_Sedan']
+
+
+def make_forest():
+    rng = np.random.default_rng(7)
+    X = np.zeros((600, 7))
+    X[:, 0] = rng.integers(6, 24, 600)
+    X[:, 1] = rng.uniform(0.5, 11.0, 600)
+    X[np.arange(600), 2 + rng.integers(0, 5, 600)] = 1
+    y = X[:, 1] * 2.5 + (X[:, 0] > 16) * 3 + X[:, 5] * 2 + rng.normal(0, 1, 600)
+    model = RandomForestRegressor(n_estimators=20, max_depth=8, random_state=0, n_jobs=1).fit(X, y)
+    return model, X
+
+
+def truncated_predict(forest, X, depth, n_trees):
+    """Reference: walk only `depth` levels of the first n_trees trees and average the node values."""
+    flat = np.ascontiguousarray(X, dtype=np.float32).ravel()
+    row_offsets = (np.arange(len(X)) * X.shape[1])[:, None]
+    nodes = np.broadcast_to(forest.roots[:n_trees], (len(X), n_trees))
+    for _ in range(depth):
+        nodes = forest.children_flat[2 * nodes + (flat[row_offsets + forest.feature[nodes]] > forest.threshold[nodes])]
+    return np.cumsum(forest.value[nodes], axis=1)[:, -1] / n_trees
+
+
+def test_prune_keeps_trees_and_cuts_depth():
+    model, X = make_forest()
+    full = CompiledForest.from_model(model)
+    assert np.array_equal(prune_forest(full).predict(X), model.predict(X))
+
+    pruned = prune_forest(full, n_trees=10, max_depth=4)
+    assert pruned.n_estimators == 10 and pruned.max_depth == 4
+    assert pruned.nbytes < full.nbytes / 2
+    np.testing.assert_allclose(pruned.predict(X), truncated_predict(full, X, 4, 10))
+
+
+def test_quantized_forest_takes_the_same_splits():
+    model, X = make_forest()
+    full = CompiledForest.from_model(model)
+    quantized = quantize_forest(full)
+    assert quantized.threshold.dtype == np.float32 and quantized.nbytes < full.nbytes
+    # Same leaves everywhere, including right at the thresholds
+    X_edges = np.repeat(X[:50], 2, axis=0)
+    X_edges[::2, 1] = np.asarray(full.threshold[full.feature == 1][:50], dtype=np.float32)
+    assert np.allclose(quantized.leaf_values(X_edges), full.leaf_values(X_edges), atol=1e-5)
+    np.testing.assert_allclose(quantized.predict(X), model.predict(X), atol=1e-5)
+
+
+def test_distilled_model_follows_the_forest(tmp_path):
+    model, X = make_forest()
+    distilled = DistilledEta.fit(model, COLUMNS, knot_step=0.25)
+    assert np.mean(np.abs(distilled.predict(X) - model.predict(X))) < 1.0
+
+    loaded = DistilledEta.load(distilled.save(str(tmp_path / "distilled.npz")))
+    np.testing.assert_array_equal(loaded.predict(X), distilled.predict(X))
+
+
+def test_latency_is_timed_on_one_quote():
+    rows = quote_features(COLUMNS)
+    # One trip, five rows, each with exactly one vehicle switched on
+    assert rows.shape == (5, 7) and len(set(rows[:, 0])) == 1 and len(set(rows[:, 1])) == 1
+    assert (rows[:, 2:].sum(axis=1) == 1).all() and (rows[:, 2:].sum(axis=0) == 1).all()
@@ -0,0 +1,84 @@
+import sys
+import os
+
+# This tells Python to look one folder up (the backend folder) for the logic
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import re
+import signal
+import subprocess
+import time
+import httpx
+import pytest
+
+from model_registry import registry
+from surge_engine import SurgeEngine
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+MANIPAL = (13.3525, 74.7868)
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork()")
+
+
+def children(pid):
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return set(f.read().split())
+
+
+def wait_for(launcher, text):
+    for line in launcher.stdout:
+        if text in line:
+            return line
+    raise AssertionError(f"launcher exited without printing {text!r}")
+
+
+def test_forked_workers_share_surge_counts():
+    engine = SurgeEngine(window_seconds=3600, bucket_seconds=3600, enabled=True).share()
+    engine.record(*MANIPAL)
+    pid = os.fork()
+    if pid == 0:
+        for _ in range(9):
+            engine.record(*MANIPAL)
+        os._exit(0)
+    os.waitpid(pid, 0)
+    assert engine.counts.sum() == 10
+
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/task"), reason="reads worker pids from /proc")
+def test_launcher_serves_restarts_and_stops():
+    if registry.get().model is None:
+        pytest.skip("no trained model")
+    launcher = subprocess.Popen([sys.executable, "prefork_server.py", "--workers", "2", "--port", "0"],
+                                cwd=BACKEND_DIR, stdout=subprocess.PIPE, text=True,
+                                env={**os.environ, 'MODEL_ADMIN_TOKEN': "test-token"})
+    try:
+        line = launcher.stdout.readline()
+        assert "2/2 workers serving" in line
+        url = re.search(r"http://[\d.]+:\d+", line).group(0)
+
+        response = httpx.post(f"{url}/predict_ride", params={'start_lat': 13.34, 'start_lon': 74.74,
+                                                             'end_lat': 13.35, 'end_lon': 74.78, 'hour': 14})
+        assert response.status_code == 200 and len(response.json()) == 3
+        assert httpx.get(f"{url}/ready").json()['pid'] in {int(p) for p in children(launcher.pid)}
+
+        # SIGHUP: every worker is replaced by a new, warmed-up one
+        before = children(launcher.pid)
+        launcher.send_signal(signal.SIGHUP)
+        wait_for(launcher, "workers serving model")
+        deadline = time.time() + 30
+        while children(launcher.pid) & before and time.time() < deadline:
+            time.sleep(0.2)
+        after = children(launcher.pid)
+        assert len(after) == 2 and not after & before
+        assert httpx.get(f"{url}/ready").status_code == 200
+
+        # A worker's /admin/rollback goes to the launcher, which replaces every worker again
+        assert httpx.post(f"{url}/admin/rollback", headers={'X-Admin-Token': "test-token"}).json()['launcher_pid'] == launcher.pid
+        wait_for(launcher, "workers serving model")
+        deadline = time.time() + 30
+        while children(launcher.pid) & after and time.time() < deadline:
+            time.sleep(0.2)
+        assert len(children(launcher.pid)) == 2 and not children(launcher.pid) & after
+    finally:
+        launcher.send_signal(signal.SIGTERM)
+        assert launcher.wait(timeout=60) == 0
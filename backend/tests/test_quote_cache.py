@@ -0,0 +1,77 @@
+import sys
+import os
+
+# This tells Python to look one folder up (the backend folder) for the logic
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+
+import ranking_engine
+from model_registry import registry
+from quote_cache import QuoteCache, quote_cache, quote_key
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_lru_evicts_least_recently_used():
+    cache = QuoteCache(max_size=2, ttl=60, policy='lru')
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1      # 'a' is now the most recent
+    cache.put('c', 3)               # so 'b' goes
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    assert cache.stats()['evictions'] == 1
+
+
+def test_fifo_evicts_oldest_insert():
+    cache = QuoteCache(max_size=2, ttl=60, policy='fifo')
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)
+    assert cache.get('a') is None
+    assert cache.get('b') == 2
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = QuoteCache(max_size=10, ttl=5, clock=clock)
+    cache.put('a', 1)
+    clock.now = 4.9
+    assert cache.get('a') == 1
+    clock.now = 5.0
+    assert cache.get('a') is None
+    stats = cache.stats()
+    assert stats['hits'] == 1 and stats['misses'] == 1 and stats['expirations'] == 1
+
+
+def test_reload_clears_cache_and_changes_keys():
+    key_before = quote_key(13.34, 74.748, 13.35, 74.755, 18, 'balanced')
+    quote_cache.put(key_before, [{'vehicle': 'Bike'}])
+    ranking_engine.reload_model()
+    assert quote_cache.get(key_before) is None
+    assert quote_key(13.34, 74.748, 13.35, 74.755, 18, 'balanced') != key_before
+
+
+def test_live_surge_is_part_of_the_key(monkeypatch):
+    from quote_cache import get_cached_recommendations
+    from surge_engine import surge
+
+    if registry.get().model is None:
+        pytest.skip("no trained model")
+    trip = (13.34, 74.748, 13.36, 74.775, 14, 'cheapest')
+    normal = get_cached_recommendations(*trip)
+    monkeypatch.setattr(surge, 'multiplier', lambda lat, lon, now=None: 1.5)
+    surging = get_cached_recommendations(*trip)
+
+    # Not served from the cache: the busy pickup zone is priced 1.5x off-peak
+    assert surging[0].demand == 'High' and surging[0].surge == 1.5
+    assert normal[0].demand == 'Normal'
+    assert surging[0].fare > normal[0].fare
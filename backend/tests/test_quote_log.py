@@ -0,0 +1,120 @@
+import sys
+import os
+
+# This tells Python to look one folder up (the backend folder) for the logic
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import queue
+import time
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+from quote_log import QuoteLogger, quote_log, load_quote_logs, log_files, quoted_trips, trip_mix_weights
+from quote_response import Recommendation
+from model_registry import registry
+from train_model import quote_mix_weights
+import main
+import app as console
+
+ROWS = [
+    Recommendation('Bike', 10.9, 61, 4.47, 'High', 1.45),
+    Recommendation('Auto', 16.6, 95, 4.47, 'High', 1.45, None, 14.2, 16.5, 19.0),
+]
+
+
+def test_quotes_are_batched_rotated_and_read_back(tmp_path):
+    # Every file is full after one write, so each write lands in its own file
+    logger = QuoteLogger(str(tmp_path), batch_size=100, flush_seconds=0.05, max_bytes=1, enabled=True)
+    logger.log(13.34, 74.74, 13.35, 74.78, 9, 'fastest', False, ROWS)
+    logger.log_batch({'start_lats': [13.30, 13.31], 'start_lons': [74.70, 74.71], 'end_lats': [13.32, 13.33],
+                      'end_lons': [74.72, 74.73], 'hours': [18, 19], 'preferences': 'cheapest'}, True, [ROWS[:1], ROWS])
+    logger.close()
+    # Written together (one batch), so one file
+    assert logger.stats()['writes'] == 1 and len(log_files(str(tmp_path))) == 1
+
+    logger.log(13.34, 74.74, 13.35, 74.78, 22, 'balanced, "odd"', False, ROWS)
+    logger.close()
+    stats = logger.stats()
+    assert stats['quotes_written'] == 4 and stats['rows_written'] == 7 and stats['quotes_dropped'] == 0
+    assert len(log_files(str(tmp_path))) == 2 and not any(name.endswith('.part') for name in os.listdir(tmp_path))
+
+    logs = load_quote_logs(str(tmp_path))
+    assert len(logs) == 7
+    first = logs.iloc[0]
+    assert (first['vehicle_type'], first['eta'], first['fare'], first['rank'], first['preference']) == ('Bike', 10.9, 61, 0, 'fastest')
+    assert logs['preference'].iloc[-1] == 'balanced, "odd"'
+    assert logs['eta_p90'].isna().sum() == 4 and logs['eta_p90'].max() == pytest.approx(19.0)
+    assert logs['precise'].tolist() == [False, False, True, True, True, False, False]
+    assert load_quote_logs(str(tmp_path), since=logs['ts'].max() + 1).empty
+    assert len(quoted_trips(logs)) == 4
+
+
+def test_trip_mix_weights_follow_the_logged_quotes(tmp_path):
+    # Riders asked for short evening trips; the training rides are spread evenly
+    logs = pd.DataFrame({'rank': [0, 1, 2] * 30, 'hour_of_day': [18] * 90, 'trip_distance': [1.2] * 90})
+    hours = np.repeat([9, 18], 50)
+    distances = np.tile([1.2, 7.0], 50)
+    weights = trip_mix_weights(logs, hours, distances)
+    assert weights.mean() == pytest.approx(1.0, abs=0.05)
+    evening_short = (hours == 18) & (distances == 1.2)
+    assert weights[evening_short].min() > 5 * weights[~evening_short].max()
+    assert weights.max() <= 10
+
+    X = pd.DataFrame({'hour_of_day': hours, 'trip_distance': distances})
+    assert quote_mix_weights(str(tmp_path), X) is None
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "quote log writer did not get there in time"
+        time.sleep(0.01)
+
+
+def test_old_file_is_rotated_by_age(tmp_path):
+    now = [1000.0]
+    logger = QuoteLogger(str(tmp_path), flush_seconds=0.01, max_seconds=60, enabled=True, clock=lambda: now[0])
+    logger.log(13.34, 74.74, 13.35, 74.78, 9, 'fastest', False, ROWS)
+    wait_until(lambda: logger.stats()['writes'] == 1)
+    now[0] += 61
+    # The writer closes the old file even with no new quotes coming in
+    wait_until(lambda: logger.stats()['files_closed'] == 1)
+    assert logger.stats()['current_file'] is None and len(log_files(str(tmp_path))) == 1
+    logger.close()
+
+
+def test_full_buffer_drops_instead_of_blocking(tmp_path):
+    logger = QuoteLogger(str(tmp_path), buffer_size=2, enabled=True)
+    # A writer that never catches up: the queue without its thread
+    logger._queue, logger._pid = queue.Queue(maxsize=2), os.getpid()
+    for _ in range(3):
+        logger.log(13.34, 74.74, 13.35, 74.78, 9, 'fastest', False, ROWS)
+    logger.log_batch({'start_lats': [1, 2], 'start_lons': [1, 2], 'end_lats': [1, 2], 'end_lons': [1, 2],
+                      'hours': [1, 2], 'preferences': ['a', 'b']}, False, [ROWS, ROWS])
+    assert logger.stats()['quotes_dropped'] == 3 and logger.stats()['queued'] == 2
+    assert 'udupi_quote_log_quotes_dropped' in main.prometheus_metrics().body.decode()
+
+
+def test_served_quotes_are_logged(tmp_path, monkeypatch):
+    if registry.get().model is None:
+        pytest.skip("no trained model")
+    quote_log.close()
+    monkeypatch.setattr(quote_log, 'log_dir', str(tmp_path))
+    monkeypatch.setattr(quote_log, 'enabled', True)
+    trip = {'start_lat': 13.341, 'start_lon': 74.741, 'end_lat': 13.35, 'end_lon': 74.78, 'hour': 14}
+    with TestClient(main.app) as client:
+        served = client.post("/predict_ride", params={**trip, 'preference': 'cheapest'}).json()
+        batch = client.post("/predict_rides", json=[{**trip, 'preference': 'fastest'}]).json()
+    # Leaving the client runs the lifespan shutdown, which writes out the log
+    logs = load_quote_logs(str(tmp_path))
+    assert logs['vehicle_type'].tolist() == [r['vehicle'] for r in served + batch[0]]
+    assert logs['fare'].tolist() == [r['fare'] for r in served + batch[0]]
+    assert set(logs['model_version']) == {registry.get().version}
+    assert logs['preference'].tolist() == ['cheapest'] * 3 + ['fastest'] * 3
+
+    # The admin console's form quotes are served quotes too
+    with TestClient(console.app) as client:
+        assert client.post("/test", data={**trip, 'preference': 'balanced'}).status_code == 200
+    assert load_quote_logs(str(tmp_path))['preference'].tolist()[6:] == ['balanced'] * 3
@@ -0,0 +1,110 @@
+import sys
+import os
+
+# This tells Python to look one folder up (the backend folder) for the logic
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import asyncio
+import json
+import pytest
+from fastapi.testclient import TestClient
+
+from quote_response import Recommendation, encode_recommendations, encode_batch
+from batch_quotes import stream_batch
+from ranking_engine import get_vehicle_recommendations, get_batch_recommendations
+from model_registry import registry, ModelBundle
+import app as console
+import main
+
+# Already at the quote cache's coordinate precision, so the API quotes exactly this trip
+TRIP = {'start_lat': 13.352, 'start_lon': 74.742, 'end_lat': 13.344, 'end_lon': 74.786, 'hour': 10}
+
+
+def test_encoding_matches_json_dumps():
+    rows = [
+        Recommendation('Bike', 10.9, 61, 4.47, 'High', 1.45, 8.98),
+        Recommendation('Auto', 16.6, 95, 4.47, 'High', 1.1500000000000001, 13.760000000000002),
+    ]
+    assert json.loads(encode_recommendations(rows)) == [r.to_dict() for r in rows]
+    assert encode_recommendations(rows) == json.dumps([r.to_dict() for r in rows], separators=(',', ':'))
+    # score is left out (not null) for the fastest/cheapest rankings, as before
+    plain = Recommendation('SUV', 12.0, 190, 0.5, 'Normal', 1.0)
+    assert encode_recommendations([plain]) == '[{"vehicle":"SUV","eta":12.0,"fare":190,"distance":0.5,"demand":"Normal","surge":1.0}]'
+    assert encode_batch([[plain], []]) == f'[{encode_recommendations([plain])},[]]'
+    ranged = Recommendation('Mini', 12.4, 150, 4.47, 'High', 1.45, None, 10.7, 12.4, 14.7)
+    assert encode_recommendations([ranged]) == json.dumps([ranged.to_dict()], separators=(',', ':'))
+
+
+def test_routes_send_the_engine_rows():
+    if registry.get().model is None:
+        pytest.skip("no trained model")
+    for preference in ('balanced', 'fastest'):
+        rows = get_vehicle_recommendations(*TRIP.values(), preference)
+        expected = [r.to_dict() for r in rows]
+        # Both engine paths produce plain Python numbers, so their JSON is identical
+        batch = get_batch_recommendations(*([v] for v in TRIP.values()), preference)
+        assert encode_batch(batch) == f'[{encode_recommendations(rows)}]'
+
+        for asgi_app in (main.app, console.app):
+            with TestClient(asgi_app) as client:
+                response = client.post("/predict_ride", params={**TRIP, 'preference': preference})
+            assert response.headers['content-type'] == "application/json"
+            assert response.json() == expected
+
+
+def test_console_page_renders_the_quote():
+    if registry.get().model is None:
+        pytest.skip("no trained model")
+    rows = get_vehicle_recommendations(*TRIP.values(), 'cheap')
+    with TestClient(console.app) as client:
+        page = client.post("/test", data={**TRIP, 'preference': 'cheap'}).text
+        home = client.get("/").text
+    assert "{% RESULTS_SECTION %}" not in page and "{% RESULTS_SECTION %}" not in home
+    assert f"{rows[0].distance} km" in page
+    for ride in rows:
+        assert f"Predicted ETA: {ride.eta} mins" in page and f"₹{ride.fare}" in page
+    assert "SURGE 1.45x" in page  # 10 AM is rush hour
+    assert "Trip Distance" not in home
+
+
+async def run_inline(fn, *args):
+    return fn(*args)
+
+
+async def collect(lines):
+    return [line async for line in lines]
+
+
+def test_stream_ends_with_the_error_line_without_a_model():
+    columns = {'start_lats': [13.35], 'start_lons': [74.74], 'end_lats': [13.34], 'end_lons': [74.78],
+               'hours': [10], 'preferences': 'balanced'}
+    old = registry.swap(ModelBundle(None, None, None, 0, None, 0.0, 0.0, "model files missing"), keep_history=False)
+    try:
+        lines = asyncio.run(collect(stream_batch(columns, runner=run_inline)))
+    finally:
+        registry.swap(old, keep_history=False)
+    assert len(lines) == 1 and 'error' in json.loads(lines[0])
+
+
+def test_batch_route_runs_in_the_inference_pool(monkeypatch):
+    import batch_quotes
+    from inference_pool import InferencePool
+
+    trips = [{**TRIP, 'preference': p} for p in ('balanced', 'fastest', 'cheapest')]
+    full = InferencePool(max_workers=1, max_queue=0)
+    full._slots.acquire()
+    monkeypatch.setattr(batch_quotes, 'inference_pool', full)
+    with TestClient(main.app) as client:
+        for stream in (False, True):
+            response = client.post("/predict_rides", params={'stream': stream}, json=trips)
+            assert response.status_code == 429 and response.headers['retry-after'] == "1"
+    assert full.stats()['rejected'] == 2
+
+    if registry.get().model is None:
+        pytest.skip("no trained model")
+    monkeypatch.undo()
+    monkeypatch.setattr(batch_quotes, 'STREAM_CHUNK_SIZE', 2)
+    with TestClient(main.app) as client:
+        whole = client.post("/predict_rides", json=trips).json()
+        streamed = client.post("/predict_rides", params={'stream': True}, json=trips).text
+    assert [json.loads(line) for line in streamed.splitlines()] == whole
@@ -0,0 +1,86 @@
+import sys
+import os
+
+# This tells Python to look one folder up (the backend folder) for the logic
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from generate_data import iter_synthetic_chunks
+from ride_dataset import write_parquet, load_rides, iter_rides, dataset_fingerprint, feature_frame, TRAINING_COLUMNS
+
+pytest.importorskip("pyarrow")
+
+
+@pytest.fixture
+def rides(tmp_path):
+    chunks = list(iter_synthetic_chunks(3000, chunk_size=1000, seed=5))
+    csv_path = str(tmp_path / "rides.csv")
+    pd.concat(chunks).to_csv(csv_path, index=False)
+    parquet_path = str(tmp_path / "rides.parquet")
+    write_parquet(chunks, parquet_path)
+    return csv_path, parquet_path
+
+
+def test_parquet_has_compact_dtypes_and_same_rows(rides):
+    csv_path, parquet_path = rides
+    from_csv = load_rides(path=csv_path)
+    from_parquet = load_rides(path=parquet_path)
+
+    assert list(from_parquet.columns) == list(from_csv.columns)
+    assert from_parquet['hour_of_day'].dtype == np.uint8
+    assert from_parquet['start_lat'].dtype == np.float32
+    assert isinstance(from_parquet['vehicle_type'].dtype, pd.CategoricalDtype)
+
+    # Same rides, only grouped by hour on disk
+    key = ['hour_of_day', 'start_lat', 'start_lon', 'end_lat', 'end_lon']
+    pd.testing.assert_frame_equal(from_csv.sort_values(key).reset_index(drop=True),
+                                  from_parquet.sort_values(key).reset_index(drop=True))
+
+
+def test_projection_and_hour_filter(rides):
+    _, parquet_path = rides
+    df = load_rides(TRAINING_COLUMNS, hours=[17, 18], path=parquet_path)
+    assert list(df.columns) == TRAINING_COLUMNS
+    assert set(df['hour_of_day']) <= {17, 18} and len(df) > 0
+
+
+def test_iter_rides_resumes_at_a_row(rides):
+    for path in rides:
+        everything = pd.concat(iter_rides(TRAINING_COLUMNS, 700, path), ignore_index=True)
+        rest = list(iter_rides(TRAINING_COLUMNS, 700, path, skip_rows=1000))
+        assert sum(len(chunk) for chunk in rest) == 2000
+        pd.testing.assert_frame_equal(pd.concat(rest, ignore_index=True), everything.iloc[1000:].reset_index(drop=True))
+        assert list(iter_rides(TRAINING_COLUMNS, 700, path, skip_rows=3000)) == []
+        fingerprint, hashed = dataset_fingerprint(path)
+        assert len(fingerprint) == 12 and hashed > 0
+
+
+def test_fingerprint_of_a_small_csv_survives_appended_rows(tmp_path):
+    path = tmp_path / "rides.csv"
+    path.write_text("hour_of_day,trip_distance\n" + "9,1.5\n" * 100)
+    fingerprint = dataset_fingerprint(str(path))
+    with open(path, 'a') as f:
+        f.write("10,2.5\n" * 10)
+    # The whole file was under nbytes: hashing the same prefix again still matches
+    assert dataset_fingerprint(str(path), fingerprint[1]) == fingerprint
+    assert dataset_fingerprint(str(path)) != fingerprint
+
+
+def test_feature_frame_matches_get_dummies(rides):
+    csv_path, _ = rides
+    raw = pd.read_csv(csv_path)
+    expected = pd.get_dummies(raw[['hour_of_day', 'trip_distance', 'vehicle_type']])
+
+    X = feature_frame(load_rides(TRAINING_COLUMNS, path=csv_path))
+    assert list(X.columns) == list(expected.columns)
+    np.testing.assert_array_equal(X.values.astype(np.float32), expected.values.astype(np.float32))
+
+
+def test_feature_frame_recodes_categories_in_another_order():
+    # generate_data's categories are in VEHICLE_TYPES order, not sorted
+    chunk = next(iter_synthetic_chunks(500, seed=9))
+    expected = pd.get_dummies(chunk[['hour_of_day', 'trip_distance']].assign(vehicle_type=chunk['vehicle_type'].astype(str)))
+    np.testing.assert_array_equal(feature_frame(chunk).values.astype(np.float32), expected.values.astype(np.float32))
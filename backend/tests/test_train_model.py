@@ -0,0 +1,55 @@
+import sys
+import os
+
+# This tells Python to look one folder up (the backend folder) for the logic
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import joblib
+
+from generate_data import write_synthetic_data
+from train_model import train_incremental, CHECKPOINT_FILE
+
+
+def test_incremental_training_resumes_and_learns_new_rows(tmp_path, capsys):
+    data_path = str(tmp_path / "rides.csv")
+    write_synthetic_data(data_path, 2500, seed=11)
+
+    # A tiny budget gives 1000-row chunks: 3 chunks x 4 trees, capped at the newest 10
+    model = train_incremental(data_path, str(tmp_path), memory_mb=0.01, trees_per_chunk=4, max_trees=10)
+    assert len(model.estimators_) == 10
+    state = joblib.load(tmp_path / CHECKPOINT_FILE)
+    assert state['chunks_done'] == 3 and state['rows_seen'] == 2500
+    assert os.path.exists(tmp_path / "eta_model.pkl")
+
+    # Nothing new in the log: no chunk is refitted
+    again = train_incremental(data_path, str(tmp_path), memory_mb=0.01, trees_per_chunk=4, max_trees=10)
+    assert [t.random_state for t in again.estimators_] == [t.random_state for t in model.estimators_]
+
+    # The log grew by 1000 rows (the last chunk was partial): exactly those rows are read, as one
+    # new chunk (4 new trees, 4 oldest dropped)
+    write_synthetic_data(str(tmp_path / "more.csv"), 1000, seed=12)
+    with open(data_path, 'a') as log, open(tmp_path / "more.csv") as more:
+        next(more)
+        log.write(more.read())
+    capsys.readouterr()
+    grown = train_incremental(data_path, str(tmp_path), memory_mb=0.01, trees_per_chunk=4, max_trees=10)
+    # Resumed (no start over on the grown file) and only the appended rows were trained on
+    output = capsys.readouterr().out
+    assert "starting over" not in output and "Resuming after 3 chunks" in output
+    assert output.count("🌲 Chunk") == 1 and "🌲 Chunk 4: 1,000 rows" in output
+    state = joblib.load(tmp_path / CHECKPOINT_FILE)
+    assert state['rows_seen'] == 3500 and state['chunks_done'] == 4
+    assert len(grown.estimators_) == 10
+    assert [t.random_state for t in grown.estimators_[:6]] == [t.random_state for t in model.estimators_[4:]]
+
+
+def test_regenerated_dataset_is_not_skipped(tmp_path):
+    data_path = str(tmp_path / "rides.csv")
+    write_synthetic_data(data_path, 1500, seed=11)
+    train_incremental(data_path, str(tmp_path), memory_mb=0.01, trees_per_chunk=2, max_trees=10)
+
+    # Same path, new rides: the checkpoint no longer applies, every row is learned again
+    write_synthetic_data(data_path, 1200, seed=13)
+    model = train_incremental(data_path, str(tmp_path), memory_mb=0.01, trees_per_chunk=2, max_trees=10)
+    assert joblib.load(tmp_path / CHECKPOINT_FILE)['rows_seen'] == 1200
+    assert len(model.estimators_) == 4
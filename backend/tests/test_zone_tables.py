@@ -0,0 +1,86 @@
+import sys
+import os
+
+# This tells Python to look one folder up (the backend folder) for the logic
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from generate_data import generate_chunk
+from geodesy import SERVICE_GRID
+from model_registry import registry, ModelBundle
+from ranking_engine import get_vehicle_recommendations, get_batch_recommendations
+from zone_tables import ZoneTables, ride_zones, attach_zones
+
+
+@pytest.fixture
+def rides():
+    return generate_chunk(5000, np.random.default_rng(4))
+
+
+def test_generated_zones_match_the_grid(rides, tmp_path):
+    recomputed = attach_zones(rides.drop(columns=['start_zone', 'end_zone']))
+    np.testing.assert_array_equal(recomputed['start_zone'], rides['start_zone'])
+    np.testing.assert_array_equal(recomputed['end_zone'], rides['end_zone'])
+
+    # Old datasets without zone columns get them computed from the coordinates
+    path = str(tmp_path / "old.csv")
+    rides.drop(columns=['start_zone', 'end_zone']).to_csv(path, index=False)
+    start_zones, end_zones = ride_zones(path)
+    np.testing.assert_array_equal(start_zones, rides['start_zone'])
+    np.testing.assert_array_equal(end_zones, rides['end_zone'])
+
+
+def test_build_and_lookup(rides, tmp_path):
+    n = SERVICE_GRID.n_zones
+    start_zones, end_zones = rides['start_zone'].to_numpy(), rides['end_zone'].to_numpy()
+    # Every held-out ride on one busy pair ran 3 minutes slower than predicted
+    pairs = start_zones.astype(np.int64) * n + end_zones
+    busy = np.bincount(pairs).argmax()
+    test_rows = np.flatnonzero(pairs == busy)
+    tables = ZoneTables.build(start_zones, end_zones, test_rows, np.full(len(test_rows), 3.0), prior=1)
+
+    assert tables.eta_residual.shape == (n * n,)
+    assert tables.eta_residual[busy] == pytest.approx(3.0 * len(test_rows) / (len(test_rows) + 1))
+    assert np.count_nonzero(tables.eta_residual) == 1
+    assert tables.demand.mean() == pytest.approx(1.0)
+    assert tables.demand[busy] == tables.demand.max()
+    # Within-zone trips: centre to centre is 0 km, so the short-trip minimum
+    assert tables.distance_km[0] == 0.5
+
+    lat = rides[['start_lat', 'start_lon', 'end_lat', 'end_lon']].to_numpy()
+    np.testing.assert_array_equal(tables.pairs(*lat.T), pairs)
+    assert [tables.pair(*map(float, row)) for row in lat[:50]] == pairs[:50].tolist()
+
+    loaded = ZoneTables.load(tables.save(str(tmp_path / "zone_tables.npz")))
+    assert loaded.grid == tables.grid
+    np.testing.assert_array_equal(loaded.eta_residual, tables.eta_residual)
+
+
+def test_ranking_adds_the_zone_residual():
+    bundle = registry.get()
+    if bundle.model is None:
+        pytest.skip("no trained model")
+    trip = (13.3405, 74.7425, 13.3610, 74.7780, 14)
+    before = get_vehicle_recommendations(*trip, 'fastest')
+
+    n = SERVICE_GRID.n_zones
+    tables = ZoneTables.build(np.zeros(1, dtype=np.int64), np.zeros(1, dtype=np.int64))
+    pair = tables.pair(*trip[:4])
+    tables.eta_residual[pair] = 2.0
+    patched = ModelBundle(bundle.model, bundle.eta_surface, bundle.version, bundle.load_number, bundle.source,
+                          bundle.load_seconds, bundle.loaded_at, bundle.error, tables)
+    registry.swap(patched, keep_history=False)
+    try:
+        after = get_vehicle_recommendations(*trip, 'fastest')
+        batch = get_batch_recommendations(*([v] for v in trip), 'fastest')[0]
+        precise = get_vehicle_recommendations(*trip, 'fastest', precise=True)
+    finally:
+        registry.swap(bundle, keep_history=False)
+
+    assert [r.eta for r in after] == pytest.approx([r.eta + 2.0 for r in before], abs=0.11)
+    assert [r.eta for r in batch] == [r.eta for r in after]
+    # precise=True skips every precomputed table
+    assert [r.vehicle for r in precise] == [r.vehicle for r in before]
@@ -1,77 +1,332 @@
 import pandas as pd
 import numpy as np
 import os
+import time
 import joblib
+import warnings
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from forest_engine import export_forest, FOREST_FILE
+from eta_surface import EtaSurface, SURFACE_FILE, print_error_report
+from hot_reload import write_manifest
+from ride_dataset import dataset_path, dataset_fingerprint, load_rides, iter_rides, feature_frame, TRAINING_COLUMNS
+from model_compression import compression_candidates, compression_report, print_compression_report, save_served_model
+from zone_tables import build_zone_tables, ZONE_TABLES_FILE
+from quote_log import load_quote_logs, quoted_trips, trip_mix_weights, QUOTE_LOG_DIR
 
-def train_model():
+# The ETA surface is built from plain NumPy rows, not a DataFrame, so this warning is expected
+warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+# Forest settings (tune them with hyper_sweep.py, override with --n-estimators etc.)
+FOREST_PARAMS = {'n_estimators': 250, 'max_depth': 15, 'min_samples_leaf': 5}
+
+# --- INCREMENTAL TRAINING ---
+CHECKPOINT_FILE = "train_checkpoint.pkl"
+# Rough memory use of fitting on one row: the rows themselves plus sklearn's per-tree work arrays
+# (measured ~110 bytes/row with one worker, each extra worker adds its own work arrays)
+TRAIN_BYTES_PER_ROW = 80
+TRAIN_BYTES_PER_ROW_PER_WORKER = 40
+
+
+def find_paths():
     # --- SMARTER PATH DETECTION ---
     # Checks if we are in the project root or inside the 'backend' folder
-    if os.path.exists(os.path.join("data", "rides_dataset.csv")):
-        data_path = os.path.join("data", "rides_dataset.csv")
-        output_dir = "backend"
-    else:
-        # If we are already inside 'backend', the data is one level up
-        data_path = os.path.join("..", "data", "rides_dataset.csv")
-        output_dir = "." # Save in current folder (which is backend)
+    if os.path.isdir(os.path.join("data")):
+        return "data", "backend"
+    # If we are already inside 'backend', the data is one level up
+    return os.path.join("..", "data"), "."  # Save in current folder (which is backend)
+
+
+def new_forest(params=None, n_jobs=-1, warm_start=False):
+    # 4. Model Configuration (FOREST_PARAMS, with anything in `params` taking priority)
+    return RandomForestRegressor(
+        **{**FOREST_PARAMS, **(params or {})},
+        random_state=42,
+        n_jobs=n_jobs,
+        warm_start=warm_start
+    )
+
+
+def evaluation_metrics(y_test, predictions):
+    # Calculating all metrics from your previous version
+    return {
+        'mae': float(mean_absolute_error(y_test, predictions)),
+        'rmse': float(np.sqrt(mean_squared_error(y_test, predictions))),
+        'r2': float(r2_score(y_test, predictions)),
+        # MAPE: Mean Absolute Percentage Error
+        'mape': float(np.mean(np.abs((y_test - predictions) / y_test)) * 100),
+    }
+
+
+def print_evaluation(y_test, predictions):
+    scores = evaluation_metrics(y_test, predictions)
+    print("\n--- ✅ Model Evaluation ---")
+    print(f"MAE:  {scores['mae']:.2f} min")   # Average mistake in minutes
+    print(f"RMSE: {scores['rmse']:.2f} min")  # Penalizes large errors heavily
+    print(f"R2:   {scores['r2']:.2f}")       # Variance explained (Target: 0.70+)
+    print(f"MAPE: {scores['mape']:.2f}%")     # Error as a percentage of total trip time
+    return scores
+
+
+def compress_model(model, model_columns, X_test, y_test, serve='full'):
+    """
+    Post-training compression stage: compares pruned, quantized and distilled versions of the
+    forest on the test rides and returns the one named by `serve` (None for the full forest).
+    """
+    candidates = compression_candidates(model, model_columns)
+    if serve not in candidates:
+        raise ValueError(f"Unknown model to serve '{serve}', pick one of: {', '.join(candidates)}")
+    print_compression_report(compression_report(candidates, X_test, y_test, model_columns))
+    return None if serve == 'full' else candidates[serve]
+
+
+def save_artifacts(model, model_columns, output_dir, served=None, zone_tables=None):
+    """
+    Saves the full model, and publishes `served` (a compressed model) instead of the full forest if given.
+    zone_tables (measured on the served model) are published with it.
+    """
+    # 6. Saving Artifacts
+    if not os.path.exists(output_dir) and output_dir != ".":
+        os.makedirs(output_dir)
+
+    model_file = os.path.join(output_dir, "eta_model.pkl")
+    columns_file = os.path.join(output_dir, "model_columns.pkl")
+
+    joblib.dump(model, model_file)
+    joblib.dump(model_columns, columns_file)
+
+    # 7. Export the compiled forest (flat node arrays) for fast serving
+    forest_file = export_forest(model, os.path.join(output_dir, FOREST_FILE), model_columns)
+    published = [os.path.basename(model_file), FOREST_FILE]
+    serve = FOREST_FILE
+    if served is not None:
+        # Replaces (or sits next to) the full forest, the manifest tells the server to serve it
+        served_file = serve = save_served_model(served, output_dir)
+        if served_file not in published:
+            published.append(served_file)
+    serving_model = served if served is not None else model
+
+    # 8. Precompute the ETA lookup table (hour x distance x vehicle) and check it against the model
+    surface = EtaSurface.build(serving_model, model_columns)
+    surface.save(os.path.join(output_dir, SURFACE_FILE))
+    print_error_report(surface.error_report(serving_model, model_columns))
+    published.append(SURFACE_FILE)
+
+    # 9. Zone-pair tables (ETA residuals, demand, distance) for the ranking engine
+    if zone_tables is not None:
+        zone_tables.save(os.path.join(output_dir, ZONE_TABLES_FILE))
+        published.append(ZONE_TABLES_FILE)
+
+    # 10. Publish: running servers watching the manifest pick the new model up now
+    write_manifest(output_dir, published, serve)
+
+    print(f"\n💾 Files successfully saved to: {os.path.abspath(output_dir)}")
+
+
+def quote_mix_weights(log_dir, X_train, since=None):
+    """
+    Sample weights that give the training rides the trip mix of the served-quote log (quote_log.py),
+    or None if the log is empty. The logged ETAs are the model's own output, so they are never labels.
+    """
+    logs = load_quote_logs(log_dir, since)
+    n_quotes = len(quoted_trips(logs))
+    if n_quotes == 0:
+        print(f"⚠️ No logged quotes in {log_dir}, training without trip mix weights.")
+        return None
+    weights = trip_mix_weights(logs, X_train['hour_of_day'], X_train['trip_distance'])
+    print(f"🧾 Weighting rides by the trip mix of {n_quotes:,} logged quotes from {log_dir} "
+          f"(weights {weights.min():.2f}-{weights.max():.2f})")
+    return weights
+
 
-    if not os.path.exists(data_path):
-        print(f"❌ Error: {data_path} not found. Please run generate_data.py first.")
+def train_model(params=None, serve='full', compress=False, quote_logs=None, quote_logs_since=None):
+    """
+    Trains on the rides dataset. quote_logs (a quote log folder) weights the training rides by the
+    trip mix riders actually asked for; evaluation and the zone tables stay unweighted.
+    """
+    data_dir, output_dir = find_paths()
+
+    # Prefers the Parquet dataset (ride_dataset.py) and falls back to the CSV
+    data_path = dataset_path(data_dir)
+    if data_path is None:
+        print(f"❌ Error: no rides dataset in {data_dir}. Please run generate_data.py first.")
         return
 
     print(f"📂 Loading data from: {data_path}...")
-    df = pd.read_csv(data_path)
+    # Only the 4 columns the model uses are read, with compact dtypes
+    df = load_rides(TRAINING_COLUMNS, path=data_path)
 
     # 1. Feature Engineering (One-Hot Encoding)
-    X = pd.get_dummies(df[['hour_of_day', 'trip_distance', 'vehicle_type']])
+    X = feature_frame(df)
     y = df['duration_min']
 
     # 2. Save column names for consistent inference later
     model_columns = list(X.columns)
-    
+
     # 3. Train/Test Split (80/20)
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    sample_weight = quote_mix_weights(quote_logs, X_train, quote_logs_since) if quote_logs is not None else None
 
     print("🧠 Training the Random Forest Regressor...")
-    # 4. Model Configuration
-    model = RandomForestRegressor(
-        n_estimators=250, 
-        max_depth=15, 
-        min_samples_leaf=5,
-        random_state=42,
-        n_jobs=-1 
-    )
-    model.fit(X_train, y_train)
+    model = new_forest(params)
+    model.fit(X_train, y_train, sample_weight=sample_weight)
 
     # 5. Full Evaluation (Take the "Final Exam")
     predictions = model.predict(X_test)
+    print_evaluation(y_test, predictions)
 
-    # Calculating all metrics from your previous version
-    mae = mean_absolute_error(y_test, predictions)
-    rmse = np.sqrt(mean_squared_error(y_test, predictions))
-    r2 = r2_score(y_test, predictions)
-    # MAPE: Mean Absolute Percentage Error
-    mape = np.mean(np.abs((y_test - predictions) / y_test)) * 100
+    # 5b. Optional: compare compressed versions and publish one of them
+    served = compress_model(model, model_columns, X_test, y_test, serve) if compress or serve != 'full' else None
 
-    print("\n--- ✅ Model Evaluation ---")
-    print(f"MAE:  {mae:.2f} min")   # Average mistake in minutes
-    print(f"RMSE: {rmse:.2f} min")  # Penalizes large errors heavily
-    print(f"R2:   {r2:.2f}")       # Variance explained (Target: 0.70+)
-    print(f"MAPE: {mape:.2f}%")     # Error as a percentage of total trip time
+    # 5c. Where the served model is off, per pickup/drop zone pair (X_test keeps the dataset row numbers)
+    served_predictions = predictions if served is None else served.predict(X_test.to_numpy(dtype=np.float64))
+    zone_tables = build_zone_tables(data_path, X_test.index.to_numpy(), y_test.to_numpy() - served_predictions)
 
-    # 6. Saving Artifacts
-    if not os.path.exists(output_dir) and output_dir != ".":
-        os.makedirs(output_dir)
+    save_artifacts(model, model_columns, output_dir, served, zone_tables)
 
-    model_file = os.path.join(output_dir, "eta_model.pkl")
-    columns_file = os.path.join(output_dir, "model_columns.pkl")
 
-    joblib.dump(model, model_file)
-    joblib.dump(model_columns, columns_file)
-    
-    print(f"\n💾 Files successfully saved to: {os.path.abspath(output_dir)}")
+def chunk_rows_for_budget(memory_mb, n_jobs=1):
+    """How many rows one training chunk may have so fitting it stays within memory_mb."""
+    bytes_per_row = TRAIN_BYTES_PER_ROW + TRAIN_BYTES_PER_ROW_PER_WORKER * max(1, n_jobs)
+    return max(1000, int(memory_mb * 1e6 / bytes_per_row))
+
+
+def holdout_mask(first_row, n_rows, fraction=0.2, seed=42):
+    """Which rows of a chunk (starting at dataset row first_row) are held out for evaluation (the same rows on every run)."""
+    return np.random.default_rng([seed, first_row]).random(n_rows) < fraction
+
+
+def save_checkpoint(state, path):
+    # Write next to the old checkpoint and rename over it, so a crash mid-write never loses progress
+    joblib.dump(state, path + ".tmp")
+    os.replace(path + ".tmp", path)
+
+
+def train_incremental(data_path=None, output_dir=None, memory_mb=512, trees_per_chunk=25, max_trees=250,
+                      max_minutes=None, resume=True, n_jobs=1, holdout_fraction=0.2, max_holdout_rows=100_000, params=None,
+                      serve='full', compress=False):
+    """
+    Out-of-core training: streams the dataset in chunks that fit in memory_mb and adds
+    trees_per_chunk warm-started trees fitted on each new chunk.
+
+    Only the newest max_trees trees are kept (older ones are dropped), so the model size and
+    serving latency stay fixed however big the ride log gets; the model reflects recent data.
+
+    After every chunk the forest is checkpointed with the number of rows learned so far. With
+    resume=True a later run starts reading at the first row it has not seen, so a nightly retrain on
+    an append-only log only fits the new rides (including rows appended after a partial last chunk).
+    A checkpoint made on a different (or regenerated) dataset is ignored.
+    max_minutes stops early (after the current chunk); the next run picks up from the checkpoint.
+    Returns the model, or None if there was nothing to train on.
+    """
+    default_data_dir, default_output_dir = find_paths()
+    data_path = data_path or dataset_path(default_data_dir)
+    output_dir = output_dir or default_output_dir
+    if data_path is None:
+        print(f"❌ Error: no rides dataset in {default_data_dir}. Please run generate_data.py first.")
+        return None
+
+    checkpoint_path = os.path.join(output_dir, CHECKPOINT_FILE)
+    state = None
+    if resume and os.path.exists(checkpoint_path):
+        state = joblib.load(checkpoint_path)
+        if state['data_path'] != os.path.abspath(data_path):
+            print(f"⚠️ Checkpoint was made on {state['data_path']}, starting over.")
+            state = None
+        # The same prefix as at the start: rows appended since then are not part of it
+        elif state.get('fingerprint') is None or dataset_fingerprint(data_path, state['fingerprint'][1]) != state['fingerprint']:
+            print(f"⚠️ {data_path} was regenerated since the checkpoint, starting over.")
+            state = None
+    if state is None:
+        state = {
+            'data_path': os.path.abspath(data_path),
+            'fingerprint': dataset_fingerprint(data_path),
+            'chunk_rows': chunk_rows_for_budget(memory_mb, n_jobs),
+            'chunks_done': 0,
+            'rows_seen': 0,
+            'model': new_forest({**(params or {}), 'n_estimators': 0}, n_jobs=n_jobs, warm_start=True),
+            'holdout_X': None,
+            'holdout_y': None,
+        }
+    else:
+        print(f"♻️ Resuming after {state['chunks_done']} chunks ({state['rows_seen']:,} rows).")
+
+    model = state['model']
+    deadline = time.monotonic() + max_minutes * 60 if max_minutes else None
+    print(f"📂 Streaming {data_path} in chunks of {state['chunk_rows']:,} rows "
+          f"(~{memory_mb} MB budget, {trees_per_chunk} trees per chunk, newest {max_trees} kept)...")
+
+    for df in iter_rides(TRAINING_COLUMNS, state['chunk_rows'], data_path, skip_rows=state['rows_seen']):
+        if deadline is not None and time.monotonic() > deadline:
+            print("⏱️ Time budget used up, the next run continues from the checkpoint.")
+            break
+
+        X = feature_frame(df)
+        y = df['duration_min']
+        test = holdout_mask(state['rows_seen'], len(df), holdout_fraction)
+
+        # Keep a bounded evaluation sample from every chunk seen so far
+        if state['holdout_X'] is None or len(state['holdout_X']) < max_holdout_rows:
+            state['holdout_X'] = pd.concat([state['holdout_X'], X[test]]) if state['holdout_X'] is not None else X[test]
+            state['holdout_y'] = pd.concat([state['holdout_y'], y[test]]) if state['holdout_y'] is not None else y[test]
+            state['holdout_X'] = state['holdout_X'].iloc[:max_holdout_rows]
+            state['holdout_y'] = state['holdout_y'].iloc[:max_holdout_rows]
+
+        # warm_start: only the new trees are fitted, on this chunk's training rows
+        model.set_params(n_estimators=len(getattr(model, 'estimators_', [])) + trees_per_chunk)
+        model.fit(X[~test], y[~test])
+        if len(model.estimators_) > max_trees:
+            model.estimators_ = model.estimators_[-max_trees:]
+            model.set_params(n_estimators=max_trees)
+
+        state['chunks_done'] += 1
+        state['rows_seen'] += len(df)
+        save_checkpoint(state, checkpoint_path)
+        print(f"🌲 Chunk {state['chunks_done']}: {len(df):,} rows, {len(model.estimators_)} trees")
+
+    if not hasattr(model, 'estimators_'):
+        print("❌ Error: the dataset is empty, nothing to train on.")
+        return None
+
+    print_evaluation(state['holdout_y'], model.predict(state['holdout_X']))
+    model_columns = list(state['holdout_X'].columns)
+    served = None
+    if compress or serve != 'full':
+        served = compress_model(model, model_columns, state['holdout_X'], state['holdout_y'], serve)
+    # No zone tables here: the holdout sample does not keep its dataset row numbers across chunks
+    save_artifacts(model, model_columns, output_dir, served)
+    return model
+
 
 if __name__ == "__main__":
-    train_model()
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Train the ETA model.")
+    parser.add_argument("--incremental", action="store_true", help="stream the data in chunks and add trees per chunk (resumable)")
+    parser.add_argument("--memory-mb", type=float, default=512, help="memory budget for one training chunk")
+    parser.add_argument("--trees-per-chunk", type=int, default=25, help="trees added for every new chunk")
+    parser.add_argument("--max-trees", type=int, default=250, help="keep only the newest N trees")
+    parser.add_argument("--max-minutes", type=float, default=None, help="stop after this long (resume next run)")
+    parser.add_argument("--jobs", type=int, default=1, help="trees fitted in parallel (each adds work memory)")
+    parser.add_argument("--fresh", action="store_true", help="ignore an existing checkpoint")
+    parser.add_argument("--n-estimators", type=int, default=None, help=f"trees (default {FOREST_PARAMS['n_estimators']})")
+    parser.add_argument("--max-depth", type=int, default=None, help=f"tree depth (default {FOREST_PARAMS['max_depth']})")
+    parser.add_argument("--min-samples-leaf", type=int, default=None, help=f"rides per leaf (default {FOREST_PARAMS['min_samples_leaf']})")
+    parser.add_argument("--compress", action="store_true", help="report accuracy/latency/size of pruned, quantized and distilled models")
+    parser.add_argument("--serve", default="full", help="which model the server uses, e.g. prune-100x12-q or distill-0.25km (see --compress)")
+    parser.add_argument("--quote-logs", nargs="?", const=QUOTE_LOG_DIR, default=None,
+                        help=f"weight the rides by the trip mix of the served-quote log (default folder {QUOTE_LOG_DIR})")
+    parser.add_argument("--quote-logs-days", type=float, default=None, help="only the last N days of the quote log")
+    args = parser.parse_args()
+    if args.incremental and args.quote_logs:
+        parser.error("--quote-logs works with a full training run, not --incremental")
+
+    params = {name: getattr(args, name) for name in FOREST_PARAMS if getattr(args, name) is not None}
+    if args.incremental:
+        train_incremental(memory_mb=args.memory_mb, trees_per_chunk=args.trees_per_chunk, max_trees=args.max_trees,
+                          max_minutes=args.max_minutes, resume=not args.fresh, n_jobs=args.jobs, params=params,
+                          serve=args.serve, compress=args.compress)
+    else:
+        since = time.time() - args.quote_logs_days * 86400 if args.quote_logs_days else None
+        train_model(params, args.serve, args.compress, args.quote_logs, since)
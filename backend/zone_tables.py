@@ -0,0 +1,101 @@
+import numpy as np
+
+from geodesy import SERVICE_GRID, ZoneGrid, trip_distance
+
+# Precomputed numbers for every (pickup zone, drop zone) pair of the service grid.
+# Built by train_model.py next to the model: the ETA residuals belong to the model they were measured on.
+ZONE_TABLES_FILE = "zone_tables.npz"
+ZONE_COLUMNS = ['start_zone', 'end_zone']
+COORD_COLUMNS = ['start_lat', 'start_lon', 'end_lat', 'end_lon']
+# A pair's mean residual is shrunk towards 0 as if it also had this many rides with no error,
+# so a pair with a handful of noisy test rides barely moves its ETAs
+RESIDUAL_PRIOR_RIDES = 20
+
+
+def attach_zones(df, grid=SERVICE_GRID):
+    """Adds start_zone/end_zone (uint16) to a DataFrame of rides with coordinates."""
+    return df.assign(start_zone=grid.zone_of(df['start_lat'], df['start_lon']).astype(np.uint16),
+                     end_zone=grid.zone_of(df['end_lat'], df['end_lon']).astype(np.uint16))
+
+
+def ride_zones(path=None, grid=SERVICE_GRID):
+    """
+    (start_zone, end_zone) of every ride in the dataset, in load_rides row order.
+    Read from the zone columns when the dataset has them, else computed from the coordinates.
+    """
+    from ride_dataset import load_rides, dataset_columns
+
+    if set(ZONE_COLUMNS) <= set(dataset_columns(path)):
+        df = load_rides(ZONE_COLUMNS, path=path)
+    else:
+        df = attach_zones(load_rides(COORD_COLUMNS, path=path), grid)
+    return df['start_zone'].to_numpy(np.int64), df['end_zone'].to_numpy(np.int64)
+
+
+class ZoneTables:
+    """
+    Flat tables indexed by pair = start_zone * n_zones + end_zone:
+
+      distance_km   trip distance between the two zone centres (current DISTANCE_MODE)
+      eta_residual  mean (actual - predicted) ETA of the held-out rides on the pair, shrunk
+                    towards 0; the ranking engine adds it to the model's ETA
+      demand        historical rides on the pair relative to the average pair (1.0 = average)
+
+    A quote finds its pair with two zone lookups and reads every table with that one index.
+    """
+
+    def __init__(self, grid, distance_km, eta_residual, demand):
+        self.grid = grid
+        self.distance_km = distance_km
+        self.eta_residual = eta_residual
+        self.demand = demand
+
+    @classmethod
+    def build(cls, start_zones, end_zones, residual_rows=None, residuals=None, grid=SERVICE_GRID, prior=RESIDUAL_PRIOR_RIDES):
+        """
+        start_zones/end_zones: zone of every historical ride (demand).
+        residual_rows/residuals: which of those rides were held out and their actual - predicted ETA.
+        """
+        n_pairs = grid.n_zones ** 2
+        pairs = np.asarray(start_zones, dtype=np.int64) * grid.n_zones + np.asarray(end_zones, dtype=np.int64)
+        rides = np.bincount(pairs, minlength=n_pairs)
+        demand = rides / max(rides.mean(), 1e-9)
+
+        eta_residual = np.zeros(n_pairs)
+        if residuals is not None:
+            test_pairs = pairs[np.asarray(residual_rows)]
+            residual_sum = np.bincount(test_pairs, weights=np.asarray(residuals, dtype=np.float64), minlength=n_pairs)
+            eta_residual = residual_sum / (np.bincount(test_pairs, minlength=n_pairs) + prior)
+
+        lat, lon = grid.centres()
+        distance_km = trip_distance(np.repeat(lat, grid.n_zones), np.repeat(lon, grid.n_zones),
+                                    np.tile(lat, grid.n_zones), np.tile(lon, grid.n_zones))
+        return cls(grid, distance_km.astype(np.float32), eta_residual.astype(np.float32), demand.astype(np.float32))
+
+    def pairs(self, start_lats, start_lons, end_lats, end_lons):
+        """Pair index of every trip (vectorized)."""
+        return self.grid.zone_of(start_lats, start_lons) * self.grid.n_zones + self.grid.zone_of(end_lats, end_lons)
+
+    def pair(self, start_lat, start_lon, end_lat, end_lon):
+        """Pair index of one trip, in plain Python for the single-quote path."""
+        return self.grid.zone_scalar(start_lat, start_lon) * self.grid.n_zones + self.grid.zone_scalar(end_lat, end_lon)
+
+    @property
+    def nbytes(self):
+        return self.distance_km.nbytes + self.eta_residual.nbytes + self.demand.nbytes
+
+    def save(self, path):
+        np.savez(path, grid=self.grid.to_array(), distance_km=self.distance_km,
+                 eta_residual=self.eta_residual, demand=self.demand)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(ZoneGrid.from_array(data['grid']), data['distance_km'], data['eta_residual'], data['demand'])
+
+
+def build_zone_tables(data_path, test_rows, residuals, grid=SERVICE_GRID):
+    """ZoneTables for a dataset, with the residuals of the held-out rows (positions in load_rides order)."""
+    start_zones, end_zones = ride_zones(data_path, grid)
+    return ZoneTables.build(start_zones, end_zones, test_rows, residuals, grid)